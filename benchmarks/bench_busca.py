@@ -0,0 +1,79 @@
+# Latência e número de chamadas de cada função da camada de dados, sem o Streamlit.
+#
+#     python -m benchmarks.bench_busca --latencia 80 --erros 0.05
+#
+# Útil para comparar mudanças de cache e concorrência: com latência injetada, o
+# tempo de uma busca paralela fica perto do da chamada mais lenta.
+
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import comum
+from google.oauth2.credentials import Credentials
+
+from utils import backends_locais, dados_alimentos, dados_google_fit, dados_strava, sincronizacao
+
+REFEICAO = [("arroz branco", 150), ("feijão carioca", 100), ("queijo muçarela", 30), ("refrigerante de cola", 350),
+            ("chocolate ao leite", 25)]
+
+def _credenciais():
+    return Credentials(token="local", refresh_token="local-refresh", token_uri="https://oauth2.googleapis.com/token",
+                       client_id="local", client_secret="local", expiry=datetime.utcnow() + timedelta(hours=1))
+
+def cenarios(args):
+    creds = _credenciais()
+    agora_ms = int(time.time() * 1000)
+
+    def sincronizacao_inicial_fit():
+        comum.novo_banco()
+        sincronizacao.sincronizar_google_fit(creds)
+
+    def sincronizacao_inicial_strava():
+        comum.novo_banco()
+        sincronizacao.sincronizar_strava("local")
+
+    def alimento_frio():
+        comum.novo_banco()
+        dados_alimentos._CACHE.limpar()
+        return dados_alimentos.buscar_info_alimento("aveia em flocos")
+
+    def refeicao_fria():
+        comum.novo_banco()
+        dados_alimentos._CACHE.limpar()
+        return dados_alimentos.analisar_refeicao(REFEICAO)
+
+    return [
+        ("Fit: painel de 7 dias", lambda: dados_google_fit.obter_dados_google_fit(creds)),
+        ("Fit: série diária de 1 ano", lambda: dados_google_fit.obter_serie(creds, inicio=datetime.now() - timedelta(days=365))),
+        ("Fit: série horária de 30 dias", lambda: dados_google_fit.obter_serie(
+            creds, inicio=datetime.now() - timedelta(days=30), bucket='hora')),
+        ("Fit: sono de 1 ano", lambda: dados_google_fit.obter_sessoes_sono(creds, agora_ms - 365 * 86400000, agora_ms)),
+        ("Fit: sincronização inicial", sincronizacao_inicial_fit),
+        ("Strava: últimas atividades", lambda: dados_strava.buscar_ultimas_atividades("local")),
+        ("Strava: histórico completo", lambda: list(dados_strava.iterar_atividades("local", after=0))),
+        ("Strava: sincronização inicial", sincronizacao_inicial_strava),
+        ("Alimentos: busca (fria)", alimento_frio),
+        ("Alimentos: busca (quente)", lambda: dados_alimentos.buscar_info_alimento("aveia em flocos")),
+        ("Alimentos: refeição de 5 itens (fria)", refeicao_fria),
+    ]
+
+def main():
+    args = comum.argumentos("Latência da camada de dados com backends locais.")
+    resultados = []
+    with backends_locais.instalar(*comum.criar_backends(args)) as roteador:
+        for nome, funcao in cenarios(args):
+            tempos, chamadas = [], []
+            for _ in range(args.repeticoes):
+                roteador.zerar()
+                _, segundos = comum.cronometrar(funcao)
+                tempos.append(segundos * 1000)
+                chamadas.append(roteador.total_chamadas)
+            resultados.append({"cenario": nome, "mediana_ms": comum.mediana(tempos), "max_ms": max(tempos),
+                               "chamadas": max(chamadas)})
+    print(f"Latência {args.latencia:.0f}±{args.variacao:.0f} ms, {args.atividades} atividades, "
+          f"erros {args.erros:.0%}, {args.repeticoes} repetições\n")
+    comum.imprimir_tabela(resultados, ["cenario", "mediana_ms", "max_ms", "chamadas"])
+    comum.salvar_json(args.json, args, resultados)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Tempo até a primeira tela: um processo Python novo por medição, que roda o app uma
+# vez (AppTest) e informa o tempo, as bibliotecas pesadas carregadas e o pico de memória.
+#
+#     python -m benchmarks.bench_inicializacao --repeticoes 5
+#     python -m benchmarks.bench_inicializacao --comparar HEAD~1
+#
+# Com --comparar, a mesma medição roda num worktree temporário da revisão indicada.
+# O Streamlit já vem importado antes do cronômetro: o que se mede é o custo do app.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import comum
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADAS = ("googleapiclient", "google_auth_oauthlib", "google_auth_httplib2", "folium", "polyline")
+
+# Executado no processo filho, com o diretório do app como cwd
+_FILHO = """
+import json, resource, sys, time
+from streamlit import logger
+from streamlit.testing.v1 import AppTest
+logger.set_log_level("error")
+app = AppTest.from_file("streamlit_app.py", default_timeout=120)
+if sys.argv[1]:
+    app.session_state["aba"] = sys.argv[1]
+inicio = time.perf_counter()
+app.run()
+print(json.dumps({
+    "primeira_tela_ms": (time.perf_counter() - inicio) * 1000,
+    "excecao": app.exception[0].message if app.exception else None,
+    "pesadas": [m for m in %r if m in sys.modules],
+    "memoria_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+""" % (PESADAS,)
+
+def medir(diretorio, aba, repeticoes):
+    tempos, memorias, pesadas = [], [], []
+    for _ in range(repeticoes):
+        with tempfile.TemporaryDirectory(prefix="bench_inicio_") as temporario:
+            ambiente = {**os.environ,
+                        "HEALTH_DB_PATH": os.path.join(temporario, "health_data.db"),
+                        "OFF_INDEX_PATH": os.path.join(temporario, "off_index.db")}
+            saida = subprocess.run([sys.executable, "-c", _FILHO, aba], cwd=diretorio, env=ambiente,
+                                   capture_output=True, text=True, check=True)
+        resultado = json.loads(saida.stdout.strip().splitlines()[-1])
+        if resultado["excecao"]:
+            raise RuntimeError(f"O app levantou uma exceção: {resultado['excecao']}")
+        tempos.append(resultado["primeira_tela_ms"])
+        memorias.append(resultado["memoria_mb"])
+        pesadas = resultado["pesadas"]
+    return {"primeira_tela_ms": comum.mediana(tempos), "memoria_mb": comum.mediana(memorias),
+            "pesadas": ", ".join(pesadas) or "-"}
+
+def _worktree(revisao):
+    diretorio = tempfile.mkdtemp(prefix="bench_rev_")
+    subprocess.run(["git", "worktree", "add", "--detach", diretorio, revisao], cwd=RAIZ,
+                   check=True, capture_output=True)
+    return diretorio
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo até a primeira tela do painel, em processos novos.")
+    parser.add_argument("--aba", action="append", help="aba aberta no primeiro run (pode repetir; padrão: a inicial)")
+    parser.add_argument("--comparar", metavar="REVISAO", help="mede também esta revisão do git (ex.: HEAD~1)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados também em JSON")
+    args = parser.parse_args()
+
+    arvores = [("atual", RAIZ)]
+    if args.comparar:
+        arvores.insert(0, (args.comparar, _worktree(args.comparar)))
+    resultados = []
+    try:
+        for aba in args.aba or [""]:
+            for revisao, diretorio in arvores:
+                resultados.append({"revisao": revisao, "aba": aba or "(inicial)", **medir(diretorio, aba, args.repeticoes)})
+    finally:
+        if args.comparar:
+            subprocess.run(["git", "worktree", "remove", "--force", arvores[0][1]], cwd=RAIZ, check=False)
+
+    print(f"Mediana de {args.repeticoes} processos novos por linha\n")
+    comum.imprimir_tabela(resultados, ["revisao", "aba", "primeira_tela_ms", "memoria_mb", "pesadas"])
+    comum.salvar_json(args.json, args, resultados)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Memória ocupada pelas listas de atividades do Strava, por atividade, medida com tracemalloc.
+#
+#     python -m benchmarks.bench_memoria --tamanhos 100 1000 5000
+#
+# Mede o pico e o que fica retido em cada etapa: download paginado, leitura do
+# banco local e decodificação das rotas (polylines) para as análises de rotas.
+
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks import comum
+
+from utils import backends_locais, banco_dados, dados_strava, sincronizacao
+from utils.backends_locais import StravaLocal
+from utils.rotas import decodificar_polylines
+
+def medir(funcao):
+    """Retorna (resultado, bytes retidos pelo resultado, pico de bytes durante a execução)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        resultado = funcao()
+        gc.collect()
+        retido, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, retido, pico
+
+def etapas():
+    def historico():
+        with banco_dados.conexao() as conn:
+            return banco_dados.ler_historico_rotas(conn, comum.USUARIO)
+
+    # (etapa, função, quantas atividades há no resultado)
+    return [
+        ("download (iterar_atividades)", lambda: list(dados_strava.iterar_atividades("local", after=0)), len),
+        ("banco: últimas 30", lambda: sincronizacao.carregar_atividades_strava("local", 30, usuario=comum.USUARIO),
+         lambda r: len(r[0])),
+        ("banco: histórico de rotas", historico, lambda r: len(r[0])),
+        ("rotas decodificadas", lambda: decodificar_polylines(historico()[2]), len),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória por lista de atividades do Strava.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 3000])
+    args = parser.parse_args()
+    resultados = []
+    for n in args.tamanhos:
+        comum.novo_banco()
+        with backends_locais.instalar(StravaLocal(n_atividades=n)):
+            sincronizacao.sincronizar_strava("local", usuario=comum.USUARIO, intervalo_minimo=0)
+            for nome, funcao, contar in etapas():
+                resultado, retido, pico = medir(funcao)
+                resultados.append({"atividades": n, "etapa": nome, "retido_kb": retido / 1024, "pico_kb": pico / 1024,
+                                   "bytes_por_atividade": round(retido / max(contar(resultado), 1))})
+    comum.imprimir_tabela(resultados, ["atividades", "etapa", "retido_kb", "pico_kb", "bytes_por_atividade"])
+
+if __name__ == "__main__":
+    main()
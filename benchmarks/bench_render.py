@@ -0,0 +1,65 @@
+# Tempo de renderização de cada aba do painel, a frio e a quente, e chamadas às APIs por rerun.
+#
+#     python -m benchmarks.bench_render --latencia 80 --atividades 300
+#
+# "Frio" é o primeiro acesso (banco vazio, caches vazios: sincroniza o histórico);
+# "quente" é o rerun seguinte na mesma sessão, que deveria sair todo do cache.
+
+import os
+
+from benchmarks import comum
+from streamlit.testing.v1 import AppTest
+
+from utils import backends_locais
+
+SCRIPT_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+# (nome, estado da sessão antes do primeiro run)
+CENARIOS = [
+    ("Google Fit", {"aba": "📱 Google Fit"}),
+    ("Google Fit + tendências", {"aba": "📱 Google Fit", "fit_tendencias": True}),
+    ("Strava", {"aba": "🏃 Strava"}),
+    ("Strava + rotas frequentes", {"aba": "🏃 Strava", "rotas_frequentes": True}),
+    ("Strava modo leve", {"aba": "🏃 Strava", "strava_modo_leve": True}),
+    ("Alimentos", {"aba": "🍎 Alimentos", "food_input": "arroz"}),
+]
+
+def _executar(app, roteador):
+    roteador.zerar()
+    _, segundos = comum.cronometrar(app.run)
+    if app.exception:
+        raise RuntimeError(f"O app levantou uma exceção: {app.exception[0].message}")
+    return segundos * 1000, roteador.total_chamadas
+
+def medir_cenario(estado, roteador, repeticoes):
+    frio, quente, chamadas_frio, chamadas_quente = [], [], [], []
+    for _ in range(repeticoes):
+        comum.novo_banco()
+        comum.limpar_caches()
+        comum.conectar_contas()
+        app = AppTest.from_file(SCRIPT_APP, default_timeout=120)
+        app.session_state["usuario_id"] = comum.USUARIO
+        for chave, valor in estado.items():
+            app.session_state[chave] = valor
+        ms, chamadas = _executar(app, roteador)
+        frio.append(ms); chamadas_frio.append(chamadas)
+        ms, chamadas = _executar(app, roteador)
+        quente.append(ms); chamadas_quente.append(chamadas)
+    return {
+        "frio_ms": comum.mediana(frio), "quente_ms": comum.mediana(quente),
+        "chamadas_frio": max(chamadas_frio), "chamadas_quente": max(chamadas_quente),
+    }
+
+def main():
+    args = comum.argumentos("Renderização das abas do painel com backends locais.")
+    resultados = []
+    with backends_locais.instalar(*comum.criar_backends(args)) as roteador:
+        for nome, estado in CENARIOS:
+            resultados.append({"cenario": nome, **medir_cenario(estado, roteador, args.repeticoes)})
+    print(f"Latência {args.latencia:.0f}±{args.variacao:.0f} ms, {args.atividades} atividades, "
+          f"erros {args.erros:.0%}, mediana de {args.repeticoes} repetições\n")
+    comum.imprimir_tabela(resultados, ["cenario", "frio_ms", "quente_ms", "chamadas_frio", "chamadas_quente"])
+    comum.salvar_json(args.json, args, resultados)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Utilitários compartilhados pelos benchmarks: banco temporário, contas conectadas,
+# backends locais configurados pela linha de comando e impressão dos resultados.
+#
+# Importe este módulo antes de qualquer módulo de `utils`: ele aponta o banco e o
+# índice offline para um diretório temporário, sem tocar no health_data.db do projeto.
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+_DIRETORIO = tempfile.mkdtemp(prefix="bench_saude_")
+os.environ["HEALTH_DB_PATH"] = os.path.join(_DIRETORIO, "health_data.db")
+os.environ["OFF_INDEX_PATH"] = os.path.join(_DIRETORIO, "off_index.db")
+
+import streamlit as st
+from streamlit import logger
+
+from utils import banco_dados, dados_alimentos, dados_google_fit, mapas
+from utils.backends_locais import FitnessLocal, OpenFoodFactsLocal, Perturbacao, StravaLocal
+
+# Fora do `streamlit run` o Streamlit avisa a cada rerun que não há runtime
+logger.set_log_level("error")
+
+USUARIO = "0123456789abcdef0123456789abcdef"
+ATLETA_ID = 1001
+_contador_bancos = 0
+
+def argumentos(descricao, **padroes):
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument("--latencia", type=float, default=padroes.get("latencia", 80), help="latência de cada chamada, em ms")
+    parser.add_argument("--variacao", type=float, default=padroes.get("variacao", 40), help="latência extra aleatória (0 a N ms)")
+    parser.add_argument("--erros", type=float, default=0.0, help="fração das chamadas que falham com 503")
+    parser.add_argument("--atividades", type=int, default=padroes.get("atividades", 300), help="atividades do Strava local")
+    parser.add_argument("--repeticoes", type=int, default=padroes.get("repeticoes", 3))
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados também em JSON")
+    return parser.parse_args()
+
+def criar_backends(args, semente=0):
+    perturbacao = lambda i: Perturbacao(args.latencia / 1000, args.variacao / 1000, args.erros, semente=semente + i)
+    return (FitnessLocal(perturbacao(0), semente=semente),
+            StravaLocal(perturbacao(1), n_atividades=args.atividades, atleta_id=ATLETA_ID, semente=semente),
+            OpenFoodFactsLocal(perturbacao(2)))
+
+def novo_banco():
+    """Troca o banco por um arquivo vazio (estado de primeiro acesso)."""
+    global _contador_bancos
+    _contador_bancos += 1
+    banco_dados.CAMINHO_BANCO = os.path.join(_DIRETORIO, f"health_data_{_contador_bancos}.db")
+    return banco_dados.CAMINHO_BANCO
+
+def limpar_caches():
+    """Esvazia todos os caches em memória (Streamlit e módulos de dados)."""
+    st.cache_data.clear()
+    dados_alimentos._CACHE.limpar()
+    dados_alimentos._AUSENTES.limpar()
+    dados_google_fit._SERVICOS.limpar()
+    mapas._CACHE_MAPAS.limpar()
+    mapas._CACHE_MINIATURAS.limpar()
+
+def conectar_contas(usuario=USUARIO):
+    """Grava tokens válidos (para os backends locais) do Google Fit e do Strava do usuário."""
+    expira = datetime.now(timezone.utc) + timedelta(hours=1)
+    with banco_dados.conexao() as conn:
+        banco_dados.gravar_token(conn, usuario, "google", {
+            "token": "local", "refresh_token": "local-refresh", "token_uri": "https://oauth2.googleapis.com/token",
+            "client_id": "local", "client_secret": "local", "expiry": expira.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        })
+        banco_dados.gravar_token(conn, usuario, "strava", {
+            "access_token": "local", "refresh_token": "local-refresh", "expires_at": int(expira.timestamp()),
+            "athlete": {"id": ATLETA_ID},
+        })
+
+def cronometrar(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+def mediana(valores):
+    return statistics.median(valores) if valores else float("nan")
+
+def imprimir_tabela(linhas, colunas):
+    larguras = [max(len(c), *(len(_formatar(l[c])) for l in linhas)) for c in colunas]
+    print("  ".join(c.ljust(w) for c, w in zip(colunas, larguras)))
+    print("  ".join("-" * w for w in larguras))
+    for linha in linhas:
+        print("  ".join(_formatar(linha[c]).ljust(w) for c, w in zip(colunas, larguras)))
+
+def _formatar(valor):
+    return f"{valor:.1f}" if isinstance(valor, float) else str(valor)
+
+def salvar_json(caminho, args, resultados):
+    if caminho:
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=1)
@@ -3,32 +3,78 @@
 import streamlit as st
 import os
 import json
-import requests
 from datetime import datetime
 import time
-
-# Importações da biblioteca do Google
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+from collections import deque
 
 # --- Importações dos seus módulos de utilidades ---
-from utils.dados_google_fit import obter_passos_diarios, obter_batimentos_medios, obter_sono, obter_ultimo_peso, obter_ultima_altura
-from utils.dados_strava import buscar_ultimas_atividades, buscar_estatisticas_atleta, gerar_mapa_atividade
-from utils.dados_alimentos import buscar_info_alimento, gerar_dicas_nutricionais
+from utils.dados_strava import gerar_mapa_atividade, gerar_miniatura_atividade
+from utils.dados_alimentos import gerar_dicas_nutricionais, analisar_refeicao
+from utils import cache_streamlit, cliente_http, identidade, indice_alimentos, instrumentacao
+from utils.rotas import decodificar_polylines, distancias_km, rotas_mais_frequentes
+from utils.credenciais import ArmazenamentoTokensSQLite, GerenciadorCredenciais, importar_tokens_legados, tokens_legados
 
 # --- Configurações e Constantes ---
 st.set_page_config(page_title="Painel de Saúde", layout="wide")
+# Cascata de tempos deste rerun, vista na aba de diagnóstico (escondida; abra com ?diag=1)
+rastro = instrumentacao.iniciar_rastro()
+DIAGNOSTICO = st.query_params.get("diag") == "1"
 
 # --- Credenciais (lidas a partir do ambiente do servidor) ---
 STRAVA_CLIENT_ID = os.getenv("STRAVA_CLIENT_ID")
 STRAVA_CLIENT_SECRET = os.getenv("STRAVA_CLIENT_SECRET")
-STRAVA_TOKEN_FILE = "strava_tokens.json"
 
 GOOGLE_CLIENT_SECRETS_FILE = "client_secret.json" 
-GOOGLE_TOKEN_FILE = "google_fit_tokens.json"
 GOOGLE_SCOPES = ['https://www.googleapis.com/auth/fitness.activity.read', 'https://www.googleapis.com/auth/fitness.body.read', 'https://www.googleapis.com/auth/fitness.heart_rate.read', 'https://www.googleapis.com/auth/fitness.sleep.read']
 
+# --- Identificação do usuário ---
+# Cada visitante recebe do servidor um id aleatório, guardado na sessão e num cookie
+# assinado (utils.identidade); a URL e o 'state' do OAuth nunca definem a conta.
+def obter_usuario_id():
+    usuario = st.session_state.get("usuario_id") or identidade.usuario_do_cookie(st.context.cookies.get(identidade.NOME_COOKIE))
+    if usuario is None:
+        usuario = identidade.novo_usuario()
+        st.html(identidade.script_cookie(usuario), unsafe_allow_javascript=True)
+    st.session_state.usuario_id = usuario
+    return usuario
+
+def estado_oauth(provedor):
+    """(state, code_verifier) do login pendente desta sessão no provedor, criado uma vez e reaproveitado nos reruns."""
+    chave = f"oauth_{provedor}"
+    if chave not in st.session_state or not identidade.estado_pendente(st.session_state[chave][0]):
+        st.session_state[chave] = identidade.novo_estado_oauth(usuario_id, provedor)
+    nonce, verificador = st.session_state[chave]
+    return f"{provedor}:{nonce}", verificador
+
+def retorno_oauth(provedor):
+    """(code, code_verifier) se a URL trouxer o retorno de um login deste usuário no provedor.
+
+    Retorna None quando não há retorno para este provedor e mostra um erro se o
+    'state' não for um nonce pendente deste usuário (link de outra pessoa ou expirado).
+    """
+    auth_code, auth_state = st.query_params.get("code"), st.query_params.get("state", "")
+    prefixo, _, nonce = auth_state.partition(":")
+    if not auth_code or prefixo != provedor:
+        return None
+    verificador = identidade.consumir_estado_oauth(nonce, usuario_id, provedor)
+    if verificador is None:
+        st.error("Este retorno de login não pertence a esta sessão ou expirou. Conecte de novo.")
+        return None
+    return auth_code, verificador
+
+def limpar_retorno_oauth():
+    st.query_params.clear()
+
+usuario_id = obter_usuario_id()
+
+# Tokens ficam em memória por sessão; o banco só é lido na primeira vez
+if st.session_state.get("credenciais_usuario") != usuario_id:
+    st.session_state.credenciais = GerenciadorCredenciais(
+        ArmazenamentoTokensSQLite(usuario_id),
+        google_scopes=GOOGLE_SCOPES, strava_client_id=STRAVA_CLIENT_ID, strava_client_secret=STRAVA_CLIENT_SECRET)
+    st.session_state.credenciais_usuario = usuario_id
+credenciais = st.session_state.credenciais
+
 # ===== A CORREÇÃO CRÍTICA PARA O DEPLOY ESTÁ AQUI =====
 # Verifica se está rodando no ambiente do Render
 if "RENDER" in os.environ:
@@ -46,139 +92,268 @@ else:
 def gerenciar_autenticacao_strava_ui():
     if not STRAVA_CLIENT_ID or not STRAVA_CLIENT_SECRET:
         st.error("Credenciais do Strava não configuradas nas variáveis de ambiente do servidor."); return
-    auth_code, auth_state = st.query_params.get("code"), st.query_params.get("state")
-    if auth_code and auth_state == "strava":
+    retorno = retorno_oauth("strava")
+    if retorno:
+        auth_code, _ = retorno
         with st.spinner("Conectando ao Strava..."):
-            response = requests.post("https://www.strava.com/oauth/token", data={"client_id": STRAVA_CLIENT_ID, "client_secret": STRAVA_CLIENT_SECRET, "code": auth_code, "grant_type": "authorization_code"})
+            response = cliente_http.post("https://www.strava.com/oauth/token", data={"client_id": STRAVA_CLIENT_ID, "client_secret": STRAVA_CLIENT_SECRET, "code": auth_code, "grant_type": "authorization_code"})
             if response.status_code == 200:
-                with open(STRAVA_TOKEN_FILE, 'w') as f: json.dump(response.json(), f)
-                st.query_params.clear(); st.success("Strava conectado!"); time.sleep(1); st.rerun()
+                credenciais.salvar("strava", response.json())
+                limpar_retorno_oauth(); st.success("Strava conectado!"); time.sleep(1); st.rerun()
             else: st.error(f"Falha na autenticação: {response.text}")
     else:
-        auth_url = f"https://www.strava.com/oauth/authorize?client_id={STRAVA_CLIENT_ID}&response_type=code&redirect_uri={REDIRECT_URI}&approval_prompt=force&scope=read,activity:read_all,profile:read_all&state=strava"
+        auth_url = f"https://www.strava.com/oauth/authorize?client_id={STRAVA_CLIENT_ID}&response_type=code&redirect_uri={REDIRECT_URI}&approval_prompt=force&scope=read,activity:read_all,profile:read_all&state={estado_oauth('strava')[0]}"
         st.link_button("🔗 Conectar ao Strava", auth_url, use_container_width=True)
 
 def gerenciar_autenticacao_google_ui():
     if not os.path.exists(GOOGLE_CLIENT_SECRETS_FILE):
         st.error(f"Arquivo de credenciais '{GOOGLE_CLIENT_SECRETS_FILE}' não encontrado. Verifique a configuração do 'Secret File' no Render."); return
-    flow = Flow.from_client_secrets_file(GOOGLE_CLIENT_SECRETS_FILE, scopes=GOOGLE_SCOPES, redirect_uri=REDIRECT_URI)
-    auth_code, auth_state = st.query_params.get("code"), st.query_params.get("state")
-    if auth_code and auth_state == "google":
+    # Importado só aqui: o fluxo OAuth só é usado por quem ainda vai conectar o Google Fit
+    from google_auth_oauthlib.flow import Flow
+
+    configuracao = cache_streamlit.configuracao_cliente_google(GOOGLE_CLIENT_SECRETS_FILE)
+    retorno = retorno_oauth("google")
+    if retorno:
+        auth_code, verificador = retorno
+        # O code_verifier (PKCE) é o mesmo gerado para o link de login desta conta
+        flow = Flow.from_client_config(configuracao, scopes=GOOGLE_SCOPES, redirect_uri=REDIRECT_URI, code_verifier=verificador)
         with st.spinner("Conectando ao Google Fit..."):
             flow.fetch_token(code=auth_code)
-            with open(GOOGLE_TOKEN_FILE, 'w') as token: token.write(flow.credentials.to_json())
-            st.query_params.clear(); st.success("Google Fit conectado!"); time.sleep(1); st.rerun()
+            credenciais.salvar("google", json.loads(flow.credentials.to_json()))
+            limpar_retorno_oauth(); st.success("Google Fit conectado!"); time.sleep(1); st.rerun()
     else:
-        authorization_url, state = flow.authorization_url(access_type='offline', include_granted_scopes='true', prompt='consent', state='google')
+        estado, verificador = estado_oauth("google")
+        flow = Flow.from_client_config(configuracao, scopes=GOOGLE_SCOPES, redirect_uri=REDIRECT_URI, code_verifier=verificador)
+        authorization_url, _ = flow.authorization_url(access_type='offline', include_granted_scopes='true', prompt='consent', state=estado)
         st.link_button("🔗 Conectar ao Google Fit", authorization_url, use_container_width=True)
 
+def mostrar_tokens_legados():
+    """Avisa sobre tokens das versões antigas (arquivos *_tokens.json, de uma conta só).
+
+    Eles não são associados sozinhos a nenhum visitante: com IMPORTAR_TOKENS_LEGADOS=1
+    no servidor, a primeira sessão que clicar em importar fica com eles.
+    """
+    legados = [p for p in tokens_legados() if not credenciais.conectado(p)]
+    if not legados:
+        return
+    nomes = " e ".join({"google": "Google Fit", "strava": "Strava"}[p] for p in legados)
+    if os.getenv("IMPORTAR_TOKENS_LEGADOS") == "1":
+        st.warning(f"Há tokens de {nomes} salvos por uma versão anterior do app.")
+        if st.button("Importar para esta conta"):
+            importar_tokens_legados(credenciais.armazenamento)
+            st.session_state.credenciais_usuario = None; st.rerun()
+    else:
+        st.info(f"As conexões com {nomes} agora são guardadas por usuário: conecte de novo abaixo.")
+
+def mostrar_diagnostico():
+    st.header("🩺 Diagnóstico")
+    st.caption("Métricas acumuladas pelo processo (todas as sessões) e cascata de tempos dos últimos reruns desta sessão.")
+    rastros = [r for r in reversed(st.session_state.get("rastros", [])) if r.trechos]
+    if rastros:
+        i = st.selectbox("Rerun", range(len(rastros)), key="diag_rerun",
+                         format_func=lambda i: f"{datetime.fromtimestamp(rastros[i].criado_em):%H:%M:%S} · {rastros[i].rotulo} · {rastros[i].duracao_ms:.0f} ms")
+        cascata = [{**t, "trecho": f"{n:02d} {'· ' * t['nivel']}{t['nome']}", "duracao_ms": round(t["fim_ms"] - t["inicio_ms"], 1)}
+                   for n, t in enumerate(rastros[i].cascata())]
+        st.vega_lite_chart(cascata, {
+            "mark": {"type": "bar", "tooltip": True},
+            "encoding": {
+                "y": {"field": "trecho", "type": "nominal", "sort": None, "title": None},
+                "x": {"field": "inicio_ms", "type": "quantitative", "title": "ms desde o início do rerun"},
+                "x2": {"field": "fim_ms"},
+                "color": {"field": "thread", "type": "nominal"},
+            },
+        })
+    else: st.info("Use as outras abas para registrar a cascata de tempos dos reruns.")
+
+    metricas = instrumentacao.exportar_json()
+    st.subheader("⏱️ Latência por função")
+    st.dataframe([{"função": nome, **{k: v for k, v in m.items() if k != "buckets"}} for nome, m in metricas["latencias"].items()], hide_index=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🌐 APIs externas")
+        st.dataframe([{"host": host, **uso} for host, uso in metricas["upstream"].items()], hide_index=True)
+    with col2:
+        st.subheader("🗃️ Caches")
+        st.dataframe([{"cache": nome, **c} for nome, c in metricas["caches"].items()], hide_index=True)
+    if metricas["erros"]:
+        st.subheader("❗ Erros")
+        st.dataframe(metricas["erros"], hide_index=True)
+    c1, c2 = st.columns(2)
+    c1.download_button("Exportar (Prometheus)", instrumentacao.exportar_prometheus(), "metricas.prom", "text/plain")
+    c2.download_button("Exportar (JSON)", json.dumps(metricas, ensure_ascii=False, indent=1), "metricas.json", "application/json")
+
 # ==============================================================================
 # LAYOUT PRINCIPAL
 # ==============================================================================
 
 st.title("📊 Painel de Saúde Integrado")
-tab_conexoes, tab_fit, tab_strava, tab_alimentos = st.tabs(["🚪 Conexões", "📱 Google Fit", "🏃 Strava", "🍎 Alimentos"])
+# Com on_change="rerun" só a aba selecionada é executada (tab.open)
+ABAS = ["🚪 Conexões", "📱 Google Fit", "🏃 Strava", "🍎 Alimentos"] + (["🩺 Diagnóstico"] if DIAGNOSTICO else [])
+tab_conexoes, tab_fit, tab_strava, tab_alimentos, *tab_diagnostico = st.tabs(ABAS, key="aba", on_change="rerun")
+rastro.rotulo = st.session_state.get("aba")
 
 with tab_conexoes:
-    st.header("Gerencie suas Conexões")
-    st.write("Use esta aba para conectar ou desconectar suas contas.")
-    st.markdown("---")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("Google Fit")
-        if os.path.exists(GOOGLE_TOKEN_FILE):
-            st.success("✅ Conectado ao Google Fit.")
-            if st.button("Desconectar Google"): os.remove(GOOGLE_TOKEN_FILE); st.rerun()
-        else: gerenciar_autenticacao_google_ui()
-    with col2:
-        st.subheader("Strava")
-        if os.path.exists(STRAVA_TOKEN_FILE):
-            st.success("✅ Conectado ao Strava.")
-            if st.button("Desconectar Strava"): os.remove(STRAVA_TOKEN_FILE); st.rerun()
-        else: gerenciar_autenticacao_strava_ui()
+    if tab_conexoes.open:
+        st.header("Gerencie suas Conexões")
+        st.write("Use esta aba para conectar ou desconectar suas contas.")
+        mostrar_tokens_legados()
+        st.markdown("---")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Google Fit")
+            if credenciais.conectado("google"):
+                st.success("✅ Conectado ao Google Fit.")
+                if st.button("Desconectar Google"): credenciais.remover("google"); st.rerun()
+            else: gerenciar_autenticacao_google_ui()
+        with col2:
+            st.subheader("Strava")
+            if credenciais.conectado("strava"):
+                st.success("✅ Conectado ao Strava.")
+                if st.button("Desconectar Strava"): credenciais.remover("strava"); st.rerun()
+            else: gerenciar_autenticacao_strava_ui()
 
 with tab_fit:
-    st.header("Seus dados do Google Fit")
-    if os.path.exists(GOOGLE_TOKEN_FILE):
-        try:
-            creds = Credentials.from_authorized_user_file(GOOGLE_TOKEN_FILE, GOOGLE_SCOPES)
-            if creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            
-            with st.spinner("Buscando dados do Google Fit..."):
-                peso = obter_ultimo_peso(creds); altura = obter_ultima_altura(creds)
-                passos = obter_passos_diarios(creds); bpm = obter_batimentos_medios(creds)
-                sono = obter_sono(creds)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.subheader("⚖️ IMC")
-                if peso and altura:
-                    imc = round(peso / (altura ** 2), 1)
-                    st.metric("Seu IMC Atual", f"{imc}")
-                else: st.warning("Adicione peso/altura no app Google Fit.")
-            with col2:
-                st.subheader("❤️ Batimentos Médios")
-                if bpm: st.line_chart(bpm)
-                else: st.info("Nenhum dado de batimentos encontrado.")
-
-            st.subheader("📶 Passos Diários")
-            if passos: st.bar_chart(passos)
-            else: st.info("Nenhum dado de passos encontrado.")
+    if tab_fit.open:
+        st.header("Seus dados do Google Fit")
+        if credenciais.conectado("google"):
+            try:
+                creds = credenciais.google()
+                dias = st.selectbox("Período", [7, 30, 90, 365], format_func=lambda d: f"Últimos {d} dias", key="fit_periodo")
+                with st.spinner("Buscando dados do Google Fit..."):
+                    dados_fit = cache_streamlit.dados_google_fit(credenciais.identidade("google"), creds, dias=dias)
+                passos, bpm, sono = dados_fit.passos, dados_fit.bpm, dados_fit.sono
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.subheader("⚖️ IMC")
+                    if dados_fit.imc:
+                        st.metric("Seu IMC Atual", f"{dados_fit.imc}")
+                    else: st.warning("Adicione peso/altura no app Google Fit.")
+                with col2:
+                    st.subheader("❤️ Batimentos Médios")
+                    if bpm: st.line_chart(bpm)
+                    else: st.info("Nenhum dado de batimentos encontrado.")
+
+                st.subheader("📶 Passos Diários")
+                if passos: st.bar_chart(passos)
+                else: st.info("Nenhum dado de passos encontrado.")
             
-            st.subheader("😴 Horas de Sono")
-            if sono: st.area_chart(sono)
-            else: st.info("Nenhum dado de sono encontrado.")
-        except Exception as e:
-            st.error(f"Ocorreu um erro ao carregar os dados do Google: {e}")
-            st.warning("Tente desconectar e conectar novamente na aba 'Conexões'.")
-    else:
-        st.info("⬅️ Conecte sua conta na aba 'Conexões'.")
+                st.subheader("😴 Horas de Sono")
+                if sono: st.area_chart(sono)
+                else: st.info("Nenhum dado de sono encontrado.")
 
-with tab_strava:
-    st.header("Suas Atividades do Strava")
-    if os.path.exists(STRAVA_TOKEN_FILE):
-        with open(STRAVA_TOKEN_FILE, 'r') as f: tokens = json.load(f)
-        access_token = tokens['access_token']
-        if tokens['expires_at'] < time.time():
-            st.warning("Token do Strava expirado. Por favor, vá para a aba 'Conexões' e reconecte.")
+                with st.expander("📈 Tendências de longo prazo", key="fit_tendencias", on_change="rerun") as exp_tendencias:
+                    if exp_tendencias.open:
+                        anos = st.select_slider("Histórico", [1, 2, 3], format_func=lambda a: f"{a} ano(s)", key="fit_tendencias_anos")
+                        with st.spinner("Analisando o histórico..."):
+                            tendencias = cache_streamlit.tendencias_google_fit(credenciais.identidade("google"), creds, dias=365 * anos)
+                        if tendencias.diario.empty:
+                            st.info("Ainda não há histórico suficiente.")
+                        else:
+                            if tendencias.inclinacao_repouso is not None:
+                                st.metric("FC de repouso (tendência)", f"{tendencias.diario['fc_repouso'].dropna().iloc[-1]:.0f} bpm",
+                                          f"{tendencias.inclinacao_repouso:+.2f} bpm/semana", delta_color="inverse")
+                            st.line_chart(tendencias.diario[['passos', 'passos_media_7d']])
+                            st.line_chart(tendencias.diario[['bpm_media_7d', 'fc_repouso']])
+                            st.bar_chart(tendencias.semanal['passos'])
+            except Exception as e:
+                st.error(f"Ocorreu um erro ao carregar os dados do Google: {e}")
+                st.warning("Tente desconectar e conectar novamente na aba 'Conexões'.")
         else:
-            with st.spinner("Buscando dados do Strava..."):
-                atividades, atleta_id = buscar_ultimas_atividades(access_token)
+            st.info("⬅️ Conecte sua conta na aba 'Conexões'.")
+
+with tab_strava:
+    if tab_strava.open:
+        st.header("Suas Atividades do Strava")
+        if credenciais.conectado("strava"):
+            access_token = credenciais.token_strava()
+            if access_token is None:
+                st.warning("Token do Strava expirado e não foi possível renová-lo. Por favor, vá para a aba 'Conexões' e reconecte.")
+            else:
+                with st.spinner("Buscando dados do Strava..."):
+                    atividades, atleta_id = cache_streamlit.atividades_strava(credenciais.identidade("strava"), access_token)
             
-            if atleta_id:
-                stats = buscar_estatisticas_atleta(access_token, atleta_id)
-                if stats:
-                    c1, c2 = st.columns(2)
-                    c1.metric("Total Corrida (Ano)", f"{stats['corrida_distancia_km']} km")
-                    c2.metric("Total Pedalada (Ano)", f"{stats['pedalada_distancia_km']} km")
+                if atleta_id:
+                    stats = cache_streamlit.estatisticas_strava(credenciais.identidade("strava"), access_token, atleta_id)
+                    if stats:
+                        c1, c2 = st.columns(2)
+                        c1.metric("Total Corrida (Ano)", f"{stats['corrida_distancia_km']} km")
+                        c2.metric("Total Pedalada (Ano)", f"{stats['pedalada_distancia_km']} km")
             
-            if atividades:
-                st.subheader("Suas Últimas Atividades")
-                for at in atividades:
-                    with st.expander(f"**{at['nome']}** ({at['tipo']}) - {at['distancia_km']} km"):
-                        st.write(f"**Distância:** {at['distancia_km']} km | **Duração:** {at['duracao_min']} min")
-                        mapa_html = gerar_mapa_atividade(at)
-                        st.components.v1.html(mapa_html, height=350, scrolling=False)
-            else: st.info("Nenhuma atividade recente encontrada.")
-    else:
-        st.info("⬅️ Conecte sua conta na aba 'Conexões'.")
+                if atividades:
+                    st.subheader("Suas Últimas Atividades")
+                    modo_leve = st.toggle("Modo leve (miniaturas estáticas dos mapas)", key="strava_modo_leve")
+                    for at in atividades:
+                        # O mapa só é renderizado quando o expander está aberto
+                        with st.expander(f"**{at['nome']}** ({at['tipo']}) - {at['distancia_km']} km", key=f"atividade_{at['id']}", on_change="rerun") as exp:
+                            st.write(f"**Distância:** {at['distancia_km']} km | **Duração:** {at['duracao_min']} min")
+                            if exp.open:
+                                if modo_leve:
+                                    st.markdown(gerar_miniatura_atividade(at), unsafe_allow_html=True)
+                                else:
+                                    st.components.v1.html(gerar_mapa_atividade(at), height=350, scrolling=False)
+                else: st.info("Nenhuma atividade recente encontrada.")
+
+                with st.expander("📍 Rotas mais frequentes", key="rotas_frequentes", on_change="rerun") as exp_rotas:
+                    if exp_rotas.open:
+                        _, nomes, polylines = cache_streamlit.historico_rotas(credenciais.identidade("strava"))
+                        rotas = decodificar_polylines(polylines)
+                        distancias = distancias_km(rotas)
+                        grupos = rotas_mais_frequentes(rotas, top=5)
+                        if grupos:
+                            for grupo in grupos:
+                                st.write(f"**{nomes[grupo[-1]]}** — {len(grupo)} vezes, ~{distancias[grupo].mean():.1f} km")
+                        else: st.info("Nenhuma rota repetida encontrada no seu histórico.")
+        else:
+            st.info("⬅️ Conecte sua conta na aba 'Conexões'.")
 
 with tab_alimentos:
-    st.header("🍎 Consulta de Alimentos")
-    alimento = st.text_input("Digite um alimento para consultar:", key="food_input")
-    if alimento:
-        with st.spinner(f"Buscando informações sobre '{alimento}'..."):
-            dados = buscar_info_alimento(alimento)
-        if dados:
-            st.subheader(dados.get('nome', 'Nome não disponível'))
-            if dados.get("imagem"): st.image(dados.get("imagem"), width=200)
-            st.write(f"**Nutri-Score:** {dados.get('nutriscore', '?').upper()} | **Grupo NOVA:** {dados.get('nova_group', '?')}")
-            st.write(f"**Ingredientes:** {dados.get('ingredientes', 'Não listado')}")
-            st.subheader("💡 Dicas Nutricionais")
-            dicas = gerar_dicas_nutricionais(dados)
-            for dica in dicas: st.markdown(f"- {dica}")
+    if tab_alimentos.open:
+        st.header("🍎 Consulta de Alimentos")
+        alimento = st.text_input("Digite um alimento para consultar:", key="food_input")
+        modo_offline = os.path.exists(indice_alimentos.CAMINHO_INDICE) and st.toggle("Consultar o índice local (offline)", key="food_offline")
+        if alimento:
+            with st.spinner(f"Buscando informações sobre '{alimento}'..."):
+                dados = cache_streamlit.info_alimento(alimento, offline=modo_offline)
+            if dados:
+                st.subheader(dados.get('nome', 'Nome não disponível'))
+                if dados.get("imagem"): st.image(dados.get("imagem"), width=200)
+                st.write(f"**Nutri-Score:** {(dados.get('nutriscore') or '?').upper()} | **Grupo NOVA:** {dados.get('nova_group', '?')}")
+                st.write(f"**Ingredientes:** {dados.get('ingredientes', 'Não listado')}")
+                st.subheader("💡 Dicas Nutricionais")
+                dicas = gerar_dicas_nutricionais(dados)
+                for dica in dicas: st.markdown(f"- {dica}")
+            else:
+                st.error("❌ Alimento não encontrado.")
         else:
-            st.error("❌ Alimento não encontrado.")
-    else:
-        st.info("Digite o nome de um alimento acima para ver suas informações nutricionais.")
\ No newline at end of file
+            st.info("Digite o nome de um alimento acima para ver suas informações nutricionais.")
+
+        st.markdown("---")
+        st.subheader("🍽️ Analisar uma Refeição")
+        with st.form("refeicao_form"):
+            texto_refeicao = st.text_area("Um alimento por linha, no formato 'alimento; gramas' (sem gramas, considera 100 g):", key="refeicao_input")
+            analisar = st.form_submit_button("Analisar refeição")
+        if analisar and texto_refeicao.strip():
+            itens = []
+            for linha in texto_refeicao.splitlines():
+                nome, _, gramas = linha.partition(";")
+                if nome.strip():
+                    try: itens.append((nome.strip(), float(gramas.replace(",", ".")) if gramas.strip() else 100.0))
+                    except ValueError: st.warning(f"Quantidade inválida na linha '{linha}'; usando 100 g."); itens.append((nome.strip(), 100.0))
+            with st.spinner(f"Analisando {len(itens)} alimentos..."):
+                analise = analisar_refeicao(itens, offline=modo_offline)
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Calorias", f"{analise.totais['calorias']:.0f} kcal" if analise.totais.notna()['calorias'] else "?")
+            c2.metric("Açúcar", f"{analise.totais['açucar']:.1f} g" if analise.totais.notna()['açucar'] else "?")
+            c3.metric("Gordura saturada", f"{analise.totais['gordura_saturada']:.1f} g" if analise.totais.notna()['gordura_saturada'] else "?")
+            c4.metric("Proteínas", f"{analise.totais['proteinas']:.1f} g" if analise.totais.notna()['proteinas'] else "?")
+            st.dataframe(analise.itens[["consulta", "nome", "gramas", "calorias_porcao", "açucar_porcao", "gordura_saturada_porcao", "proteinas_porcao"]], hide_index=True)
+            if analise.nao_encontrados: st.error(f"❌ Não encontrados: {', '.join(analise.nao_encontrados)}")
+            for _, item in analise.itens[analise.itens["encontrado"]].iterrows():
+                st.markdown(f"**{item['nome']}**: " + " ".join(item["dicas"]))
+
+instrumentacao.finalizar_rastro(rastro)
+st.session_state.setdefault("rastros", deque(maxlen=20)).append(rastro)
+for tab_diag in tab_diagnostico:
+    with tab_diag:
+        if tab_diag.open: mostrar_diagnostico()
@@ -0,0 +1,52 @@
+# Fixtures compartilhadas: banco temporário, backends locais no lugar das APIs e fuso horário.
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import banco_dados, dados_alimentos, dados_google_fit
+from utils.backends_locais import FitnessLocal, OpenFoodFactsLocal, instalar
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Aponta o banco para um arquivo vazio em tmp_path."""
+    caminho = str(tmp_path / "health_data.db")
+    monkeypatch.setattr(banco_dados, "CAMINHO_BANCO", caminho)
+    return caminho
+
+@pytest.fixture
+def fitness():
+    """Google Fitness local, sem latência; devolve o backend (com as chamadas contadas)."""
+    backend = FitnessLocal()
+    dados_google_fit._SERVICOS.limpar()
+    with instalar(backend):
+        yield backend
+
+@pytest.fixture
+def open_food_facts():
+    backend = OpenFoodFactsLocal()
+    dados_alimentos._CACHE.limpar()
+    dados_alimentos._AUSENTES.limpar()
+    with instalar(backend):
+        yield backend
+    dados_alimentos._CACHE.limpar()
+    dados_alimentos._AUSENTES.limpar()
+
+@pytest.fixture
+def credenciais_google():
+    from google.oauth2.credentials import Credentials
+
+    return Credentials(token="local", refresh_token="local-refresh", token_uri="https://oauth2.googleapis.com/token",
+                       client_id="local", client_secret="local", expiry=datetime.utcnow() + timedelta(hours=1))
+
+@pytest.fixture
+def fuso(monkeypatch):
+    """Troca o fuso horário local do processo: `fuso("Asia/Kolkata")`."""
+    def trocar(nome):
+        monkeypatch.setenv("TZ", nome)
+        time.tzset()
+    yield trocar
+    monkeypatch.undo()
+    time.tzset()
@@ -0,0 +1,34 @@
+# Pool de conexões do banco local.
+
+import sqlite3
+
+import pytest
+
+from utils import banco_dados
+
+def test_pool_esgotado(banco):
+    pool = banco_dados.PoolConexoes(banco, tamanho=1, espera=0.05)
+    with pool.conexao():
+        with pytest.raises(banco_dados.PoolEsgotado, match="1 conexões .* 0.05 s"):
+            with pool.conexao():
+                pass
+    # Devolvida a conexão, o próximo empréstimo a reaproveita
+    with pool.conexao() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert pool._criadas == 1
+
+def test_falha_ao_conectar_devolve_a_vaga(banco, monkeypatch):
+    pool = banco_dados.PoolConexoes(banco, tamanho=1, espera=0.05)
+    conectar = banco_dados.conectar
+
+    def falhar(caminho=None):
+        monkeypatch.setattr(banco_dados, "conectar", conectar)
+        raise sqlite3.OperationalError("disco indisponível")
+
+    monkeypatch.setattr(banco_dados, "conectar", falhar)
+    with pytest.raises(sqlite3.OperationalError, match="disco indisponível"):
+        with pool.conexao():
+            pass
+    assert pool._criadas == 0
+    with pool.conexao() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
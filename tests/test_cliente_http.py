@@ -0,0 +1,57 @@
+# Orçamento do limite de taxa do Strava a partir dos cabeçalhos X-RateLimit-*.
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils import cliente_http
+from utils.cliente_http import LimiteTaxaExcedido, OrcamentoTaxa
+
+# Meio da janela de 15 minutos [900 * 2_000_000, 900 * 2_000_001)
+AGORA = 900 * 2_000_000 + 450
+FIM_JANELA = 900 * 2_000_001
+FIM_DIA = (AGORA // 86400 + 1) * 86400
+
+def _orcamento(limite, uso, familia="X-RateLimit"):
+    orcamento = OrcamentoTaxa()
+    orcamento.atualizar({f"{familia}-Limit": limite, f"{familia}-Usage": uso}, agora=AGORA)
+    return orcamento
+
+def test_abaixo_da_margem_esta_liberado():
+    assert _orcamento("600,30000", "569,100").liberado_em(AGORA) is None
+
+def test_janela_curta_segura_a_partir_de_95_por_cento():
+    assert _orcamento("600,30000", "570,100").liberado_em(AGORA) == FIM_JANELA
+    # Virada a janela, o uso anterior não conta mais
+    assert _orcamento("600,30000", "600,100").liberado_em(FIM_JANELA) is None
+
+def test_limite_diario_e_de_leitura():
+    assert _orcamento("600,30000", "10,28500").liberado_em(AGORA) == FIM_DIA
+    assert _orcamento("300,3000", "290,100", familia="X-ReadRateLimit").liberado_em(AGORA) == FIM_JANELA
+    # Vale o mais distante dos limites estourados
+    orcamento = _orcamento("300,3000", "300,3000", familia="X-ReadRateLimit")
+    orcamento.atualizar({"X-RateLimit-Limit": "600,30000", "X-RateLimit-Usage": "600,100"}, agora=AGORA)
+    assert orcamento.liberado_em(AGORA) == FIM_DIA
+
+@pytest.mark.parametrize("limite, uso", [("abc", "1,2"), ("600,30000", ""), ("600", "600"), (None, "600,100")])
+def test_cabecalhos_invalidos_sao_ignorados(limite, uso):
+    assert _orcamento(limite, uso).liberado_em(AGORA) is None
+
+def test_aguardar(monkeypatch):
+    esperas = []
+    relogio = SimpleNamespace(time=lambda: FIM_JANELA - 10, sleep=esperas.append)
+    monkeypatch.setattr(cliente_http, "time", relogio)
+    orcamento = _orcamento("600,30000", "590,100")
+
+    orcamento.aguardar()
+    assert esperas == [10]
+
+    relogio.time = lambda: FIM_JANELA - cliente_http.ESPERA_MAXIMA_S - 1
+    with pytest.raises(LimiteTaxaExcedido) as erro:
+        orcamento.aguardar()
+    assert erro.value.liberado_em == FIM_JANELA
+    assert esperas == [10]
+
+    relogio.time = lambda: FIM_JANELA
+    orcamento.aguardar()
+    assert esperas == [10]
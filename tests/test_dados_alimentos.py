@@ -0,0 +1,56 @@
+# Buscas no Open Food Facts (local) com o cache em memória, em disco e o de "não encontrado".
+
+import pytest
+import streamlit as st
+
+from utils import cache_streamlit, dados_alimentos
+from utils.backends_locais import OpenFoodFactsLocal, Perturbacao, instalar
+
+@pytest.fixture(autouse=True)
+def limpar_cache_streamlit():
+    st.cache_data.clear()
+
+@pytest.fixture
+def falhando(banco):
+    """Open Food Facts que responde 400 a tudo (erro sem novas tentativas)."""
+    backend = OpenFoodFactsLocal(Perturbacao(taxa_erro=1.0, status_erro=400))
+    dados_alimentos._CACHE.limpar()
+    dados_alimentos._AUSENTES.limpar()
+    with instalar(backend):
+        yield backend
+
+def test_produto_encontrado_vai_para_o_cache(banco, open_food_facts):
+    assert dados_alimentos.buscar_info_alimento("Aveia  em flocos")["codigo"] == "7896051111016"
+    assert dados_alimentos.buscar_info_alimento("aveia em flocos")["nome"] == "Aveia em flocos"
+    # A busca por nome também guarda o código de barras
+    assert dados_alimentos.buscar_alimento_por_codigo("7896051111016")["nome"] == "Aveia em flocos"
+    assert open_food_facts.total_chamadas == 1
+
+@pytest.mark.parametrize("consulta", ["pão de queijo", "7890000000000"])
+def test_nao_encontrado_nao_repete_a_consulta(banco, open_food_facts, consulta):
+    assert dados_alimentos.buscar_info_alimento(consulta) is None
+    assert dados_alimentos.alimento_ausente(consulta)
+    assert dados_alimentos.buscar_info_alimento(consulta) is None
+    assert open_food_facts.total_chamadas == 1
+
+def test_erro_nao_conta_como_nao_encontrado(falhando):
+    assert dados_alimentos.buscar_info_alimento("aveia") is None
+    assert not dados_alimentos.alimento_ausente("aveia")
+    assert dados_alimentos.buscar_info_alimento("aveia") is None
+    assert falhando.total_chamadas == 2
+
+def test_cache_streamlit_guarda_nao_encontrado_por_pouco_tempo(banco, open_food_facts, monkeypatch):
+    assert cache_streamlit.info_alimento("pão de queijo") is None
+    dados_alimentos._AUSENTES.limpar()
+    assert cache_streamlit.info_alimento("pão de queijo") is None
+    assert open_food_facts.total_chamadas == 1
+
+    monkeypatch.setattr(cache_streamlit, "TTL_AUSENTE_S", 0)
+    dados_alimentos._AUSENTES.limpar()
+    assert cache_streamlit.info_alimento("pão de queijo") is None
+    assert open_food_facts.total_chamadas == 2
+
+def test_cache_streamlit_nao_guarda_erro(falhando):
+    assert cache_streamlit.info_alimento("aveia") is None
+    assert cache_streamlit.info_alimento("aveia") is None
+    assert falhando.total_chamadas == 2
@@ -0,0 +1,41 @@
+# Rótulos dos buckets do Google Fit, contra o Google Fitness local (dados sintéticos por dia UTC).
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import dados_google_fit
+
+@pytest.mark.parametrize("nome_fuso", ["America/Sao_Paulo", "Asia/Kolkata"])
+@pytest.mark.parametrize("bucket, dias", [("hora", 3), ("dia", 14), ("semana", 8 * 7)])
+def test_passos_bpm_e_sono_com_os_mesmos_rotulos(fitness, credenciais_google, fuso, nome_fuso, bucket, dias):
+    fuso(nome_fuso)
+    # Início fora da fronteira de qualquer bucket; fim no passado, com todas as noites já encerradas
+    fim = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    inicio = (fim - timedelta(days=dias)).replace(hour=15, minute=30)
+
+    passos = dados_google_fit.obter_passos_diarios(credenciais_google, inicio, fim, bucket)
+    bpm = dados_google_fit.obter_batimentos_medios(credenciais_google, inicio, fim, bucket)
+    sono = dados_google_fit.obter_sono(credenciais_google, inicio, fim, bucket)
+
+    # Há batimento em todo bucket; passos faltam nas horas sem caminhada
+    assert passos and sono
+    assert set(passos) <= set(bpm)
+    assert set(sono) <= set(bpm)
+    if bucket != "hora":
+        assert set(passos) == set(bpm)
+
+    formato = "%Y-%m-%d %H:00" if bucket == "hora" else "%Y-%m-%d"
+    rotulos = sorted(datetime.strptime(r, formato) for r in bpm)
+    passo = {"hora": timedelta(hours=1), "dia": timedelta(days=1), "semana": timedelta(weeks=1)}[bucket]
+    assert all(b - a == passo for a, b in zip(rotulos, rotulos[1:]))
+    assert rotulos[0] <= inicio < rotulos[0] + passo
+    if bucket == "semana":
+        assert all(r.weekday() == 0 for r in rotulos)
+
+def test_painel_comeca_na_meia_noite_de_dias_atras(fitness, credenciais_google, fuso):
+    fuso("America/Sao_Paulo")
+    dados = dados_google_fit.obter_dados_google_fit(credenciais_google, dias=7)
+    primeiro_dia = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+    assert min(dados.passos) == min(dados.bpm) == primeiro_dia
+    assert min(dados.sono) >= primeiro_dia
@@ -0,0 +1,45 @@
+# Dicas nutricionais (uma consulta e em lote) e análise de refeições com o Open Food Facts local.
+
+import pandas as pd
+import pytest
+
+from utils import dados_alimentos
+from utils.dados_alimentos import DICA_EQUILIBRADA, REGRAS_DICAS, aplicar_regras_dicas, gerar_dicas_nutricionais
+
+NOVA_4, NOVA_3, NUTRISCORE, ACUCAR, GORDURA_SATURADA = (dica for *_, dica in REGRAS_DICAS)
+
+CASOS = [
+    ({}, [DICA_EQUILIBRADA]),
+    ({"nova_group": "4"}, [NOVA_4]),
+    ({"nova_group": 3, "nutriscore": "D", "açucar": "20"}, [NOVA_3, NUTRISCORE, ACUCAR]),
+    ({"nova_group": None, "nutriscore": None, "gordura_saturada": 5.5}, [GORDURA_SATURADA]),
+    ({"nutriscore": "?", "açucar": 15, "gordura_saturada": 5}, [DICA_EQUILIBRADA]),
+    ({"nova_group": 4.0, "nutriscore": "e", "açucar": 15.1, "gordura_saturada": "9"},
+     [NOVA_4, NUTRISCORE, ACUCAR, GORDURA_SATURADA]),
+]
+
+@pytest.mark.parametrize("dados, esperado", CASOS)
+def test_dicas_de_uma_consulta(dados, esperado):
+    assert gerar_dicas_nutricionais(dados) == esperado
+
+def test_dicas_em_lote():
+    campos = {campo: None for campo, *_ in REGRAS_DICAS}
+    tabela = pd.DataFrame([{**campos, **dados} for dados, _ in CASOS])
+    assert aplicar_regras_dicas(tabela).tolist() == [esperado for _, esperado in CASOS]
+
+def test_analisar_refeicao(banco, open_food_facts):
+    analise = dados_alimentos.analisar_refeicao([
+        ("arroz branco", 150), ("feijão carioca", 100), ("pão de queijo", 80), ("arroz branco", 50),
+    ])
+    itens = analise.itens
+    assert itens["encontrado"].tolist() == [True, True, False, True]
+    assert itens.loc[itens["encontrado"], "nome"].tolist() == ["Arroz branco tipo 1", "Feijão carioca", "Arroz branco tipo 1"]
+    assert itens["calorias_porcao"].tolist()[:2] == [537, 329]
+    assert itens["calorias_porcao"].iloc[3] == pytest.approx(179)
+    assert pd.isna(itens["calorias_porcao"].iloc[2])
+    assert analise.totais["calorias"] == pytest.approx(537 + 329 + 179)
+    assert analise.totais["proteinas"] == pytest.approx(7.2 * 1.5 + 21 + 7.2 * 0.5)
+    assert analise.nao_encontrados == ["pão de queijo"]
+    assert itens["dicas"].tolist() == [[DICA_EQUILIBRADA], [DICA_EQUILIBRADA], [], [DICA_EQUILIBRADA]]
+    # Nomes repetidos são consultados uma só vez
+    assert open_food_facts.total_chamadas == 3
@@ -0,0 +1,53 @@
+# Cookie assinado do usuário e nonces de uso único do 'state' do OAuth.
+
+import pytest
+
+from utils import identidade
+
+USUARIO = "0123456789abcdef0123456789abcdef"
+OUTRO = "fedcba9876543210fedcba9876543210"
+
+@pytest.fixture(autouse=True)
+def segredo(monkeypatch):
+    monkeypatch.setattr(identidade, "_SEGREDO", b"segredo-de-teste")
+    monkeypatch.setattr(identidade, "_ESTADOS_OAUTH", {})
+
+def test_cookie_valido():
+    assert identidade.usuario_do_cookie(identidade.valor_cookie(USUARIO)) == USUARIO
+
+def test_cookie_adulterado_ou_forjado_e_recusado(monkeypatch):
+    valor = identidade.valor_cookie(USUARIO)
+    assinatura = valor.partition(".")[2]
+    adulterada = assinatura[:-1] + ("0" if assinatura[-1] != "0" else "1")
+    for forjado in (f"{OUTRO}.{assinatura}", f"{USUARIO}.{adulterada}", USUARIO, f"{USUARIO}.",
+                    f"{USUARIO.upper()}.{assinatura}", f"../{USUARIO}.{assinatura}", "", None, 123):
+        assert identidade.usuario_do_cookie(forjado) is None
+
+    # Assinado com outra chave
+    monkeypatch.setattr(identidade, "_SEGREDO", b"outra-chave")
+    assert identidade.usuario_do_cookie(valor) is None
+
+def test_nonce_vale_uma_vez():
+    nonce, verificador = identidade.novo_estado_oauth(USUARIO, "google")
+    assert identidade.estado_pendente(nonce)
+    assert identidade.consumir_estado_oauth(nonce, USUARIO, "google") == verificador
+    assert not identidade.estado_pendente(nonce)
+    assert identidade.consumir_estado_oauth(nonce, USUARIO, "google") is None
+
+def test_nonce_de_outro_usuario_ou_provedor_e_recusado():
+    nonce, verificador = identidade.novo_estado_oauth(USUARIO, "strava")
+    assert identidade.consumir_estado_oauth(nonce, OUTRO, "strava") is None
+    assert identidade.consumir_estado_oauth(nonce, USUARIO, "google") is None
+    assert identidade.consumir_estado_oauth("nonce-inventado", USUARIO, "strava") is None
+    assert identidade.consumir_estado_oauth(None, USUARIO, "strava") is None
+    # As tentativas recusadas não gastam o nonce do dono
+    assert identidade.consumir_estado_oauth(nonce, USUARIO, "strava") == verificador
+
+def test_nonce_expirado_e_recusado(monkeypatch):
+    monkeypatch.setattr(identidade, "VALIDADE_ESTADO_OAUTH_S", -1)
+    nonce, _ = identidade.novo_estado_oauth(USUARIO, "google")
+    assert not identidade.estado_pendente(nonce)
+    assert identidade.consumir_estado_oauth(nonce, USUARIO, "google") is None
+    # Expirados são descartados no próximo login
+    identidade.novo_estado_oauth(USUARIO, "google")
+    assert nonce not in identidade._ESTADOS_OAUTH
@@ -0,0 +1,63 @@
+# Importação do dump do Open Food Facts e buscas no índice offline, com arquivos de amostra.
+
+import os
+
+import pytest
+
+from utils import indice_alimentos
+
+FIXTURAS = os.path.join(os.path.dirname(__file__), "fixtures")
+JSONL = os.path.join(FIXTURAS, "off_amostra.jsonl")
+CSV = os.path.join(FIXTURAS, "off_amostra.csv")
+
+@pytest.fixture
+def indice_jsonl(tmp_path):
+    caminho = str(tmp_path / "off_index.db")
+    assert indice_alimentos.importar(JSONL, caminho) == 3
+    return caminho
+
+def test_importar_jsonl_ignora_produtos_sem_nome_e_linhas_invalidas(indice_jsonl):
+    for codigo in ("7890000000011", "7890000000028", "7890000000035"):
+        assert indice_alimentos.buscar_por_codigo(codigo, indice_jsonl) is not None
+    for codigo in ("7890000000042", "7890000000059"):
+        assert indice_alimentos.buscar_por_codigo(codigo, indice_jsonl) is None
+
+def test_buscar_por_nome_com_acentos_e_prefixo(indice_jsonl):
+    resultados = indice_alimentos.buscar("feij", caminho_indice=indice_jsonl)
+    assert [p["nome"] for p in resultados] == ["Feijão preto"]
+    assert indice_alimentos.buscar("arroz", caminho_indice=indice_jsonl)[0]["codigo"] == "7890000000011"
+    assert indice_alimentos.buscar("   ", caminho_indice=indice_jsonl) == []
+
+def test_nome_null_ou_vazio_cai_no_product_name(indice_jsonl):
+    feijao = indice_alimentos.buscar_por_codigo("7890000000028", indice_jsonl)
+    assert feijao["nome"] == "Feijão preto"
+    assert feijao["nutriscore"] == "?"
+    assert feijao["ingredientes"] == "feijão preto"
+    assert feijao["nova_group"] is None
+
+    biscoito = indice_alimentos.buscar_por_codigo("7890000000035", indice_jsonl)
+    assert biscoito["nome"] == "Biscoito recheado sabor chocolate"
+    assert biscoito["ingredientes"].startswith("farinha de trigo")
+    assert indice_alimentos.buscar("biscoito chocolate", caminho_indice=indice_jsonl)[0]["codigo"] == "7890000000035"
+
+def test_numeros_convertidos(indice_jsonl):
+    biscoito = indice_alimentos.buscar_por_codigo("7890000000035", indice_jsonl)
+    assert biscoito["nova_group"] == 4
+    assert biscoito["calorias"] == 480.0
+    assert biscoito["açucar"] == 32.5
+    assert biscoito["gordura"] is None
+
+def test_importar_csv(tmp_path):
+    caminho = str(tmp_path / "off_index.db")
+    assert indice_alimentos.importar(CSV, caminho) == 2
+    banana = indice_alimentos.buscar_por_codigo("7890000000066", caminho)
+    assert banana["nome"] == "Banana prata"
+    assert banana["nutriscore"] == "?"
+    assert banana["imagem"] == "https://exemplo.org/banana.jpg"
+    assert banana["açucar"] == 15.2
+    iogurte = indice_alimentos.buscar("iogurte integral", caminho_indice=caminho)
+    assert [p["nome"] for p in iogurte] == ["Iogurte natural integral"]
+
+def test_indice_inexistente(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        indice_alimentos.buscar("arroz", caminho_indice=str(tmp_path / "nao_existe.db"))
@@ -0,0 +1,42 @@
+# Simplificação das rotas usada nas miniaturas dos mapas.
+
+import math
+import random
+
+import pytest
+
+from utils.mapas import simplificar_rota
+
+def _rota(n, semente=3):
+    rng = random.Random(semente)
+    lat, lon, direcao = -23.55, -46.63, 0.0
+    pontos = []
+    for _ in range(n):
+        direcao += rng.uniform(-0.5, 0.5)
+        lat += 1e-4 * math.cos(direcao)
+        lon += 1e-4 * math.sin(direcao)
+        pontos.append((lat, lon))
+    return pontos
+
+@pytest.mark.parametrize("n, max_pontos", [(500, 60), (2000, 25), (61, 60), (100, 3)])
+def test_simplificar_respeita_o_limite_e_as_pontas(n, max_pontos):
+    rota = _rota(n)
+    simples = simplificar_rota(rota, max_pontos)
+    assert len(simples) == max_pontos
+    assert simples[0] == rota[0] and simples[-1] == rota[-1]
+    # Só pontos da rota original, na ordem
+    indices = [rota.index(p) for p in simples]
+    assert indices == sorted(indices)
+
+def test_rota_curta_fica_igual():
+    rota = _rota(40)
+    assert simplificar_rota(rota, 60) == rota
+    assert simplificar_rota(rota[:2], 1) == rota[:2]
+    assert simplificar_rota([], 60) == []
+
+def test_rota_reta_mantem_a_forma():
+    reta = [(0.0, i * 1e-4) for i in range(100)] + [(i * 1e-4, 99e-4) for i in range(1, 100)]
+    simples = simplificar_rota(reta, 10)
+    # A esquina é o primeiro ponto escolhido
+    assert (0.0, 99e-4) in simples
+    assert len(simples) <= 10
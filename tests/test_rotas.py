@@ -0,0 +1,72 @@
+# Decodificação em lote das polylines e métricas vetorizadas por rota.
+
+import random
+
+import numpy as np
+import polyline
+import pytest
+
+from utils import rotas as r
+
+def _rota_aleatoria(rng, n):
+    lat, lon = rng.uniform(-60, 60), rng.uniform(-170, 170)
+    pontos = []
+    for _ in range(n):
+        lat += rng.uniform(-0.01, 0.01)
+        lon += rng.uniform(-0.01, 0.01)
+        pontos.append((lat, lon))
+    return pontos
+
+def _haversine_km(pontos):
+    total = 0.0
+    for (lat1, lon1), (lat2, lon2) in zip(pontos, pontos[1:]):
+        total += float(r._haversine_km(lat1, lon1, lat2, lon2))
+    return total
+
+def test_decodificar_igual_ao_polyline():
+    rng = random.Random(42)
+    polylines = [polyline.encode(_rota_aleatoria(rng, rng.randint(1, 40))) for _ in range(50)]
+    for i in (0, 7, 7, 30, 52):
+        polylines.insert(i, rng.choice(["", None]))
+
+    rotas = r.decodificar_polylines(polylines)
+    assert len(rotas) == len(polylines)
+    for i, texto in enumerate(polylines):
+        esperado = np.array(polyline.decode(texto) if texto else np.empty((0, 2)))
+        np.testing.assert_allclose(rotas.rota(i), esperado.reshape(-1, 2), atol=1e-9)
+
+def test_decodificar_so_vazias():
+    rotas = r.decodificar_polylines(["", None])
+    assert len(rotas) == 2 and rotas.coordenadas.shape == (0, 2)
+    assert r.distancias_km(rotas).tolist() == [0.0, 0.0]
+
+def test_distancias_nao_somam_o_salto_entre_rotas():
+    rng = random.Random(1)
+    trajetos = [_rota_aleatoria(rng, 20), [(10.0, 10.0)], [], _rota_aleatoria(rng, 5), _rota_aleatoria(rng, 2)]
+    rotas = r.decodificar_polylines([polyline.encode(t) if t else "" for t in trajetos])
+    esperado = [_haversine_km(polyline.decode(polyline.encode(t))) if t else 0.0 for t in trajetos]
+    np.testing.assert_allclose(r.distancias_km(rotas), esperado, rtol=1e-9)
+    assert esperado[0] > 0 and esperado[1] == 0
+
+def test_rotas_mais_frequentes():
+    rng = random.Random(7)
+    casa_parque = _rota_aleatoria(rng, 30)
+    casa_trabalho = _rota_aleatoria(rng, 30)
+    avulsa = _rota_aleatoria(rng, 30)
+    # Pequeno ruído de GPS (~10 m) entre as repetições
+    def repetir(rota):
+        return [(lat + rng.uniform(-1e-4, 1e-4), lon + rng.uniform(-1e-4, 1e-4)) for lat, lon in rota]
+
+    trajetos = [casa_parque, casa_trabalho, repetir(casa_parque), avulsa, None, repetir(casa_trabalho),
+                repetir(casa_parque)]
+    rotas = r.decodificar_polylines([polyline.encode(t) if t else None for t in trajetos])
+    grupos = r.rotas_mais_frequentes(rotas, top=5)
+    assert [g.tolist() for g in grupos] == [[0, 2, 6], [1, 5]]
+    assert [g.tolist() for g in r.rotas_mais_frequentes(rotas, top=1)] == [[0, 2, 6]]
+    assert r.rotas_mais_frequentes(r.decodificar_polylines([None, ""])) == []
+
+@pytest.mark.parametrize("precisao", [5, 6])
+def test_precisao(precisao):
+    pontos = [(-23.55052, -46.633308), (-23.551, -46.634)]
+    rotas = r.decodificar_polylines([polyline.encode(pontos, precisao)], precisao=precisao)
+    np.testing.assert_allclose(rotas.rota(0), polyline.decode(polyline.encode(pontos, precisao), precisao), atol=1e-9)
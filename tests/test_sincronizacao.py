@@ -0,0 +1,112 @@
+# Marcas da sincronização incremental do Google Fit, contra o Google Fitness local e um banco temporário.
+
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from utils import banco_dados, sincronizacao
+
+@pytest.fixture
+def inicios_diarios(monkeypatch):
+    """Registra o início (em segundos) de cada busca da série diária."""
+    inicios = []
+    obter = sincronizacao.obter_pontos_diarios
+
+    def espiar(credentials, start_time_ms, end_time_ms):
+        inicios.append(start_time_ms // 1000)
+        return obter(credentials, start_time_ms, end_time_ms)
+
+    monkeypatch.setattr(sincronizacao, "obter_pontos_diarios", espiar)
+    return inicios
+
+@pytest.fixture(autouse=True)
+def ambiente(banco, fitness, fuso):
+    fuso("America/Sao_Paulo")
+
+def _marca(fonte):
+    with banco_dados.conexao() as conn:
+        return banco_dados.obter_marca(conn, fonte)[0]
+
+def _meia_noite(dias_atras):
+    return int((datetime.now() - timedelta(days=dias_atras)).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def test_segunda_sincronizacao_parte_da_marca(credenciais_google, inicios_diarios):
+    sincronizacao.sincronizar_google_fit(credenciais_google, intervalo_minimo=0)
+    marca = _marca("google_fit:diario")
+    assert inicios_diarios == [_meia_noite(sincronizacao.DIAS_HISTORICO_INICIAL)]
+    assert marca == _meia_noite(0)
+
+    sincronizacao.sincronizar_google_fit(credenciais_google, intervalo_minimo=0)
+    assert inicios_diarios[1:] == [marca]
+
+    # Dentro do intervalo mínimo não há nova busca
+    sincronizacao.sincronizar_google_fit(credenciais_google)
+    assert len(inicios_diarios) == 2
+
+def test_fonte_vazia_avanca_a_marca_ate_o_piso(credenciais_google, monkeypatch):
+    monkeypatch.setattr(sincronizacao, "obter_pontos_fonte", lambda *args: [])
+    sincronizacao.sincronizar_google_fit(credenciais_google, intervalo_minimo=0)
+    piso = _meia_noite(sincronizacao.DIAS_REABERTOS_SEM_DADOS)
+    assert _marca("google_fit:peso") == _marca("google_fit:altura") == piso
+
+    # A marca não recua numa sincronização seguinte, também vazia
+    sincronizacao.sincronizar_google_fit(credenciais_google, intervalo_minimo=0)
+    assert _marca("google_fit:peso") == piso
+
+def test_marca_fora_da_meia_noite_refaz_a_serie_uma_vez(credenciais_google, inicios_diarios):
+    # Estado deixado por versões antigas: dias contados a partir da hora da primeira sincronização
+    desalinhado = _meia_noite(10) + 15 * 3600
+    with banco_dados.conexao() as conn, conn:
+        banco_dados.gravar_medicoes(conn, "passos", [(desalinhado - 86400, 1234), (desalinhado, 4321)])
+        banco_dados.gravar_marca(conn, "google_fit:diario", desalinhado)
+
+    sincronizacao.sincronizar_google_fit(credenciais_google, intervalo_minimo=0)
+    assert inicios_diarios == [_meia_noite(sincronizacao.DIAS_HISTORICO_INICIAL)]
+    with banco_dados.conexao() as conn:
+        timestamps = [ts for ts, in conn.execute("SELECT timestamp FROM medicoes WHERE metrica = 'passos'")]
+    assert timestamps and desalinhado not in timestamps
+    assert all(ts == int(datetime.fromtimestamp(ts).replace(hour=0).timestamp()) for ts in timestamps)
+
+    sincronizacao.sincronizar_google_fit(credenciais_google, intervalo_minimo=0)
+    assert inicios_diarios[1:] == [_marca("google_fit:diario")] == [_meia_noite(0)]
+
+def _atividades(*inicios):
+    return [{"id": inicio, "inicio": inicio, "nome": f"Corrida {inicio}"} for inicio in inicios]
+
+def test_falha_no_strava_nao_conta_como_sincronizacao(monkeypatch):
+    pedidos = []
+
+    def iterar(token, after=0):
+        pedidos.append(after)
+        yield from _atividades(100, 200, 300)
+        raise requests.ConnectionError("sem rede")
+
+    monkeypatch.setattr(sincronizacao, "POR_PAGINA_MAX", 2)
+    monkeypatch.setattr(sincronizacao, "iterar_atividades", iterar)
+    sincronizacao.sincronizar_strava("token")
+    with banco_dados.conexao() as conn:
+        assert banco_dados.obter_marca(conn, "strava:atividades") == (300, None)
+        assert [at["id"] for at in banco_dados.ler_atividades(conn)[0]] == [300, 200, 100]
+
+    # Sem o atualizado_em, a nova tentativa não espera o intervalo mínimo e continua da marca
+    def retomar(token, after=0):
+        pedidos.append(after)
+        yield from _atividades(400)
+
+    monkeypatch.setattr(sincronizacao, "iterar_atividades", retomar)
+    sincronizacao.sincronizar_strava("token")
+    assert pedidos == [0, 300]
+    with banco_dados.conexao() as conn:
+        marca, atualizado_em = banco_dados.obter_marca(conn, "strava:atividades")
+    assert marca == 400 and atualizado_em is not None
+
+def test_falha_na_primeira_sincronizacao_do_strava_nao_grava_marca(monkeypatch):
+    def iterar(token, after=0):
+        raise requests.HTTPError("429")
+        yield
+
+    monkeypatch.setattr(sincronizacao, "iterar_atividades", iterar)
+    sincronizacao.sincronizar_strava("token")
+    with banco_dados.conexao() as conn:
+        assert banco_dados.obter_marca(conn, "strava:atividades") == (None, None)
@@ -0,0 +1,448 @@
+# Servidores locais que imitam as APIs usadas pelo painel (Google Fitness, Strava e
+# Open Food Facts), para medir e comparar o desempenho da camada de dados sem rede.
+#
+# Uso:
+#     with backends_locais.instalar(FitnessLocal(), StravaLocal(), OpenFoodFactsLocal()) as roteador:
+#         ...  # todo HTTP do app passa pelos backends locais
+#         print(roteador.chamadas)
+#
+# Cada backend aceita uma Perturbacao (latência e taxa de erros). Hosts sem
+# backend instalado falham como falha de conexão, então nada vaza para a rede.
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import httplib2
+import requests
+from polyline import encode
+from requests.adapters import BaseAdapter
+from urllib3.exceptions import MaxRetryError
+
+from utils import cliente_http, dados_google_fit
+from utils.dados_strava import _timestamp_strava
+
+DIA_MS = 86400000
+
+class FalhaConexaoSimulada(ConnectionError):
+    """Erro de conexão injetado (ou host sem backend local)."""
+
+@dataclass
+class Perturbacao:
+    """Latência e erros injetados em cada chamada a um backend local."""
+    latencia_s: float = 0.0
+    # Latência extra sorteada entre 0 e este valor
+    variacao_s: float = 0.0
+    # Fração das chamadas que falham
+    taxa_erro: float = 0.0
+    # Status HTTP das falhas; None simula falha de conexão
+    status_erro: int | None = 503
+    semente: int | None = 0
+
+class BackendLocal:
+    """Base dos backends: conta as chamadas, aplica a perturbação e delega a `rotear`."""
+
+    hosts = ()
+
+    def __init__(self, perturbacao=None):
+        self.perturbacao = perturbacao or Perturbacao()
+        self.chamadas = Counter()
+        self._rng = random.Random(self.perturbacao.semente)
+        self._lock = threading.Lock()
+
+    def rotear(self, metodo, caminho, params, corpo, headers):
+        """Retorna (status, dados JSON, cabeçalhos) para a requisição."""
+        raise NotImplementedError
+
+    def atender(self, metodo, url, corpo=None, headers=None):
+        """Atende uma requisição; retorna (status, corpo em bytes, cabeçalhos)."""
+        partes = urlsplit(url)
+        caminho = unquote(partes.path)
+        p = self.perturbacao
+        with self._lock:
+            self.chamadas[f"{metodo} {partes.netloc}{self._rota(caminho)}"] += 1
+            espera = p.latencia_s + (self._rng.uniform(0, p.variacao_s) if p.variacao_s else 0)
+            falhou = p.taxa_erro > 0 and self._rng.random() < p.taxa_erro
+        if espera:
+            time.sleep(espera)
+        if falhou:
+            if p.status_erro is None:
+                raise FalhaConexaoSimulada(f"Falha de conexão simulada em {partes.netloc}")
+            return p.status_erro, json.dumps({"erro": "falha simulada"}).encode(), {"content-type": "application/json"}
+        if isinstance(corpo, bytes):
+            corpo = corpo.decode()
+        status, dados, extras = self.rotear(metodo, caminho, dict(parse_qsl(partes.query)),
+                                            json.loads(corpo) if corpo and corpo.startswith(("{", "[")) else corpo,
+                                            headers or {})
+        return status, json.dumps(dados).encode(), {"content-type": "application/json", **extras}
+
+    @staticmethod
+    def _rota(caminho):
+        """Agrupa caminhos com ids (ex.: /athletes/123/stats -> /athletes/{id}/stats) na contagem."""
+        return re.sub(r"/\d+(?:-\d+)?(?=/|\.json|$)", "/{id}", caminho)
+
+    @property
+    def total_chamadas(self):
+        return sum(self.chamadas.values())
+
+    def zerar(self):
+        with self._lock:
+            self.chamadas.clear()
+
+# --- Google Fitness ---
+
+def _ms_rfc3339(texto):
+    return int(datetime.fromisoformat(texto.replace("Z", "+00:00")).timestamp() * 1000)
+
+class FitnessLocal(BackendLocal):
+    """Google Fitness v1 com dados sintéticos determinísticos (por dia, a partir da semente).
+
+    Atende agregações (passos e batimentos, em buckets de qualquer duração),
+    sessões de sono paginadas, pontos de peso/altura e a renovação do token OAuth.
+    """
+
+    hosts = ("fitness.googleapis.com", "oauth2.googleapis.com")
+
+    def __init__(self, perturbacao=None, dias_historico=3 * 365, sessoes_por_pagina=50, semente=0):
+        super().__init__(perturbacao)
+        self.semente = semente
+        self.sessoes_por_pagina = sessoes_por_pagina
+        self.primeiro_dia = int(time.time() * 1000) // DIA_MS - dias_historico
+
+    def _dia(self, dia):
+        rng = random.Random(self.semente * 1000003 + dia)
+        fc_media = rng.gauss(72, 4)
+        sono_inicio = dia * DIA_MS + int((22 + rng.uniform(0, 2)) * 3600000)
+        return {
+            "passos": max(int(rng.gauss(8000, 2500)), 0),
+            "fc_media": fc_media,
+            "fc_max": fc_media + rng.uniform(40, 70),
+            "fc_min": 60 - 0.003 * (dia - self.primeiro_dia) + rng.gauss(0, 1.5),
+            "sono": (sono_inicio, sono_inicio + int(rng.uniform(6, 8.5) * 3600000)),
+        }
+
+    def _dias(self, inicio_ms, fim_ms):
+        agora_dia = int(time.time() * 1000) // DIA_MS
+        return range(max(inicio_ms // DIA_MS, self.primeiro_dia), min((fim_ms - 1) // DIA_MS, agora_dia) + 1)
+
+    def _bucket(self, metricas, inicio, fim):
+        dias = [(d, self._dia(d)) for d in self._dias(inicio, fim)]
+        datasets = []
+        for metrica in metricas:
+            pontos = []
+            if dias and "step_count" in metrica:
+                # Passos distribuídos entre 7h e 23h de cada dia
+                passos = sum(v["passos"] * max(min(fim, d * DIA_MS + 23 * 3600000) - max(inicio, d * DIA_MS + 7 * 3600000), 0)
+                             / (16 * 3600000) for d, v in dias)
+                if passos:
+                    pontos.append({"value": [{"intVal": int(passos)}]})
+            elif dias and "heart_rate" in metrica:
+                pontos.append({"value": [{"fpVal": sum(v["fc_media"] for _, v in dias) / len(dias)},
+                                         {"fpVal": max(v["fc_max"] for _, v in dias)},
+                                         {"fpVal": min(v["fc_min"] for _, v in dias)}]})
+            for ponto in pontos:
+                ponto.update({"startTimeNanos": str(inicio * 10**6), "endTimeNanos": str(fim * 10**6)})
+            datasets.append({"point": pontos})
+        return {"startTimeMillis": str(inicio), "endTimeMillis": str(fim), "dataset": datasets}
+
+    def _agregar(self, corpo):
+        duracao = int(corpo["bucketByTime"]["durationMillis"])
+        metricas = [a["dataTypeName"] for a in corpo["aggregateBy"]]
+        inicio, fim = int(corpo["startTimeMillis"]), int(corpo["endTimeMillis"])
+        return {"bucket": [self._bucket(metricas, a, min(a + duracao, fim)) for a in range(inicio, fim, duracao)]}
+
+    def _sessoes(self, params):
+        inicio, fim = _ms_rfc3339(params["startTime"]), _ms_rfc3339(params["endTime"])
+        sessoes = []
+        for d in self._dias(inicio - DIA_MS, fim):
+            comeco, termino = self._dia(d)["sono"]
+            if comeco < fim and termino > inicio and termino <= time.time() * 1000:
+                sessoes.append({"id": f"sono-{d}", "name": "Sono", "activityType": 72,
+                                "startTimeMillis": str(comeco), "endTimeMillis": str(termino)})
+        desloc = int(params.get("pageToken") or 0)
+        resposta = {"session": sessoes[desloc:desloc + self.sessoes_por_pagina]}
+        if desloc + self.sessoes_por_pagina < len(sessoes):
+            resposta["nextPageToken"] = str(desloc + self.sessoes_por_pagina)
+        return resposta
+
+    def _pontos_fonte(self, fonte, dataset_id):
+        inicio_ns, fim_ns = (int(v) for v in dataset_id.split("-"))
+        if "weight" in fonte:
+            valores = [(d * DIA_MS + 7 * 3600000, 75 + random.Random(self.semente + d).gauss(0, 0.8))
+                       for d in self._dias(inicio_ns // 10**6, fim_ns // 10**6) if d % 7 == 0]
+        elif "height" in fonte:
+            ts = max(self.primeiro_dia, int(time.time() * 1000) // DIA_MS - 180) * DIA_MS
+            valores = [(ts, 1.75)] if inicio_ns <= ts * 10**6 < fim_ns else []
+        else:
+            valores = []
+        return {"dataSourceId": fonte, "point": [
+            {"startTimeNanos": str(ts * 10**6), "endTimeNanos": str(ts * 10**6), "value": [{"fpVal": v}]} for ts, v in valores]}
+
+    def rotear(self, metodo, caminho, params, corpo, headers):
+        if caminho == "/token":
+            return 200, {"access_token": f"local-{time.time_ns()}", "expires_in": 3599, "token_type": "Bearer"}, {}
+        if caminho.endswith("/dataset:aggregate"):
+            return 200, self._agregar(corpo), {}
+        if caminho.endswith("/sessions"):
+            return 200, self._sessoes(params), {}
+        m = re.search(r"/dataSources/(.+)/datasets/(\d+-\d+)$", caminho)
+        if m:
+            return 200, self._pontos_fonte(*m.groups()), {}
+        return 404, {"error": {"code": 404, "message": f"Rota desconhecida: {caminho}"}}, {}
+
+# --- Strava ---
+
+class StravaLocal(BackendLocal):
+    """API v3 do Strava com `n_atividades` sintéticas (rotas que se repetem) e cabeçalhos de limite de taxa."""
+
+    hosts = ("www.strava.com",)
+    LIMITE = (200, 2000)
+    LIMITE_LEITURA = (100, 1000)
+
+    def __init__(self, perturbacao=None, n_atividades=300, pontos_por_rota=(150, 400), atleta_id=1001, semente=0):
+        super().__init__(perturbacao)
+        self.atleta_id = atleta_id
+        self._uso = [0, 0]
+        rng = random.Random(semente)
+        bases = [(-23.55 + rng.uniform(-0.1, 0.1), -46.63 + rng.uniform(-0.1, 0.1)) for _ in range(5)]
+        agora = int(time.time()) - 3600
+        self.atividades = []
+        for i in range(n_atividades):
+            lat, lon = bases[rng.randrange(len(bases))]
+            n = rng.randint(*pontos_por_rota)
+            raio = rng.uniform(0.005, 0.02)
+            rota = [(lat + raio * math.sin(2 * math.pi * k / n), lon + raio * math.cos(2 * math.pi * k / n)) for k in range(n)]
+            tipo = "Run" if rng.random() < 0.7 else "Ride"
+            self.atividades.append({
+                "id": 10**9 + i,
+                "athlete": {"id": atleta_id},
+                "name": f"{'Corrida' if tipo == 'Run' else 'Pedalada'} {i}",
+                "start_date": datetime.fromtimestamp(agora - i * 36 * 3600, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "distance": 2 * math.pi * raio * 111000,
+                "moving_time": rng.randint(1200, 5400),
+                "type": tipo,
+                "map": {"summary_polyline": encode(rota)},
+            })
+
+    def _cabecalhos_limite(self):
+        with self._lock:
+            self._uso = [self._uso[0] + 1, self._uso[1] + 1]
+            uso = ",".join(map(str, self._uso))
+        return {"X-RateLimit-Limit": ",".join(map(str, self.LIMITE)), "X-RateLimit-Usage": uso,
+                "X-ReadRateLimit-Limit": ",".join(map(str, self.LIMITE_LEITURA)), "X-ReadRateLimit-Usage": uso}
+
+    def _listar(self, params):
+        after, before = params.get("after"), params.get("before")
+        itens = [a for a in self.atividades
+                 if (after is None or _timestamp_strava(a["start_date"]) > int(after)) and (before is None or _timestamp_strava(a["start_date"]) < int(before))]
+        # Com 'after' o Strava devolve do mais antigo para o mais novo
+        if after is not None:
+            itens.reverse()
+        por_pagina = min(int(params.get("per_page", 30)), 200)
+        pagina = int(params.get("page", 1))
+        return itens[(pagina - 1) * por_pagina:pagina * por_pagina]
+
+    def rotear(self, metodo, caminho, params, corpo, headers):
+        if caminho == "/oauth/token":
+            return 200, {"token_type": "Bearer", "access_token": f"local-{time.time_ns()}", "refresh_token": "local-refresh",
+                         "expires_at": int(time.time()) + 21600, "expires_in": 21600, "athlete": {"id": self.atleta_id}}, {}
+        if not headers.get("Authorization"):
+            return 401, {"message": "Authorization Error"}, {}
+        limite = self._cabecalhos_limite()
+        if caminho == "/api/v3/athlete/activities":
+            return 200, self._listar(params), limite
+        if re.fullmatch(r"/api/v3/athletes/\d+/stats", caminho):
+            ano = datetime.now().year
+            totais = {"Run": 0.0, "Ride": 0.0}
+            for a in self.atividades:
+                if a["start_date"].startswith(str(ano)):
+                    totais[a["type"]] += a["distance"]
+            return 200, {"ytd_run_totals": {"distance": totais["Run"]}, "ytd_ride_totals": {"distance": totais["Ride"]}}, limite
+        return 404, {"message": "Record Not Found"}, limite
+
+# --- Open Food Facts ---
+
+PRODUTOS_EXEMPLO = [
+    ("7891000100103", "Leite condensado", 3, "e", 321, 8.0, 5.0, 55.0, 55.0, 0.0, 7.7, 0.3),
+    ("7891910000197", "Açúcar refinado", 2, "e", 400, 0.0, 0.0, 100.0, 100.0, 0.0, 0.0, 0.0),
+    ("7896004000015", "Arroz branco tipo 1", 1, "a", 358, 0.5, 0.1, 78.0, 0.2, 1.6, 7.2, 0.0),
+    ("7896006700012", "Feijão carioca", 1, "a", 329, 1.3, 0.3, 60.0, 2.0, 18.0, 21.0, 0.0),
+    ("7891000053508", "Biscoito recheado chocolate", 4, "e", 480, 20.0, 9.0, 70.0, 35.0, 2.5, 5.0, 0.6),
+    ("7894900010015", "Refrigerante de cola", 4, "e", 42, 0.0, 0.0, 10.6, 10.6, 0.0, 0.0, 0.01),
+    ("7891149101900", "Iogurte natural integral", 1, "b", 63, 3.0, 2.0, 5.0, 5.0, 0.0, 4.0, 0.1),
+    ("7896051111016", "Aveia em flocos", 1, "a", 394, 8.5, 1.5, 57.0, 1.0, 9.1, 14.0, 0.0),
+    ("7891000315507", "Chocolate ao leite", 4, "e", 540, 30.0, 18.0, 58.0, 55.0, 2.0, 7.0, 0.2),
+    ("7896036090244", "Queijo muçarela", 3, "d", 330, 25.0, 15.0, 3.0, 0.5, 0.0, 22.0, 1.6),
+]
+
+class OpenFoodFactsLocal(BackendLocal):
+    """Busca e consulta por código de barras do Open Food Facts sobre um catálogo pequeno."""
+
+    hosts = ("world.openfoodfacts.org",)
+
+    def __init__(self, perturbacao=None, produtos=PRODUTOS_EXEMPLO):
+        super().__init__(perturbacao)
+        self.produtos = [{
+            "code": codigo, "product_name": nome, "product_name_pt": nome, "nova_group": nova, "nutriscore_grade": nutriscore,
+            "image_front_url": f"https://images.openfoodfacts.org/{codigo}.jpg", "ingredients_text_pt": nome.lower(),
+            "nutriments": dict(zip(("energy-kcal_100g", "fat_100g", "saturated-fat_100g", "carbohydrates_100g",
+                                    "sugars_100g", "fiber_100g", "proteins_100g", "salt_100g"), nutrientes)),
+        } for codigo, nome, nova, nutriscore, *nutrientes in produtos]
+
+    def rotear(self, metodo, caminho, params, corpo, headers):
+        if caminho == "/cgi/search.pl":
+            termos = params.get("search_terms", "").lower().split()
+            achados = [p for p in self.produtos if all(t in p["product_name"].lower() for t in termos)]
+            tamanho = int(params.get("page_size", 24))
+            return 200, {"count": len(achados), "page_size": tamanho, "products": achados[:tamanho]}, {}
+        m = re.fullmatch(r"/api/v2/product/(\d+)\.json", caminho)
+        if m:
+            produto = next((p for p in self.produtos if p["code"] == m.group(1)), None)
+            if produto is None:
+                return 404, {"status": 0, "status_verbose": "product not found"}, {}
+            return 200, {"status": 1, "code": m.group(1), "product": produto}, {}
+        return 404, {"erro": f"Rota desconhecida: {caminho}"}, {}
+
+# --- Respostas gravadas ---
+
+class FixturasGravadas(BackendLocal):
+    """Reproduz respostas gravadas num arquivo JSON (lista de {"metodo", "url", "status", "corpo"}).
+
+    A requisição casa com a primeira gravação de mesmo método, host e caminho
+    cujos parâmetros ("params", opcional) estejam todos presentes na URL.
+    """
+
+    def __init__(self, caminho, perturbacao=None):
+        super().__init__(perturbacao)
+        with open(caminho, encoding="utf-8") as f:
+            self.gravacoes = json.load(f)
+        self.hosts = tuple({urlsplit(g["url"]).netloc for g in self.gravacoes})
+
+    def rotear(self, metodo, caminho, params, corpo, headers):
+        for g in self.gravacoes:
+            if (g.get("metodo", "GET") == metodo and unquote(urlsplit(g["url"]).path) == caminho
+                    and all(str(params.get(k)) == str(v) for k, v in g.get("params", {}).items())):
+                return g.get("status", 200), g["corpo"], g.get("headers", {})
+        return 404, {"erro": f"Sem gravação para {metodo} {caminho}"}, {}
+
+class GravadorRede(BackendLocal):
+    """Repassa as chamadas para a rede de verdade e guarda as respostas no formato de FixturasGravadas."""
+
+    def __init__(self, hosts, perturbacao=None):
+        super().__init__(perturbacao)
+        self.hosts = tuple(hosts)
+        self.gravacoes = []
+        self._sessao = requests.Session()
+
+    def atender(self, metodo, url, corpo=None, headers=None):
+        headers = {k: v for k, v in (headers or {}).items() if k.lower() not in ("content-length", "host")}
+        r = self._sessao.request(metodo, url, data=corpo, headers=headers, timeout=cliente_http.TIMEOUT_PADRAO)
+        partes = urlsplit(url)
+        with self._lock:
+            self.chamadas[f"{metodo} {partes.netloc}{self._rota(unquote(partes.path))}"] += 1
+            self.gravacoes.append({"metodo": metodo, "url": f"{partes.scheme}://{partes.netloc}{partes.path}",
+                                   "params": dict(parse_qsl(partes.query)), "status": r.status_code, "corpo": r.json()})
+        return r.status_code, r.content, {"content-type": r.headers.get("content-type", "application/json")}
+
+    def salvar(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.gravacoes, f, ensure_ascii=False, indent=1)
+
+# --- Transportes ---
+
+class Roteador:
+    """Encaminha cada requisição ao backend responsável pelo host."""
+
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self._por_host = {host: b for b in self.backends for host in b.hosts}
+
+    def atender(self, metodo, url, corpo=None, headers=None):
+        host = urlsplit(url).netloc
+        backend = self._por_host.get(host)
+        if backend is None:
+            raise FalhaConexaoSimulada(f"Nenhum backend local para {host}")
+        return backend.atender(metodo, url, corpo, headers)
+
+    @property
+    def chamadas(self):
+        total = Counter()
+        for b in self.backends:
+            total.update(b.chamadas)
+        return total
+
+    @property
+    def total_chamadas(self):
+        return sum(b.total_chamadas for b in self.backends)
+
+    def zerar(self):
+        for b in self.backends:
+            b.zerar()
+
+class AdaptadorLocal(BaseAdapter):
+    """Adaptador do requests que atende pelo roteador, aplicando a mesma política de novas tentativas do cliente_http."""
+
+    def __init__(self, roteador, max_retries=None):
+        super().__init__()
+        self.roteador = roteador
+        self.max_retries = max_retries
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        retry = self.max_retries
+        while True:
+            try:
+                status, conteudo, headers = self.roteador.atender(request.method, request.url, request.body, dict(request.headers))
+                erro = None
+            except FalhaConexaoSimulada as e:
+                erro = e
+            if retry is None or (erro is None and not retry.is_retry(request.method, status)):
+                break
+            try:
+                retry = retry.increment(request.method, request.url)
+            except MaxRetryError:
+                break
+            retry.sleep()
+        if erro is not None:
+            raise requests.ConnectionError(erro, request=request)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = conteudo
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        response.reason = "OK" if status < 400 else "Erro"
+        return response
+
+    def close(self):
+        pass
+
+class HttpLocal:
+    """Substituto do httplib2.Http (usado pelo googleapiclient) que atende pelo roteador."""
+
+    def __init__(self, roteador):
+        self.roteador = roteador
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        status, conteudo, extras = self.roteador.atender(method, uri, body, headers)
+        return httplib2.Response({"status": status, **extras}), conteudo
+
+@contextmanager
+def instalar(*backends):
+    """Faz todo o HTTP do app (requests e googleapiclient) passar pelos backends locais."""
+    roteador = Roteador(backends)
+    cliente_http.definir_transporte(lambda max_retries=None: AdaptadorLocal(roteador, max_retries))
+    dados_google_fit.definir_transporte(lambda: HttpLocal(roteador))
+    try:
+        yield roteador
+    finally:
+        cliente_http.definir_transporte(None)
+        dados_google_fit.definir_transporte(None)
@@ -0,0 +1,300 @@
+# Armazenamento local (SQLite) das séries temporais do Google Fit e das atividades do Strava.
+
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+CAMINHO_BANCO = os.getenv("HEALTH_DB_PATH", "health_data.db")
+USUARIO_PADRAO = "local"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS medicoes (
+    usuario TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (usuario, metrica, timestamp)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sessoes_sono (
+    usuario TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    fim INTEGER NOT NULL,
+    PRIMARY KEY (usuario, inicio)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS atividades_strava (
+    usuario TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    atleta_id INTEGER,
+    inicio INTEGER,
+    nome TEXT,
+    tipo TEXT,
+    distancia_km REAL,
+    duracao_min REAL,
+    mapa TEXT,
+    PRIMARY KEY (usuario, id)
+);
+CREATE INDEX IF NOT EXISTS idx_atividades_inicio ON atividades_strava (usuario, inicio);
+
+CREATE TABLE IF NOT EXISTS cache_alimentos (
+    chave TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    atualizado_em INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tokens (
+    usuario TEXT NOT NULL,
+    provedor TEXT NOT NULL,
+    dados TEXT NOT NULL,
+    atualizado_em INTEGER NOT NULL,
+    PRIMARY KEY (usuario, provedor)
+);
+
+CREATE TABLE IF NOT EXISTS sincronizacao (
+    usuario TEXT NOT NULL,
+    fonte TEXT NOT NULL,
+    ultimo_timestamp INTEGER,
+    atualizado_em INTEGER,
+    PRIMARY KEY (usuario, fonte)
+);
+
+CREATE TABLE IF NOT EXISTS segredos (
+    nome TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+# Máximo de conexões abertas por banco neste processo, compartilhadas por todas as sessões do app
+TAMANHO_POOL = int(os.getenv("HEALTH_DB_POOL", 8))
+# Quanto esperar por uma conexão livre com o pool esgotado antes de desistir (em segundos)
+ESPERA_POOL_S = float(os.getenv("HEALTH_DB_POOL_TIMEOUT", 10))
+
+_BANCOS_INICIALIZADOS = set()
+_POOLS = {}
+_LOCK = threading.Lock()
+
+def conectar(caminho=None):
+    """Abre uma conexão com o banco local (modo WAL), criando as tabelas na primeira vez."""
+    caminho = caminho or CAMINHO_BANCO
+    conn = sqlite3.connect(caminho, check_same_thread=False, timeout=10)
+    # WAL permite leituras concorrentes com uma escrita em andamento
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _LOCK:
+        if caminho not in _BANCOS_INICIALIZADOS:
+            conn.executescript(ESQUEMA)
+            _BANCOS_INICIALIZADOS.add(caminho)
+    return conn
+
+class PoolEsgotado(sqlite3.OperationalError):
+    """Nenhuma conexão do pool foi devolvida dentro do tempo de espera."""
+
+class PoolConexoes:
+    """Reaproveita até `tamanho` conexões; quem chega com o pool esgotado espera uma ser devolvida.
+
+    As conexões devem ser emprestadas só pelo tempo das consultas, nunca durante
+    chamadas de rede; se nenhuma voltar em `espera` segundos, levanta PoolEsgotado.
+    """
+
+    def __init__(self, caminho, tamanho=TAMANHO_POOL, espera=ESPERA_POOL_S):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.espera = espera
+        self._livres = queue.LifoQueue()
+        self._criadas = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def conexao(self):
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                criar = self._criadas < self.tamanho
+                if criar:
+                    self._criadas += 1
+            conn = self._criar() if criar else self._aguardar()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    def _criar(self):
+        try:
+            return conectar(self.caminho)
+        except Exception:
+            with self._lock:
+                self._criadas -= 1
+            raise
+
+    def _aguardar(self):
+        try:
+            return self._livres.get(timeout=self.espera)
+        except queue.Empty:
+            raise PoolEsgotado(f"Nenhuma das {self.tamanho} conexões do banco foi liberada em {self.espera:g} s.") from None
+
+def conexao(caminho=None):
+    """Empresta uma conexão do pool do banco: `with banco_dados.conexao() as conn: ...`."""
+    caminho = caminho or CAMINHO_BANCO
+    with _LOCK:
+        pool = _POOLS.get(caminho)
+        if pool is None:
+            pool = _POOLS[caminho] = PoolConexoes(caminho)
+    return pool.conexao()
+
+def _inicio_janela(dias):
+    return int((datetime.now() - timedelta(days=dias)).timestamp())
+
+# --- Marca d'água de sincronização ---
+
+def obter_marca(conn, fonte, usuario=USUARIO_PADRAO):
+    """Retorna (ultimo_timestamp, atualizado_em) da fonte, ou (None, None) se nunca sincronizada."""
+    linha = conn.execute(
+        "SELECT ultimo_timestamp, atualizado_em FROM sincronizacao WHERE usuario = ? AND fonte = ?",
+        (usuario, fonte)).fetchone()
+    return linha if linha else (None, None)
+
+def gravar_marca(conn, fonte, ultimo_timestamp, usuario=USUARIO_PADRAO, concluida=True):
+    """Grava a marca da fonte; com concluida=False (progresso parcial) mantém o atualizado_em anterior."""
+    if not concluida:
+        conn.execute(
+            "INSERT INTO sincronizacao (usuario, fonte, ultimo_timestamp) VALUES (?, ?, ?) "
+            "ON CONFLICT (usuario, fonte) DO UPDATE SET ultimo_timestamp = excluded.ultimo_timestamp",
+            (usuario, fonte, ultimo_timestamp))
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO sincronizacao (usuario, fonte, ultimo_timestamp, atualizado_em) VALUES (?, ?, ?, ?)",
+        (usuario, fonte, ultimo_timestamp, int(time.time())))
+
+# --- Escrita ---
+
+def gravar_medicoes(conn, metrica, pontos, usuario=USUARIO_PADRAO):
+    """Insere (ou substitui) pares (timestamp, valor) de uma métrica."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO medicoes (usuario, metrica, timestamp, valor) VALUES (?, ?, ?, ?)",
+        [(usuario, metrica, ts, valor) for ts, valor in pontos])
+
+def remover_medicoes(conn, metricas, usuario=USUARIO_PADRAO):
+    conn.executemany("DELETE FROM medicoes WHERE usuario = ? AND metrica = ?", [(usuario, m) for m in metricas])
+
+def gravar_sessoes_sono(conn, sessoes, usuario=USUARIO_PADRAO):
+    conn.executemany(
+        "INSERT OR REPLACE INTO sessoes_sono (usuario, inicio, fim) VALUES (?, ?, ?)",
+        [(usuario, inicio, fim) for inicio, fim in sessoes])
+
+def gravar_atividades(conn, atividades, atleta_id=None, usuario=USUARIO_PADRAO):
+    conn.executemany(
+        "INSERT OR REPLACE INTO atividades_strava (usuario, id, atleta_id, inicio, nome, tipo, distancia_km, duracao_min, mapa) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(usuario, at['id'], atleta_id or at.get('atleta_id'), at.get('inicio'), at.get('nome'), at.get('tipo'),
+          at.get('distancia_km'), at.get('duracao_min'), at.get('mapa'))
+         for at in atividades if at.get('id') is not None])
+
+# --- Leitura ---
+
+def ler_serie_diaria(conn, metrica, dias=7, usuario=USUARIO_PADRAO):
+    """Lê uma métrica diária (passos, bpm) como {'AAAA-MM-DD': valor} para os últimos `dias`."""
+    linhas = conn.execute(
+        "SELECT timestamp, valor FROM medicoes WHERE usuario = ? AND metrica = ? AND timestamp >= ? ORDER BY timestamp",
+        (usuario, metrica, _inicio_janela(dias))).fetchall()
+    return {datetime.fromtimestamp(ts).strftime('%Y-%m-%d'): valor for ts, valor in linhas}
+
+def ler_series_diarias(conn, metricas, dias=365, usuario=USUARIO_PADRAO):
+    """Lê várias métricas diárias como DataFrame (índice: dia; uma coluna por métrica)."""
+    marcadores = ", ".join("?" * len(metricas))
+    df = pd.read_sql_query(
+        f"SELECT timestamp, metrica, valor FROM medicoes WHERE usuario = ? AND metrica IN ({marcadores}) AND timestamp >= ?",
+        conn, params=(usuario, *metricas, _inicio_janela(dias)))
+    # Dia no horário local, como em ler_serie_diaria
+    df['dia'] = pd.DatetimeIndex([datetime.fromtimestamp(ts).date() for ts in df['timestamp']], dtype='datetime64[ns]')
+    serie = df.sort_values('timestamp').pivot_table(index='dia', columns='metrica', values='valor', aggfunc='last')
+    return serie.reindex(columns=list(metricas)).sort_index()
+
+def ler_ultimo_valor(conn, metrica, usuario=USUARIO_PADRAO):
+    linha = conn.execute(
+        "SELECT valor FROM medicoes WHERE usuario = ? AND metrica = ? ORDER BY timestamp DESC LIMIT 1",
+        (usuario, metrica)).fetchone()
+    return linha[0] if linha else None
+
+def ler_sono(conn, dias=7, usuario=USUARIO_PADRAO):
+    """Soma as horas de sono por dia de início da sessão."""
+    linhas = conn.execute(
+        "SELECT inicio, fim FROM sessoes_sono WHERE usuario = ? AND inicio >= ? ORDER BY inicio",
+        (usuario, _inicio_janela(dias))).fetchall()
+    sono_dict = {}
+    for inicio, fim in linhas:
+        dia = datetime.fromtimestamp(inicio).strftime('%Y-%m-%d')
+        sono_dict[dia] = sono_dict.get(dia, 0) + (fim - inicio) / 3600
+    return {k: round(v, 1) for k, v in sono_dict.items()}
+
+def ler_atividades(conn, limite=30, usuario=USUARIO_PADRAO):
+    """Retorna as atividades mais recentes (no mesmo formato de buscar_ultimas_atividades) e o id do atleta."""
+    linhas = conn.execute(
+        "SELECT id, atleta_id, inicio, nome, tipo, distancia_km, duracao_min, mapa FROM atividades_strava "
+        "WHERE usuario = ? ORDER BY inicio DESC LIMIT ?", (usuario, limite)).fetchall()
+    atividades = [
+        {'id': id_, 'inicio': inicio, 'nome': nome, 'tipo': tipo,
+         'distancia_km': distancia_km, 'duracao_min': duracao_min, 'mapa': mapa}
+        for id_, _, inicio, nome, tipo, distancia_km, duracao_min, mapa in linhas]
+    atleta_id = next((linha[1] for linha in linhas if linha[1]), None)
+    return atividades, atleta_id
+
+def ler_historico_rotas(conn, usuario=USUARIO_PADRAO):
+    """Todas as atividades com mapa, em ordem cronológica, como listas paralelas (ids, nomes, polylines)."""
+    linhas = conn.execute(
+        "SELECT id, nome, mapa FROM atividades_strava WHERE usuario = ? AND mapa IS NOT NULL AND mapa != '' "
+        "ORDER BY inicio", (usuario,)).fetchall()
+    ids, nomes, polylines = (list(coluna) for coluna in zip(*linhas)) if linhas else ([], [], [])
+    return ids, nomes, polylines
+
+# --- Cache de consultas ao Open Food Facts ---
+
+def ler_cache_alimento(conn, chave, ttl):
+    """Dados salvos para a chave ('q:<consulta>' ou 'ean:<código>') se tiverem menos de `ttl` segundos."""
+    linha = conn.execute(
+        "SELECT dados FROM cache_alimentos WHERE chave = ? AND atualizado_em >= ?",
+        (chave, int(time.time() - ttl))).fetchone()
+    return json.loads(linha[0]) if linha else None
+
+def gravar_cache_alimento(conn, chaves, dados):
+    agora = int(time.time())
+    texto = json.dumps(dados, ensure_ascii=False)
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache_alimentos (chave, dados, atualizado_em) VALUES (?, ?, ?)",
+            [(chave, texto, agora) for chave in chaves])
+
+# --- Tokens de acesso por usuário ---
+
+def ler_token(conn, usuario, provedor):
+    linha = conn.execute("SELECT dados FROM tokens WHERE usuario = ? AND provedor = ?", (usuario, provedor)).fetchone()
+    return json.loads(linha[0]) if linha else None
+
+def gravar_token(conn, usuario, provedor, dados):
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO tokens (usuario, provedor, dados, atualizado_em) VALUES (?, ?, ?, ?)",
+            (usuario, provedor, json.dumps(dados), int(time.time())))
+
+def remover_token(conn, usuario, provedor):
+    with conn:
+        conn.execute("DELETE FROM tokens WHERE usuario = ? AND provedor = ?", (usuario, provedor))
+
+# --- Segredos do servidor ---
+
+def obter_segredo(conn, nome):
+    """Segredo com esse nome, gerado (aleatório) e guardado na primeira vez em que é pedido."""
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO segredos (nome, valor) VALUES (?, ?)", (nome, secrets.token_hex(32)))
+    return conn.execute("SELECT valor FROM segredos WHERE nome = ?", (nome,)).fetchone()[0]
@@ -0,0 +1,46 @@
+# Cache LRU em memória, thread-safe, com limite de itens e validade (TTL) opcional.
+
+import threading
+import time
+from collections import OrderedDict
+
+class CacheLRU:
+    """Guarda até `max_itens` valores; o menos usado recentemente sai primeiro.
+
+    Com `ttl` (em segundos), itens mais antigos que isso são tratados como ausentes.
+    """
+
+    def __init__(self, max_itens=128, ttl=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                valor, criado_em = item
+                if self.ttl is None or time.monotonic() - criado_em < self.ttl:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._itens[chave]
+            self.falhas += 1
+            return padrao
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic())
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,119 @@
+# Camada de cache do Streamlit sobre os módulos de dados.
+#
+# Os resultados vão para st.cache_data com chave (identidade da conta, janela de
+# tempo); a mesma identidade separa os dados de cada conta no banco local.
+# Dentro da mesma janela, qualquer rerun (ex.: digitar na aba Alimentos)
+# reaproveita o resultado sem chamar as APIs. Parâmetros com "_" na frente
+# (credenciais, tokens) não entram na chave.
+
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import streamlit as st
+
+from utils import banco_dados, instrumentacao
+from utils.dados_alimentos import TTL_AUSENTE_S, alimento_ausente, buscar_info_alimento
+from utils.dados_strava import buscar_estatisticas_atleta
+from utils.sincronizacao import carregar_atividades_strava, carregar_dados_google_fit, carregar_tendencias
+
+# Validade (em segundos) de cada tipo de dado; pode ser ajustada por variável de ambiente
+TTL_SEGUNDOS = {
+    "google_fit": int(os.getenv("TTL_GOOGLE_FIT", 900)),
+    "strava_atividades": int(os.getenv("TTL_STRAVA_ATIVIDADES", 300)),
+    "strava_estatisticas": int(os.getenv("TTL_STRAVA_ESTATISTICAS", 3600)),
+    "rotas": int(os.getenv("TTL_ROTAS", 3600)),
+    "alimentos": int(os.getenv("TTL_ALIMENTOS", 86400)),
+}
+
+@dataclass(frozen=True)
+class _NaoEncontrado:
+    """Resposta "produto não encontrado": fica em cache, mas só por TTL_AUSENTE_S."""
+    em: float
+
+    def vencido(self):
+        return time.time() - self.em >= TTL_AUSENTE_S
+
+def _sem_cachear_falha(funcao, resultado, *args):
+    """Os módulos de dados devolvem None em caso de erro; isso não deve ficar em cache.
+
+    Um _NaoEncontrado não é erro: só sai do cache quando vence.
+    """
+    if resultado is None or (isinstance(resultado, _NaoEncontrado) and resultado.vencido()):
+        funcao.clear(*args)
+    return resultado
+
+def _consultar(nome, funcao, *args):
+    """Chama a função em cache medindo o tempo; as falhas são contadas dentro da própria função."""
+    instrumentacao.registrar_consulta_cache(f"st.{nome}")
+    with instrumentacao.medir(f"cache_streamlit.{nome}"):
+        return funcao(*args)
+
+def janela(metrica):
+    """Número da janela de tempo atual da métrica; muda a cada TTL_SEGUNDOS[metrica]."""
+    return int(time.time() // TTL_SEGUNDOS[metrica])
+
+@st.cache_resource(show_spinner=False)
+def configuracao_cliente_google(caminho):
+    """Conteúdo do client_secret.json, lido uma vez por processo."""
+    with open(caminho) as f:
+        return json.load(f)
+
+@st.cache_data(show_spinner=False, ttl=TTL_SEGUNDOS["google_fit"], max_entries=256)
+def _dados_google_fit(usuario, dias, janela, _credentials):
+    instrumentacao.registrar_falha_cache("st.dados_google_fit")
+    return carregar_dados_google_fit(_credentials, dias=dias, usuario=usuario)
+
+def dados_google_fit(usuario, credentials, dias=7):
+    return _consultar("dados_google_fit", _dados_google_fit, usuario, dias, janela("google_fit"), credentials)
+
+@st.cache_data(show_spinner=False, ttl=TTL_SEGUNDOS["google_fit"], max_entries=64)
+def _tendencias_google_fit(usuario, dias, janela, _credentials):
+    instrumentacao.registrar_falha_cache("st.tendencias_google_fit")
+    return carregar_tendencias(_credentials, dias=dias, usuario=usuario)
+
+def tendencias_google_fit(usuario, credentials, dias=365):
+    return _consultar("tendencias_google_fit", _tendencias_google_fit, usuario, dias, janela("google_fit"), credentials)
+
+@st.cache_data(show_spinner=False, ttl=TTL_SEGUNDOS["strava_atividades"], max_entries=256)
+def _atividades_strava(usuario, limite, janela, _token):
+    instrumentacao.registrar_falha_cache("st.atividades_strava")
+    return carregar_atividades_strava(_token, limite=limite, usuario=usuario)
+
+def atividades_strava(usuario, token, limite=30):
+    return _consultar("atividades_strava", _atividades_strava, usuario, limite, janela("strava_atividades"), token)
+
+@st.cache_data(show_spinner=False, ttl=TTL_SEGUNDOS["strava_estatisticas"], max_entries=256)
+def _estatisticas_strava(usuario, atleta_id, janela, _token):
+    instrumentacao.registrar_falha_cache("st.estatisticas_strava")
+    return buscar_estatisticas_atleta(_token, atleta_id)
+
+def estatisticas_strava(usuario, token, atleta_id):
+    args = (usuario, atleta_id, janela("strava_estatisticas"), token)
+    return _sem_cachear_falha(_estatisticas_strava, _consultar("estatisticas_strava", _estatisticas_strava, *args), *args)
+
+@st.cache_data(show_spinner=False, ttl=TTL_SEGUNDOS["rotas"], max_entries=64)
+def _historico_rotas(usuario, janela):
+    instrumentacao.registrar_falha_cache("st.historico_rotas")
+    with banco_dados.conexao() as conn:
+        return banco_dados.ler_historico_rotas(conn, usuario)
+
+def historico_rotas(usuario):
+    return _consultar("historico_rotas", _historico_rotas, usuario, janela("rotas"))
+
+@st.cache_data(show_spinner=False, ttl=TTL_SEGUNDOS["alimentos"], max_entries=1024)
+def _info_alimento(nome, offline, janela):
+    instrumentacao.registrar_falha_cache("st.info_alimento")
+    dados = buscar_info_alimento(nome, offline=offline)
+    if dados is None and alimento_ausente(nome, offline):
+        return _NaoEncontrado(time.time())
+    return dados
+
+def info_alimento(nome, offline=False):
+    """Dados do alimento, ou None se não existir (em cache por pouco tempo) ou se a busca falhar (sem cache)."""
+    args = (nome, offline, janela("alimentos"))
+    dados = _sem_cachear_falha(_info_alimento, _consultar("info_alimento", _info_alimento, *args), *args)
+    if isinstance(dados, _NaoEncontrado) and dados.vencido():
+        dados = _sem_cachear_falha(_info_alimento, _consultar("info_alimento", _info_alimento, *args), *args)
+    return None if isinstance(dados, _NaoEncontrado) else dados
@@ -0,0 +1,159 @@
+# Cliente HTTP compartilhado: uma requests.Session com pool de conexões por host,
+# timeouts padrão, novas tentativas com backoff e controle do limite de taxa do Strava.
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import instrumentacao
+
+# (conexão, leitura) em segundos
+TIMEOUT_PADRAO = (5, 20)
+USER_AGENT = "PainelSaude/1.0 (health-app-streamlit)"
+# Fração do limite a partir da qual as chamadas passam a ser seguradas
+MARGEM_LIMITE = 0.95
+# Quanto no máximo esperar pela virada da janela de 15 minutos antes de desistir
+ESPERA_MAXIMA_S = 30
+
+_SESSOES = {}
+_ORCAMENTOS = {}
+_LOCK = threading.Lock()
+# Fábrica de adaptadores que substitui a rede (ex.: utils.backends_locais); None = HTTP de verdade
+_TRANSPORTE = None
+
+class LimiteTaxaExcedido(requests.RequestException):
+    """O orçamento de chamadas da API acabou; tente de novo após `liberado_em` (timestamp)."""
+
+    def __init__(self, mensagem, liberado_em=None):
+        super().__init__(mensagem)
+        self.liberado_em = liberado_em
+
+class OrcamentoTaxa:
+    """Acompanha o uso do limite de taxa de um host pelos cabeçalhos X-RateLimit-*.
+
+    O Strava informa dois limites, "curto,diário" (janela de 15 minutos e dia
+    em UTC), em X-RateLimit-Limit/Usage e, para leituras, em X-ReadRateLimit-*.
+    """
+
+    FAMILIAS = ("X-RateLimit", "X-ReadRateLimit")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._uso = {}
+
+    @staticmethod
+    def _fim_janela_curta(agora):
+        return (int(agora) // 900 + 1) * 900
+
+    @staticmethod
+    def _fim_dia(agora):
+        return (int(agora) // 86400 + 1) * 86400
+
+    def atualizar(self, headers, agora=None):
+        agora = agora or time.time()
+        with self._lock:
+            for familia in self.FAMILIAS:
+                limite, uso = headers.get(f"{familia}-Limit"), headers.get(f"{familia}-Usage")
+                if not limite or not uso:
+                    continue
+                try:
+                    limite_curto, limite_diario = (int(v) for v in limite.split(",")[:2])
+                    uso_curto, uso_diario = (int(v) for v in uso.split(",")[:2])
+                except ValueError:
+                    continue
+                self._uso[familia] = {
+                    "curto": (uso_curto, limite_curto, self._fim_janela_curta(agora)),
+                    "diario": (uso_diario, limite_diario, self._fim_dia(agora)),
+                }
+
+    def liberado_em(self, agora=None):
+        """Momento a partir do qual é seguro chamar de novo (None se já é seguro)."""
+        agora = agora or time.time()
+        liberado = None
+        with self._lock:
+            for janelas in self._uso.values():
+                for uso, limite, fim in janelas.values():
+                    if fim > agora and uso >= limite * MARGEM_LIMITE:
+                        liberado = max(liberado or 0, fim)
+        return liberado
+
+    def aguardar(self, espera_maxima=ESPERA_MAXIMA_S):
+        """Segura a chamada até a janela virar, ou levanta LimiteTaxaExcedido se a espera for longa."""
+        liberado = self.liberado_em()
+        if liberado is None:
+            return
+        espera = liberado - time.time()
+        if espera > espera_maxima:
+            raise LimiteTaxaExcedido(f"Limite de taxa da API atingido; liberado em {espera:.0f} s.", liberado)
+        time.sleep(max(espera, 0))
+
+def _criar_sessao():
+    sessao = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    if _TRANSPORTE is not None:
+        adaptador = _TRANSPORTE(max_retries=retry)
+    else:
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    sessao.headers["User-Agent"] = USER_AGENT
+    return sessao
+
+def definir_transporte(fabrica):
+    """Troca o transporte das sessões: `fabrica(max_retries=...)` cria o adaptador do requests (None volta à rede).
+
+    As sessões e orçamentos existentes são descartados, para que nada do
+    transporte anterior (conexões, contadores de limite) vaze para o novo.
+    """
+    global _TRANSPORTE
+    with _LOCK:
+        _TRANSPORTE = fabrica
+        _SESSOES.clear()
+        _ORCAMENTOS.clear()
+
+def obter_sessao(url):
+    """Sessão (com keep-alive) reaproveitada para o host da URL."""
+    host = urlsplit(url).netloc
+    with _LOCK:
+        sessao = _SESSOES.get(host)
+        if sessao is None:
+            sessao = _SESSOES[host] = _criar_sessao()
+        return sessao
+
+def obter_orcamento(url):
+    host = urlsplit(url).netloc
+    with _LOCK:
+        orcamento = _ORCAMENTOS.get(host)
+        if orcamento is None:
+            orcamento = _ORCAMENTOS[host] = OrcamentoTaxa()
+        return orcamento
+
+def requisitar(metodo, url, **kwargs):
+    """Faz a requisição pela sessão do host, respeitando o orçamento de taxa conhecido."""
+    kwargs.setdefault("timeout", TIMEOUT_PADRAO)
+    orcamento = obter_orcamento(url)
+    orcamento.aguardar()
+    try:
+        response = obter_sessao(url).request(metodo, url, **kwargs)
+    except requests.RequestException:
+        instrumentacao.registrar_upstream(url)
+        raise
+    instrumentacao.registrar_upstream(url, len(response.content), response.status_code)
+    orcamento.atualizar(response.headers)
+    return response
+
+def get(url, **kwargs):
+    return requisitar("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return requisitar("POST", url, **kwargs)
@@ -0,0 +1,239 @@
+# Gerenciamento dos tokens do Google Fit e do Strava: cache em memória, renovação
+# antecipada em segundo plano e armazenamento por usuário. As bibliotecas do Google
+# são importadas só quando há uma conta do Google Fit para usar.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from utils import banco_dados, cliente_http, instrumentacao
+
+URL_TOKEN_STRAVA = "https://www.strava.com/oauth/token"
+# Renova o token quando faltar menos que isso para expirar (em segundos)
+ANTECEDENCIA_RENOVACAO_S = 600
+# Quanto a página espera por uma renovação em andamento quando o token já expirou
+ESPERA_TOKEN_EXPIRADO_S = 10
+
+# Arquivos de tokens das versões anteriores, de uma única conta compartilhada pelo app inteiro
+ARQUIVOS_TOKENS_LEGADOS = {"google": "google_fit_tokens.json", "strava": "strava_tokens.json"}
+
+# Pool compartilhado pelas renovações de todas as sessões
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renovacao-token")
+# Renovação em andamento por (usuário, provedor): sessões da mesma conta esperam a mesma
+_RENOVACOES = {}
+_LOCK_RENOVACOES = threading.Lock()
+
+class ArmazenamentoTokensSQLite:
+    """Guarda os tokens de cada usuário na tabela `tokens` do banco local (uma linha por provedor).
+
+    Cada sessão do app usa o seu `usuario`, então visitantes simultâneos não
+    compartilham contas, e as gravações são transações do SQLite (atômicas).
+    """
+
+    def __init__(self, usuario, caminho_banco=None):
+        self.usuario = usuario
+        self.caminho_banco = caminho_banco
+
+    def ler(self, provedor):
+        with banco_dados.conexao(self.caminho_banco) as conn:
+            return banco_dados.ler_token(conn, self.usuario, provedor)
+
+    def gravar(self, provedor, dados):
+        with banco_dados.conexao(self.caminho_banco) as conn:
+            banco_dados.gravar_token(conn, self.usuario, provedor, dados)
+
+    def remover(self, provedor):
+        with banco_dados.conexao(self.caminho_banco) as conn:
+            banco_dados.remover_token(conn, self.usuario, provedor)
+
+def tokens_legados():
+    """Provedores que ainda têm tokens nos arquivos das versões anteriores."""
+    return [provedor for provedor, caminho in ARQUIVOS_TOKENS_LEGADOS.items() if os.path.exists(caminho)]
+
+def importar_tokens_legados(armazenamento):
+    """Grava os tokens dos arquivos antigos no armazenamento (de um usuário) e apaga os arquivos."""
+    importados = []
+    for provedor in tokens_legados():
+        caminho = ARQUIVOS_TOKENS_LEGADOS[provedor]
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                armazenamento.gravar(provedor, json.load(f))
+            os.remove(caminho)
+            importados.append(provedor)
+        except (OSError, ValueError) as e:
+            print(f"ERRO (credenciais.py): Falha ao importar '{caminho}': {e}")
+            instrumentacao.registrar_erro("credenciais.importar_tokens_legados", e)
+    return importados
+
+class GerenciadorCredenciais:
+    """Mantém os tokens em memória e os renova antes de expirarem, fora do caminho da renderização.
+
+    O armazenamento só é lido na primeira consulta de cada provedor; depois
+    disso, toda leitura vem da memória. A renovação é disparada pela própria
+    consulta ao se aproximar de `expires_at` e roda num pool em segundo plano,
+    uma por (usuário, provedor) no processo inteiro; antes de renovar, o token é
+    relido do armazenamento, para aproveitar o que outra sessão da mesma conta já
+    renovou. Nada fica agendado: uma sessão fechada não renova mais nada. A página
+    só espera (no máximo ESPERA_TOKEN_EXPIRADO_S) quando o token já expirou de fato.
+    """
+
+    def __init__(self, armazenamento, google_scopes=None, strava_client_id=None, strava_client_secret=None,
+                 antecedencia=ANTECEDENCIA_RENOVACAO_S):
+        self.armazenamento = armazenamento
+        self.google_scopes = google_scopes
+        self.strava_client_id = strava_client_id
+        self.strava_client_secret = strava_client_secret
+        self.antecedencia = antecedencia
+        self._lock = threading.Lock()
+        self._dados = {}
+        self._google = None
+
+    # --- Acesso aos dados em memória ---
+
+    def _carregar(self, provedor):
+        with self._lock:
+            if provedor not in self._dados:
+                try:
+                    self._dados[provedor] = self.armazenamento.ler(provedor)
+                except (sqlite3.Error, ValueError) as e:
+                    print(f"ERRO (credenciais.py): Falha ao ler os tokens de {provedor}: {e}")
+                    instrumentacao.registrar_erro("credenciais.carregar_tokens", e)
+                    self._dados[provedor] = None
+            return self._dados[provedor]
+
+    def _reler(self, provedor):
+        """Relê os tokens do armazenamento (podem ter sido renovados por outra sessão da mesma conta)."""
+        try:
+            dados = self.armazenamento.ler(provedor)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"ERRO (credenciais.py): Falha ao ler os tokens de {provedor}: {e}")
+            instrumentacao.registrar_erro("credenciais.carregar_tokens", e)
+            return self._carregar(provedor)
+        with self._lock:
+            self._dados[provedor] = dados
+        return dados
+
+    def conectado(self, provedor):
+        return self._carregar(provedor) is not None
+
+    def identidade(self, provedor):
+        """Identificador estável da conta conectada (ex.: para chaves de cache), sem expor o token."""
+        dados = self._carregar(provedor)
+        if not dados:
+            return None
+        atleta_id = (dados.get('athlete') or {}).get('id')
+        if atleta_id:
+            return f"{provedor}:{atleta_id}"
+        segredo = dados.get('refresh_token') or dados.get('access_token') or dados.get('token') or ''
+        return f"{provedor}:{hashlib.sha256(segredo.encode()).hexdigest()[:16]}"
+
+    def salvar(self, provedor, dados):
+        """Guarda tokens novos (ex.: recém-obtidos no OAuth) na memória e no armazenamento."""
+        self.armazenamento.gravar(provedor, dados)
+        with self._lock:
+            self._dados[provedor] = dados
+            if provedor == 'google':
+                self._google = None
+
+    def remover(self, provedor):
+        self.armazenamento.remover(provedor)
+        with self._lock:
+            self._dados[provedor] = None
+            if provedor == 'google':
+                self._google = None
+
+    # --- Expiração e renovação ---
+
+    @staticmethod
+    def _expira_em(provedor, dados):
+        """Timestamp de expiração do token de acesso, ou None se desconhecido."""
+        if provedor == 'strava':
+            return dados.get('expires_at')
+        if dados.get('expiry'):
+            # O google-auth grava 'expiry' em UTC, sem fuso (ex.: '2024-05-02T12:15:09.123456Z')
+            return datetime.fromisoformat(dados['expiry'].rstrip('Z')).replace(tzinfo=timezone.utc).timestamp()
+        return None
+
+    def _perto_de_expirar(self, provedor, dados):
+        expira_em = self._expira_em(provedor, dados)
+        return expira_em is not None and expira_em - time.time() <= self.antecedencia
+
+    def _renovar_em_segundo_plano(self, provedor):
+        chave = (self.armazenamento.usuario, provedor)
+        with _LOCK_RENOVACOES:
+            futuro = _RENOVACOES.get(chave)
+            if futuro is None or futuro.done():
+                futuro = _RENOVACOES[chave] = _EXECUTOR.submit(self._renovar, provedor)
+        return futuro
+
+    def _renovar(self, provedor):
+        dados = self._reler(provedor)
+        if not dados or not dados.get('refresh_token') or not self._perto_de_expirar(provedor, dados):
+            return
+        try:
+            novos = self._renovar_google(dados) if provedor == 'google' else self._renovar_strava(dados)
+            self.salvar(provedor, novos)
+        except Exception as e:
+            print(f"ERRO (credenciais.py): Falha ao renovar o token de {provedor}: {e}")
+            instrumentacao.registrar_erro("credenciais.renovar_token", e)
+
+    def _renovar_google(self, dados):
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+
+        creds = Credentials.from_authorized_user_info(dados, self.google_scopes)
+        creds.refresh(Request(session=cliente_http.obter_sessao("https://oauth2.googleapis.com")))
+        return json.loads(creds.to_json())
+
+    def _renovar_strava(self, dados):
+        response = cliente_http.post(URL_TOKEN_STRAVA, data={
+            "client_id": self.strava_client_id,
+            "client_secret": self.strava_client_secret,
+            "grant_type": "refresh_token",
+            "refresh_token": dados['refresh_token'],
+        })
+        response.raise_for_status()
+        return {**dados, **response.json()}
+
+    def _dados_validos(self, provedor):
+        """Dados atuais do provedor, disparando a renovação se estiverem perto de expirar."""
+        dados = self._carregar(provedor)
+        if dados is None:
+            return None
+        if not self._perto_de_expirar(provedor, dados):
+            return dados
+        futuro = self._renovar_em_segundo_plano(provedor)
+        if self._expira_em(provedor, dados) <= time.time():
+            try:
+                futuro.result(timeout=ESPERA_TOKEN_EXPIRADO_S)
+            except TimeoutError:
+                pass
+            # A renovação pode ter sido feita pelo gerenciador de outra sessão da mesma conta
+            dados = self._reler(provedor)
+        return dados
+
+    # --- API para o app ---
+
+    def google(self):
+        """Credenciais do Google Fit prontas para uso (ou None se não conectado)."""
+        dados = self._dados_validos('google')
+        if dados is None:
+            return None
+        from google.oauth2.credentials import Credentials
+
+        with self._lock:
+            if self._google is None or self._google.token != dados.get('token'):
+                self._google = Credentials.from_authorized_user_info(dados, self.google_scopes)
+            return self._google
+
+    def token_strava(self):
+        """Token de acesso do Strava válido, ou None se não conectado ou se não foi possível renová-lo."""
+        dados = self._dados_validos('strava')
+        if dados is None or dados.get('expires_at', 0) < time.time():
+            return None
+        return dados['access_token']
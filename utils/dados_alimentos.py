@@ -1,54 +1,217 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
 import requests
 
-def buscar_info_alimento(nome):
-    """Busca informações de um alimento na API Open Food Facts."""
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={nome}&search_simple=1&action=process&json=1"
+from utils import banco_dados, cliente_http, indice_alimentos, instrumentacao
+from utils.cache import CacheLRU
+from utils.produtos_off import CAMPOS, extrair_dados_produto
+
+URL_BUSCA = "https://world.openfoodfacts.org/cgi/search.pl"
+URL_PRODUTO = "https://world.openfoodfacts.org/api/v2/product/{codigo}.json"
+
+TTL_MEMORIA_S = 3600
+TTL_DISCO_S = 7 * 86400
+# Produto não encontrado fica pouco tempo: o Open Food Facts recebe produtos novos o tempo todo
+TTL_AUSENTE_S = 600
+_CACHE = instrumentacao.registrar_cache("alimentos", CacheLRU(max_itens=256, ttl=TTL_MEMORIA_S))
+# Consultas que o Open Food Facts respondeu sem produto (erros de rede não entram aqui)
+_AUSENTES = instrumentacao.registrar_cache("alimentos_ausentes", CacheLRU(max_itens=512, ttl=TTL_AUSENTE_S))
+
+def _normalizar_consulta(nome):
+    return " ".join(nome.lower().split())
+
+def _chave_ausente(consulta, offline):
+    prefixo = "offline" if offline else ("ean" if consulta.isdigit() else "q")
+    return f"{prefixo}:{consulta}"
+
+def alimento_ausente(nome, offline=False):
+    """True se a última busca por `nome` terminou sem produto (e não em erro) há menos de TTL_AUSENTE_S."""
+    return _AUSENTES.obter(_chave_ausente(_normalizar_consulta(nome), offline)) is not None
+
+def _consultar_cache(chave):
+    """Procura primeiro na memória e depois no cache em disco (que realimenta a memória)."""
+    dados = _CACHE.obter(chave)
+    if dados is None:
+        try:
+            with banco_dados.conexao() as conn:
+                dados = banco_dados.ler_cache_alimento(conn, chave, TTL_DISCO_S)
+        except Exception as e:
+            print(f"ERRO (dados_alimentos.py): Falha ao ler o cache de alimentos: {e}")
+            instrumentacao.registrar_erro("dados_alimentos.ler_cache", e)
+        if dados is not None:
+            _CACHE.guardar(chave, dados)
+    return dict(dados) if dados is not None else None
+
+def _guardar_cache(chaves, dados):
+    for chave in chaves:
+        _CACHE.guardar(chave, dados)
     try:
-        r = requests.get(url)
+        with banco_dados.conexao() as conn:
+            banco_dados.gravar_cache_alimento(conn, chaves, dados)
+    except Exception as e:
+        print(f"ERRO (dados_alimentos.py): Falha ao gravar o cache de alimentos: {e}")
+        instrumentacao.registrar_erro("dados_alimentos.gravar_cache", e)
+
+@instrumentacao.medir()
+def buscar_alimento_por_codigo(codigo):
+    """Busca um produto pelo código de barras, usando o cache quando possível."""
+    chave = f"ean:{codigo}"
+    dados = _consultar_cache(chave)
+    if dados is not None or _AUSENTES.obter(chave) is not None:
+        return dados
+    try:
+        r = cliente_http.get(URL_PRODUTO.format(codigo=codigo), params={"fields": CAMPOS})
+        if r.status_code == 404:
+            _AUSENTES.guardar(chave, True)
+            return None
+        r.raise_for_status()
+        produto = r.json().get("product")
+        if not produto:
+            _AUSENTES.guardar(chave, True)
+            return None
+        dados = extrair_dados_produto(produto)
+        _guardar_cache([chave], dados)
+        return dict(dados)
+    except requests.RequestException as e:
+        print(f"ERRO (dados_alimentos.py): Falha ao buscar dados de alimentos: {e}")
+        instrumentacao.registrar_erro("dados_alimentos.buscar_alimento_por_codigo", e)
+        return None
+
+def _buscar_offline(consulta):
+    """Consulta o índice local importado do dump do Open Food Facts (sem rede)."""
+    try:
+        if consulta.isdigit():
+            produto = indice_alimentos.buscar_por_codigo(consulta)
+        else:
+            produtos = indice_alimentos.buscar(consulta, limite=1)
+            produto = produtos[0] if produtos else None
+    except (OSError, sqlite3.Error) as e:
+        print(f"ERRO (dados_alimentos.py): Falha ao consultar o índice offline: {e}")
+        instrumentacao.registrar_erro("dados_alimentos.buscar_offline", e)
+        return None
+    if produto is None:
+        _AUSENTES.guardar(_chave_ausente(consulta, offline=True), True)
+    return produto
+
+@instrumentacao.medir()
+def buscar_info_alimento(nome, offline=False):
+    """Busca informações de um alimento na API Open Food Facts (ou no índice local, se `offline`)."""
+    consulta = _normalizar_consulta(nome)
+    if offline:
+        return _buscar_offline(consulta)
+    if consulta.isdigit():
+        return buscar_alimento_por_codigo(consulta)
+    chave = f"q:{consulta}"
+    dados = _consultar_cache(chave)
+    if dados is not None or _AUSENTES.obter(chave) is not None:
+        return dados
+    params = {"search_terms": consulta, "search_simple": 1, "action": "process", "json": 1,
+              "fields": CAMPOS, "page_size": 1}
+    try:
+        r = cliente_http.get(URL_BUSCA, params=params)
         r.raise_for_status()
         produtos = r.json().get("products", [])
         if not produtos:
+            _AUSENTES.guardar(chave, True)
             return None
 
-        p = produtos[0]
-        nutriments = p.get("nutriments", {})
-        
-        return {
-            "nome": p.get("product_name_pt", p.get("product_name", "Nome não encontrado")),
-            "imagem": p.get("image_front_url"),
-            "nutriscore": p.get("nutriscore_grade", "?"),
-            "nova_group": p.get("nova_group"),
-            "ingredientes": p.get("ingredients_text_pt", p.get("ingredients_text", "Não listados")),
-            "calorias": nutriments.get("energy-kcal_100g"),
-            "gordura": nutriments.get("fat_100g"),
-            "gordura_saturada": nutriments.get("saturated-fat_100g"),
-            "carboidratos": nutriments.get("carbohydrates_100g"),
-            "açucar": nutriments.get("sugars_100g"),
-            "fibras": nutriments.get("fiber_100g"),
-            "proteinas": nutriments.get("proteins_100g"),
-            "sal": nutriments.get("salt_100g")
-        }
+        dados = extrair_dados_produto(produtos[0])
+        chaves = [chave] + ([f"ean:{dados['codigo']}"] if dados["codigo"] else [])
+        _guardar_cache(chaves, dados)
+        return dict(dados)
     except requests.RequestException as e:
         print(f"ERRO (dados_alimentos.py): Falha ao buscar dados de alimentos: {e}")
+        instrumentacao.registrar_erro("dados_alimentos.buscar_info_alimento", e)
         return None
 
+NUTRIENTES = ("calorias", "gordura", "gordura_saturada", "carboidratos", "açucar", "fibras", "proteinas", "sal")
+
+# Regras das dicas, avaliadas em ordem: (campo, operador, valor, dica).
+# Para um mesmo campo vale só a primeira regra que casar (ex.: NOVA 4 antes de NOVA 3).
+REGRAS_DICAS = [
+    ("nova_group", "==", 4, "🔴 **Atenção:** Este é um alimento ultraprocessado (NOVA 4). Consuma com moderação."),
+    ("nova_group", "==", 3, "🟡 **Cuidado:** Este é um alimento processado (NOVA 3)."),
+    ("nutriscore", "in", ("d", "e"), "⚠️ O Nutri-Score deste alimento é baixo. Prefira opções mais saudáveis."),
+    ("açucar", ">", 15, "🔻 Este alimento é rico em açúcar. Reduza o consumo."),
+    ("gordura_saturada", ">", 5, "🔻 Alto teor de gordura saturada. Consuma com moderação."),
+]
+DICA_EQUILIBRADA = "✅ Parece uma escolha nutricional equilibrada."
+
+@dataclass
+class AnaliseRefeicao:
+    """Resultado de analisar_refeicao.
+
+    `itens` tem uma linha por alimento com os nutrientes por 100 g, por porção
+    (colunas '<nutriente>_porcao') e a lista de dicas; `totais` soma as porções.
+    """
+    itens: pd.DataFrame
+    totais: pd.Series
+
+    @property
+    def nao_encontrados(self):
+        return self.itens.loc[~self.itens["encontrado"], "consulta"].tolist()
+
+def _mascaras_regras(tabela):
+    """Avalia todas as regras de uma vez sobre a tabela; devolve um DataFrame booleano (itens x regras)."""
+    mascaras = {}
+    ja_atendido = {}
+    for i, (campo, operador, limite, _) in enumerate(REGRAS_DICAS):
+        coluna = tabela[campo]
+        if operador == "in":
+            casa = coluna.astype("string").str.lower().isin(limite)
+        elif operador == "==":
+            casa = pd.to_numeric(coluna, errors="coerce").eq(limite)
+        else:
+            casa = pd.to_numeric(coluna, errors="coerce").gt(limite)
+        casa = casa.fillna(False).astype(bool)
+        anterior = ja_atendido.get(campo, pd.Series(False, index=tabela.index))
+        mascaras[i] = casa & ~anterior
+        ja_atendido[campo] = anterior | casa
+    return pd.DataFrame(mascaras, index=tabela.index)
+
+def aplicar_regras_dicas(tabela):
+    """Versão em lote de gerar_dicas_nutricionais: uma lista de dicas por linha da tabela."""
+    mascaras = _mascaras_regras(tabela).to_numpy()
+    textos = np.array([dica for *_, dica in REGRAS_DICAS], dtype=object)
+    return pd.Series([list(textos[linha]) or [DICA_EQUILIBRADA] for linha in mascaras], index=tabela.index)
+
 def gerar_dicas_nutricionais(dados):
-    """Gera dicas de saúde com base nos dados nutricionais."""
-    dicas = []
-    if dados.get("nova_group") == 4:
-        dicas.append("🔴 **Atenção:** Este é um alimento ultraprocessado (NOVA 4). Consuma com moderação.")
-    elif dados.get("nova_group") == 3:
-        dicas.append("🟡 **Cuidado:** Este é um alimento processado (NOVA 3).")
-
-    if dados.get("nutriscore", "?").lower() in ["d", "e"]:
-        dicas.append("⚠️ O Nutri-Score deste alimento é baixo. Prefira opções mais saudáveis.")
-    
-    if dados.get("açucar") is not None and dados.get("açucar", 0) > 15:
-        dicas.append("🔻 Este alimento é rico em açúcar. Reduza o consumo.")
-    if dados.get("gordura_saturada") is not None and dados.get("gordura_saturada", 0) > 5:
-        dicas.append("🔻 Alto teor de gordura saturada. Consuma com moderação.")
-    
-    if not dicas:
-        dicas.append("✅ Parece uma escolha nutricional equilibrada.")
-
-    return dicas
\ No newline at end of file
+    """Gera dicas de saúde com base nos dados nutricionais (as mesmas regras da análise de refeições)."""
+    campos = dict.fromkeys(campo for campo, *_ in REGRAS_DICAS)
+    return aplicar_regras_dicas(pd.DataFrame([{campo: dados.get(campo) for campo in campos}]))[0]
+
+@instrumentacao.medir()
+def analisar_refeicao(itens, offline=False, max_workers=8):
+    """Analisa vários alimentos de uma vez, ex.: uma refeição ou o registro da semana.
+
+    `itens` é uma lista de pares (nome, gramas). As consultas ao Open Food Facts
+    rodam em paralelo (nomes repetidos são consultados uma só vez), e os
+    cálculos de porção, totais e dicas são feitos em lote com pandas.
+    """
+    itens = [(nome, float(gramas)) for nome, gramas in itens]
+    nomes_unicos = list(dict.fromkeys(nome for nome, _ in itens))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(nomes_unicos)))) as pool:
+        resultados = dict(zip(nomes_unicos, pool.map(instrumentacao.propagar(lambda nome: buscar_info_alimento(nome, offline=offline)), nomes_unicos)))
+
+    linhas = []
+    for nome, gramas in itens:
+        dados = resultados.get(nome) or {}
+        linhas.append({"consulta": nome, "gramas": gramas, "encontrado": bool(dados),
+                       "nome": dados.get("nome"), "nutriscore": dados.get("nutriscore"),
+                       "nova_group": dados.get("nova_group"),
+                       **{n: dados.get(n) for n in NUTRIENTES}})
+    colunas = ["consulta", "gramas", "encontrado", "nome", "nutriscore", "nova_group", *NUTRIENTES]
+    tabela = pd.DataFrame(linhas, columns=colunas)
+    tabela[list(NUTRIENTES)] = tabela[list(NUTRIENTES)].apply(pd.to_numeric, errors="coerce")
+
+    porcoes = tabela[list(NUTRIENTES)].mul(tabela["gramas"] / 100, axis=0).add_suffix("_porcao")
+    tabela = pd.concat([tabela, porcoes], axis=1)
+    tabela["dicas"] = aplicar_regras_dicas(tabela).where(tabela["encontrado"], pd.Series([[]] * len(tabela), index=tabela.index))
+
+    totais = porcoes.sum(min_count=1)
+    totais.index = list(NUTRIENTES)
+    return AnaliseRefeicao(itens=tabela, totais=totais)
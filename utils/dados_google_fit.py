@@ -1,122 +1,361 @@
 # CÓDIGO FINAL E CORRETO PARA utils/dados_google_fit.py (SEM IMPORTAÇÃO CIRCULAR)
 
+import functools
+import json
 import time
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 
-# Esta biblioteca é usada para construir o serviço da API
-# Se não a tiver, instale com: pip install google-api-python-client
-from googleapiclient.discovery import build
+import pandas as pd
 
+from utils import instrumentacao
+from utils.cache import CacheLRU
+
+FONTE_PASSOS = 'derived:com.google.step_count.delta:com.google.android.gms:estimated_steps'
+FONTE_BPM = 'derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm'
+FONTE_PESO = "derived:com.google.weight:com.google.android.gms:merge_weight"
+FONTE_ALTURA = "derived:com.google.height:com.google.android.gms:merge_height"
+
+# Cria o transporte httplib2 de cada requisição; pode ser trocado (ex.: utils.backends_locais).
+# None = httplib2.Http. O googleapiclient e o httplib2 só são importados no primeiro uso,
+# para não pesar a abertura do app para quem não conectou o Google Fit.
+_fabrica_http = None
+
+# Cache de serviços já construídos, um por credencial (o documento de descoberta é caro de montar)
+_SERVICOS = instrumentacao.registrar_cache("servicos_google_fit", CacheLRU(max_itens=64))
+_SERVICOS_LOCK = threading.Lock()
+
+@dataclass
+class DadosGoogleFit:
+    """Resultado agregado de todas as métricas do Google Fit usadas no painel."""
+    peso: float | None = None
+    altura: float | None = None
+    passos: dict = field(default_factory=dict)
+    bpm: dict = field(default_factory=dict)
+    sono: dict = field(default_factory=dict)
+
+    @property
+    def imc(self):
+        if self.peso and self.altura:
+            return round(self.peso / (self.altura ** 2), 1)
+        return None
+
+def _chave_credencial(credentials):
+    return getattr(credentials, 'refresh_token', None) or getattr(credentials, 'token', None) or id(credentials)
+
+@functools.lru_cache(maxsize=1)
+def _documento_descoberta():
+    """Documento de descoberta da Fitness API que vem com o google-api-python-client, já convertido
+    de JSON uma única vez por processo (o build_from_document faria o json.loads a cada serviço)."""
+    from googleapiclient.discovery_cache import get_static_doc
+    documento = get_static_doc('fitness', 'v1')
+    return json.loads(documento) if documento else None
+
+@instrumentacao.medir()
 def build_service(credentials):
-    """Cria o objeto de serviço da API do Google Fitness."""
-    return build('fitness', 'v1', credentials=credentials)
+    """Cria (ou reaproveita do cache) o objeto de serviço da API do Google Fitness."""
+    # Se não tiver a biblioteca, instale com: pip install google-api-python-client
+    from googleapiclient.discovery import build, build_from_document
 
-def obter_passos_diarios(credentials):
-    """Obtém a contagem de passos dos últimos 7 dias."""
-    service = build_service(credentials)
-    end_time_ms = int(time.time() * 1000)
-    start_time_ms = int((datetime.now() - timedelta(days=7)).timestamp() * 1000)
+    chave = _chave_credencial(credentials)
+    with _SERVICOS_LOCK:
+        servico = _SERVICOS.obter(chave)
+        if servico is None:
+            documento = _documento_descoberta()
+            if documento:
+                servico = build_from_document(documento, credentials=credentials)
+            else:
+                servico = build('fitness', 'v1', credentials=credentials)
+            _SERVICOS.guardar(chave, servico)
+        return servico
+
+def definir_transporte(fabrica):
+    """Troca a fábrica de objetos httplib2.Http usados nas requisições (None volta à rede)."""
+    global _fabrica_http
+    _fabrica_http = fabrica
+
+class _HttpMedido:
+    """Repassa as requisições ao httplib2.Http, contando chamadas e bytes recebidos."""
+
+    def __init__(self, http):
+        self._http = http
+
+    def request(self, uri, *args, **kwargs):
+        try:
+            resp, conteudo = self._http.request(uri, *args, **kwargs)
+        except Exception:
+            instrumentacao.registrar_upstream(uri)
+            raise
+        instrumentacao.registrar_upstream(uri, len(conteudo or b''), resp.status)
+        return resp, conteudo
 
+    def __getattr__(self, nome):
+        return getattr(self._http, nome)
+
+def _executar(request, credentials):
+    """Executa uma requisição com um transporte HTTP próprio (httplib2 não é thread-safe)."""
+    import google_auth_httplib2
+    import httplib2
+
+    http = google_auth_httplib2.AuthorizedHttp(credentials, http=_HttpMedido((_fabrica_http or httplib2.Http)()))
+    return request.execute(http=http)
+
+def _extrair_sono(sessions, bucket='dia'):
+    """Soma as horas de cada sessão no bucket em que ela começou (a semana começa na segunda-feira)."""
+    sono_dict = {}
+    for session in sessions:
+        start_millis = int(session['startTimeMillis'])
+        end_millis = int(session['endTimeMillis'])
+        inicio = datetime.fromtimestamp(start_millis / 1000)
+        if bucket == 'semana':
+            inicio -= timedelta(days=inicio.weekday())
+        chave = _rotulo(inicio, bucket)
+        duracao_horas = (end_millis - start_millis) / (1000 * 60 * 60)
+        sono_dict[chave] = sono_dict.get(chave, 0) + duracao_horas
+    return {k: round(v, 1) for k, v in sono_dict.items()}
+
+def _extrair_fp(ultimo_dado):
+    if ultimo_dado and 'value' in ultimo_dado and ultimo_dado['value']:
+        return ultimo_dado['value'][0].get('fpVal')
+    return None
+
+@instrumentacao.medir()
+def obter_passos_diarios(credentials, inicio=None, fim=None, bucket='dia'):
+    """Obtém a contagem de passos por bucket ('hora', 'dia' ou 'semana'); por padrão, dos últimos 7 dias."""
     try:
-        response = service.users().dataset().aggregate(
-            userId='me',
-            body={
-                'aggregateBy': [{'dataTypeName': 'com.google.step_count.delta', 'dataSourceId': 'derived:com.google.step_count.delta:com.google.android.gms:estimated_steps'}],
-                'bucketByTime': {'durationMillis': 86400000},
-                'startTimeMillis': start_time_ms,
-                'endTimeMillis': end_time_ms
-            }
-        ).execute()
-        
-        passos_dict = {}
-        for bucket in response.get('bucket', []):
-            points = bucket.get('dataset', [{}])[0].get('point', [])
-            if points and points[0].get('value', [{}])[0].get('intVal') is not None:
-                dia = datetime.fromtimestamp(int(points[0]['startTimeNanos']) / 1e9).strftime('%Y-%m-%d')
-                passos_dict[dia] = points[0]['value'][0]['intVal']
-        return passos_dict
+        serie = obter_serie(credentials, ('passos',), inicio, fim, bucket)
+        return {_rotulo(ts, bucket): int(v) for ts, v in serie['passos'].dropna().items()}
     except Exception as e:
         print(f"Erro ao obter passos diários: {e}")
+        instrumentacao.registrar_erro("dados_google_fit.obter_passos_diarios", e)
         return {}
 
-def obter_batimentos_medios(credentials):
-    """Obtém a média de batimentos cardíacos dos últimos 7 dias."""
-    service = build_service(credentials)
-    end_time_ms = int(time.time() * 1000)
-    start_time_ms = int((datetime.now() - timedelta(days=7)).timestamp() * 1000)
-
+@instrumentacao.medir()
+def obter_batimentos_medios(credentials, inicio=None, fim=None, bucket='dia'):
+    """Obtém a média de batimentos cardíacos por bucket; por padrão, dos últimos 7 dias."""
     try:
-        response = service.users().dataset().aggregate(
-            userId='me',
-            body={
-                'aggregateBy': [{'dataTypeName': 'com.google.heart_rate.bpm', 'dataSourceId': 'derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm'}],
-                'bucketByTime': {'durationMillis': 86400000},
-                'startTimeMillis': start_time_ms,
-                'endTimeMillis': end_time_ms
-            }
-        ).execute()
-
-        bpm_dict = {}
-        for bucket in response.get('bucket', []):
-            points = bucket.get('dataset', [{}])[0].get('point', [])
-            if points and points[0].get('value', [{}])[0].get('fpVal') is not None:
-                dia = datetime.fromtimestamp(int(points[0]['startTimeNanos']) / 1e9).strftime('%Y-%m-%d')
-                bpm_dict[dia] = round(points[0]['value'][0]['fpVal'])
-        return bpm_dict
+        serie = obter_serie(credentials, ('bpm',), inicio, fim, bucket)
+        return {_rotulo(ts, bucket): round(v) for ts, v in serie['bpm'].dropna().items()}
     except Exception as e:
         print(f"Erro ao obter batimentos médios: {e}")
+        instrumentacao.registrar_erro("dados_google_fit.obter_batimentos_medios", e)
         return {}
 
-def obter_sono(credentials):
-    """Obtém as horas de sono dos últimos 7 dias."""
-    service = build_service(credentials)
-    end_time_ns = int(time.time() * 1e9)
-    start_time_ns = int((datetime.now() - timedelta(days=7)).timestamp() * 1e9)
-    
+@instrumentacao.medir()
+def obter_sono(credentials, inicio=None, fim=None, bucket='dia'):
+    """Obtém as horas de sono por bucket ('hora', 'dia' ou 'semana'); por padrão, dos últimos 7 dias.
+
+    Cada sessão conta inteira no bucket em que começou, como no painel (a noite é do dia em que se deitou).
+    """
+    inicio_ms, fim_ms = _intervalo_ms(inicio, fim)
+    inicio_ms = _alinhar(inicio_ms, bucket)
     try:
-        response = service.users().sessions().list(userId='me', activityType=72, startTime=f"{datetime.fromtimestamp(start_time_ns/1e9).isoformat()}Z", endTime=f"{datetime.fromtimestamp(end_time_ns/1e9).isoformat()}Z").execute()
-        
-        sono_dict = {}
-        for session in response.get('session', []):
-            start_millis = int(session['startTimeMillis'])
-            end_millis = int(session['endTimeMillis'])
-            dia = datetime.fromtimestamp(start_millis / 1000).strftime('%Y-%m-%d')
-            duracao_horas = (end_millis - start_millis) / (1000 * 60 * 60)
-            sono_dict[dia] = sono_dict.get(dia, 0) + duracao_horas
-        
-        return {k: round(v, 1) for k, v in sono_dict.items()}
+        sessoes = obter_sessoes_sono(credentials, inicio_ms, fim_ms)
+        # Sessões que começaram antes do primeiro bucket cairiam num rótulo fora da série de passos
+        return _extrair_sono([{'startTimeMillis': i * 1000, 'endTimeMillis': f * 1000}
+                              for i, f in sessoes if i * 1000 >= inicio_ms], bucket)
     except Exception as e:
         print(f"Erro ao obter dados de sono: {e}")
+        instrumentacao.registrar_erro("dados_google_fit.obter_sono", e)
         return {}
 
-def obter_ultimo_dado(service, data_source_id):
+@instrumentacao.medir()
+def obter_ultimo_dado(service, data_source_id, credentials=None):
     """Função auxiliar para buscar o ponto de dados mais recente."""
     end_time_ns = int(time.time() * 1e9)
     start_time_ns = int((datetime.now() - timedelta(days=365)).timestamp() * 1e9)
     dataset_id = f"{start_time_ns}-{end_time_ns}"
 
     try:
-        response = service.users().dataSources().datasets().get(userId='me', dataSourceId=data_source_id, datasetId=dataset_id).execute()
+        request = service.users().dataSources().datasets().get(userId='me', dataSourceId=data_source_id, datasetId=dataset_id)
+        response = _executar(request, credentials) if credentials is not None else request.execute()
         points = response.get('point', [])
         return points[-1] if points else None
     except Exception as e:
         print(f"Erro ao buscar último dado para {data_source_id}: {e}")
+        instrumentacao.registrar_erro("dados_google_fit.obter_ultimo_dado", e)
         return None
 
+@instrumentacao.medir()
 def obter_ultimo_peso(credentials):
     """Busca o registro de peso mais recente."""
     service = build_service(credentials)
-    data_source_id = "derived:com.google.weight:com.google.android.gms:merge_weight"
-    ultimo_dado = obter_ultimo_dado(service, data_source_id)
-    if ultimo_dado and 'value' in ultimo_dado and ultimo_dado['value']:
-        return ultimo_dado['value'][0].get('fpVal')
-    return None
+    return _extrair_fp(obter_ultimo_dado(service, FONTE_PESO, credentials))
 
+@instrumentacao.medir()
 def obter_ultima_altura(credentials):
     """Busca o registro de altura mais recente."""
     service = build_service(credentials)
-    data_source_id = "derived:com.google.height:com.google.android.gms:merge_height"
-    ultimo_dado = obter_ultimo_dado(service, data_source_id)
-    if ultimo_dado and 'value' in ultimo_dado and ultimo_dado['value']:
-        return ultimo_dado['value'][0].get('fpVal')
-    return None
\ No newline at end of file
+    return _extrair_fp(obter_ultimo_dado(service, FONTE_ALTURA, credentials))
+
+@instrumentacao.medir()
+def obter_dados_google_fit(credentials, dias=7):
+    """Busca todas as métricas do painel direto da API (sem o banco local), em paralelo.
+
+    Passos e batimentos vêm de uma só série agregada (obter_serie); sono, peso e
+    altura rodam ao mesmo tempo num pool de threads. A latência total fica
+    próxima da chamada mais lenta, e não da soma de todas. A janela começa à
+    meia-noite local de `dias` dias atrás, como na sincronização.
+    """
+    fim = datetime.now()
+    inicio = (fim - timedelta(days=dias)).replace(hour=0, minute=0, second=0, microsecond=0)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        f_serie = pool.submit(instrumentacao.propagar(obter_serie), credentials, ('passos', 'bpm'), inicio, fim)
+        f_sono = pool.submit(instrumentacao.propagar(obter_sono), credentials, inicio, fim)
+        f_peso = pool.submit(instrumentacao.propagar(obter_ultimo_peso), credentials)
+        f_altura = pool.submit(instrumentacao.propagar(obter_ultima_altura), credentials)
+        try:
+            serie = f_serie.result()
+            passos = {_rotulo(ts, 'dia'): int(v) for ts, v in serie['passos'].dropna().items()}
+            bpm = {_rotulo(ts, 'dia'): round(v) for ts, v in serie['bpm'].dropna().items()}
+        except Exception as e:
+            print(f"Erro ao obter passos e batimentos: {e}")
+            instrumentacao.registrar_erro("dados_google_fit.obter_dados_google_fit", e)
+            passos, bpm = {}, {}
+        return DadosGoogleFit(peso=f_peso.result(), altura=f_altura.result(), passos=passos, bpm=bpm, sono=f_sono.result())
+
+DURACAO_BUCKET_MS = {'hora': 3600000, 'dia': 86400000, 'semana': 7 * 86400000}
+# Quantos buckets pedir por chamada de agregação (respostas muito longas são recusadas pela API)
+BUCKETS_POR_CHAMADA = {'hora': 24 * 7, 'dia': 90, 'semana': 52}
+MAX_CHAMADAS_PARALELAS = 8
+
+# Métrica -> (tipo de dado, fonte, campo do valor). O resumo de batimentos traz [média, máximo, mínimo].
+METRICAS_AGREGADAS = {
+    'passos': ('com.google.step_count.delta', FONTE_PASSOS, 'intVal'),
+    'bpm': ('com.google.heart_rate.bpm', FONTE_BPM, 'fpVal'),
+}
+
+def _intervalo_ms(inicio=None, fim=None, dias_padrao=7):
+    """Converte datetimes (ou None) no intervalo [início, fim) em milissegundos."""
+    fim_ms = int((fim or datetime.now()).timestamp() * 1000)
+    inicio_ms = int(inicio.timestamp() * 1000) if inicio else fim_ms - dias_padrao * 86400000
+    return inicio_ms, fim_ms
+
+def _alinhar(inicio_ms, bucket):
+    """Recua o início para a fronteira do bucket no horário local: hora cheia, meia-noite ou segunda-feira."""
+    inicio = datetime.fromtimestamp(inicio_ms / 1000).replace(minute=0, second=0, microsecond=0)
+    if bucket != 'hora':
+        inicio = inicio.replace(hour=0)
+    if bucket == 'semana':
+        inicio -= timedelta(days=inicio.weekday())
+    return int(inicio.timestamp() * 1000)
+
+def _rotulo(ts, bucket):
+    return ts.strftime('%Y-%m-%d %H:00' if bucket == 'hora' else '%Y-%m-%d')
+
+def _rfc3339(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def _janelas(inicio_ms, fim_ms, passo_ms):
+    """Divide [início, fim) em janelas consecutivas de até `passo_ms`."""
+    return [(a, min(a + passo_ms, fim_ms)) for a in range(inicio_ms, fim_ms, passo_ms)]
+
+@instrumentacao.medir("dados_google_fit.agregar_janela")
+def _agregar_janela(service, credentials, metricas, bucket_ms, inicio_ms, fim_ms):
+    request = service.users().dataset().aggregate(
+        userId='me',
+        body={
+            'aggregateBy': [{'dataTypeName': METRICAS_AGREGADAS[m][0], 'dataSourceId': METRICAS_AGREGADAS[m][1]} for m in metricas],
+            'bucketByTime': {'durationMillis': bucket_ms},
+            'startTimeMillis': inicio_ms,
+            'endTimeMillis': fim_ms
+        }
+    )
+    linhas = []
+    for b in _executar(request, credentials).get('bucket', []):
+        linha = {'inicio': int(b['startTimeMillis'])}
+        for i, metrica in enumerate(metricas):
+            datasets = b.get('dataset', [])
+            points = datasets[i].get('point', []) if len(datasets) > i else []
+            valores = points[0].get('value', []) if points else []
+            campo = METRICAS_AGREGADAS[metrica][2]
+            if valores and valores[0].get(campo) is not None:
+                linha[metrica] = valores[0][campo]
+                if metrica == 'bpm' and len(valores) >= 3:
+                    linha['bpm_max'], linha['bpm_min'] = valores[1].get('fpVal'), valores[2].get('fpVal')
+        linhas.append(linha)
+    return linhas
+
+@instrumentacao.medir()
+def obter_serie(credentials, metricas=('passos', 'bpm'), inicio=None, fim=None, bucket='dia'):
+    """Série agregada das métricas num intervalo arbitrário (até vários anos), como DataFrame.
+
+    O início recua para a hora cheia, a meia-noite ou a segunda-feira (no horário
+    local) e o intervalo é dividido em janelas do tamanho aceito pela API, buscadas
+    em paralelo; o índice é o início de cada bucket ('hora', 'dia' ou 'semana').
+    Para 'bpm' vêm também as colunas 'bpm_max' e 'bpm_min'.
+    """
+    inicio_ms, fim_ms = _intervalo_ms(inicio, fim)
+    # Buckets começam na fronteira local, para os rótulos baterem com os do sono
+    inicio_ms = _alinhar(inicio_ms, bucket)
+    bucket_ms = DURACAO_BUCKET_MS[bucket]
+    service = build_service(credentials)
+    janelas = _janelas(inicio_ms, fim_ms, bucket_ms * BUCKETS_POR_CHAMADA[bucket])
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CHAMADAS_PARALELAS, len(janelas)))) as pool:
+        partes = pool.map(instrumentacao.propagar(lambda j: _agregar_janela(service, credentials, metricas, bucket_ms, *j)), janelas)
+        linhas = [linha for parte in partes for linha in parte]
+
+    colunas = list(metricas) + (['bpm_max', 'bpm_min'] if 'bpm' in metricas else [])
+    serie = pd.DataFrame(linhas, columns=['inicio'] + colunas)
+    # Índice no horário local, como os rótulos de dia usados no resto do painel
+    indice = pd.DatetimeIndex([datetime.fromtimestamp(ms / 1000) for ms in serie.pop('inicio')], name='inicio')
+    if bucket != 'hora':
+        # Só corrige a deriva do horário de verão: buckets de 24 h que o atravessam começam às 23h ou à 1h
+        indice = (indice + pd.Timedelta(hours=12)).normalize()
+    serie.index = indice
+    return serie.astype(float).sort_index()
+
+@instrumentacao.medir()
+def obter_pontos_diarios(credentials, start_time_ms, end_time_ms):
+    """Passos e batimentos diários de um intervalo arbitrário, como pares (timestamp em segundos, valor).
+
+    Os dias são de calendário no horário local se `start_time_ms` for uma meia-noite local;
+    o timestamp de cada par é a meia-noite do dia. Retorna {'passos': [...], 'bpm': [...], 'bpm_min': [...]}.
+    """
+    serie = obter_serie(credentials, ('passos', 'bpm'),
+                        datetime.fromtimestamp(start_time_ms / 1000), datetime.fromtimestamp(end_time_ms / 1000))
+    # to_pydatetime: o Timestamp.timestamp() do pandas trataria a hora local (sem fuso) como UTC
+    timestamps = [int(ts.to_pydatetime().timestamp()) for ts in serie.index]
+    return {coluna: [(ts, v) for ts, v in zip(timestamps, serie[coluna].tolist()) if pd.notna(v)]
+            for coluna in ('passos', 'bpm', 'bpm_min')}
+
+@instrumentacao.medir()
+def obter_sessoes_sono(credentials, start_time_ms, end_time_ms, janela_dias=90):
+    """Lista as sessões de sono do intervalo como pares (início, fim) em segundos.
+
+    Intervalos longos são divididos em janelas buscadas em paralelo, e cada
+    janela segue o `nextPageToken` até a última página.
+    """
+    service = build_service(credentials)
+
+    def listar(inicio_ms, fim_ms):
+        sessoes, page_token = [], None
+        while True:
+            request = service.users().sessions().list(
+                userId='me', activityType=72, startTime=_rfc3339(inicio_ms), endTime=_rfc3339(fim_ms), pageToken=page_token)
+            response = _executar(request, credentials)
+            sessoes.extend(response.get('session', []))
+            page_token = response.get('nextPageToken')
+            if not page_token or not response.get('session'):
+                return sessoes
+
+    janelas = _janelas(start_time_ms, end_time_ms, janela_dias * 86400000)
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CHAMADAS_PARALELAS, len(janelas)))) as pool:
+        # Uma sessão que cruza a borda entre janelas aparece nas duas
+        unicas = {s.get('id', s['startTimeMillis']): s for parte in pool.map(instrumentacao.propagar(lambda j: listar(*j)), janelas) for s in parte}
+    return sorted((int(s['startTimeMillis']) // 1000, int(s['endTimeMillis']) // 1000) for s in unicas.values())
+
+@instrumentacao.medir()
+def obter_pontos_fonte(credentials, data_source_id, start_time_ms, end_time_ms):
+    """Lista todos os pontos (timestamp, valor) de uma fonte de dados, ex.: peso ou altura."""
+    service = build_service(credentials)
+    dataset_id = f"{start_time_ms * 10**6}-{end_time_ms * 10**6}"
+    request = service.users().dataSources().datasets().get(userId='me', dataSourceId=data_source_id, datasetId=dataset_id)
+    pontos = []
+    for point in _executar(request, credentials).get('point', []):
+        valor = _extrair_fp(point)
+        if valor is not None:
+            pontos.append((int(point['startTimeNanos']) // 10**9, valor))
+    return pontos
@@ -1,37 +1,86 @@
 import requests
-from polyline import decode
-import folium
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-def buscar_ultimas_atividades(token):
-    url = 'https://www.strava.com/api/v3/athlete/activities'
-    headers = {'Authorization': f'Bearer {token}'}
+from utils import cliente_http, instrumentacao
+from utils.mapas import gerar_mapa_html, gerar_miniatura_svg
+
+def _timestamp_strava(data_iso):
+    """Converte datas do Strava ('2024-05-02T12:15:09Z') para timestamp em segundos."""
+    if not data_iso:
+        return None
+    return int(datetime.strptime(data_iso, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp())
+
+URL_ATIVIDADES = 'https://www.strava.com/api/v3/athlete/activities'
+# Máximo aceito pela API do Strava em 'per_page'
+POR_PAGINA_MAX = 200
+
+def _resumir_atividade(item):
+    """Mantém só os campos usados pelo painel (o JSON completo de cada atividade é grande)."""
+    return {
+        'id': item.get('id'),
+        'atleta_id': item.get('athlete', {}).get('id'),
+        'inicio': _timestamp_strava(item.get('start_date')),
+        'nome': item.get('name'),
+        'distancia_km': round(item.get('distance', 0) / 1000, 2),
+        'duracao_min': round(item.get('moving_time', 0) / 60, 1),
+        'tipo': item.get('type'),
+        'mapa': item.get('map', {}).get('summary_polyline')
+    }
+
+@instrumentacao.medir("dados_strava.buscar_pagina")
+def _buscar_pagina(token, pagina, por_pagina, after=None, before=None):
+    params = {'page': pagina, 'per_page': por_pagina}
+    if after is not None:
+        params['after'] = after
+    if before is not None:
+        params['before'] = before
+    response = cliente_http.get(URL_ATIVIDADES, headers={'Authorization': f'Bearer {token}'}, params=params)
+    response.raise_for_status()
+    return response.json()
+
+def iterar_atividades(token, after=None, before=None, por_pagina=POR_PAGINA_MAX, prefetch=True):
+    """Percorre todas as atividades do atleta página a página, gerando registros compactos.
+
+    Com `prefetch`, a próxima página é baixada em paralelo enquanto a atual é
+    consumida; a memória fica limitada a duas páginas. Com `after`, o Strava
+    devolve as atividades em ordem crescente de data (use after=0 para o
+    histórico completo do mais antigo para o mais novo). Erros de rede são
+    propagados como requests.RequestException.
+    """
+    buscar = instrumentacao.propagar(_buscar_pagina)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pagina = 1
+        futuro = pool.submit(buscar, token, pagina, por_pagina, after, before)
+        while futuro is not None:
+            itens = futuro.result()
+            futuro = None
+            if len(itens) == por_pagina:
+                pagina += 1
+                if prefetch:
+                    futuro = pool.submit(buscar, token, pagina, por_pagina, after, before)
+            for item in itens:
+                yield _resumir_atividade(item)
+            if len(itens) == por_pagina and futuro is None:
+                futuro = pool.submit(buscar, token, pagina, por_pagina, after, before)
+
+@instrumentacao.medir()
+def buscar_ultimas_atividades(token, after=None):
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        atividades = []
-        atleta_id = None
-        for item in response.json():
-            if not atleta_id and "athlete" in item:
-                atleta_id = item["athlete"].get("id")
-            
-            atividade = {
-                'nome': item.get('name'),
-                'distancia_km': round(item.get('distance', 0) / 1000, 2),
-                'duracao_min': round(item.get('moving_time', 0) / 60, 1),
-                'tipo': item.get('type'),
-                'mapa': item.get('map', {}).get('summary_polyline')
-            }
-            atividades.append(atividade)
+        atividades = [_resumir_atividade(item) for item in _buscar_pagina(token, 1, 30, after)]
+        atleta_id = next((at['atleta_id'] for at in atividades if at['atleta_id']), None)
         return atividades, atleta_id
     except requests.RequestException as e:
         print(f"ERRO: Falha ao buscar atividades do Strava: {e}")
+        instrumentacao.registrar_erro("dados_strava.buscar_ultimas_atividades", e)
         return [], None
 
+@instrumentacao.medir()
 def buscar_estatisticas_atleta(token, atleta_id):
     url = f'https://www.strava.com/api/v3/athletes/{atleta_id}/stats'
     headers = {'Authorization': f'Bearer {token}'}
     try:
-        response = requests.get(url, headers=headers)
+        response = cliente_http.get(url, headers=headers)
         response.raise_for_status()
         stats = response.json()
         return {
@@ -40,20 +89,28 @@ def buscar_estatisticas_atleta(token, atleta_id):
         }
     except requests.RequestException as e:
         print(f"ERRO: Falha ao buscar estatísticas do Strava: {e}")
+        instrumentacao.registrar_erro("dados_strava.buscar_estatisticas_atleta", e)
         return None
 
+@instrumentacao.medir()
 def gerar_mapa_atividade(atividade):
     polyline_str = atividade.get("mapa")
     if not polyline_str:
         return "<p style='text-align: center; margin-top: 50px;'>Sem mapa disponível para esta atividade.</p>"
 
     try:
-        coordenadas = decode(polyline_str)
-        if not coordenadas:
-             return "<p style='text-align: center; margin-top: 50px;'>Mapa sem coordenadas.</p>"
-        
-        mapa = folium.Map(location=coordenadas[0], zoom_start=13, tiles="CartoDB positron")
-        folium.PolyLine(locations=coordenadas, color="#FC4C02", weight=3).add_to(mapa)
-        return mapa._repr_html_()
+        return gerar_mapa_html(polyline_str)
+    except Exception as e:
+        return f"<p>Erro ao gerar mapa: {e}</p>"
+
+@instrumentacao.medir()
+def gerar_miniatura_atividade(atividade, max_pontos=60):
+    """Versão leve do mapa: SVG estático com a rota simplificada."""
+    polyline_str = atividade.get("mapa")
+    if not polyline_str:
+        return "<p>Sem mapa disponível para esta atividade.</p>"
+
+    try:
+        return gerar_miniatura_svg(polyline_str, max_pontos)
     except Exception as e:
-        return f"<p>Erro ao gerar mapa: {e}</p>"
\ No newline at end of file
+        return f"<p>Erro ao gerar mapa: {e}</p>"
@@ -0,0 +1,90 @@
+# Identidade do visitante e proteção do retorno do OAuth.
+#
+# O id do usuário nunca vem da URL nem do 'state' do OAuth: ele é criado pelo servidor,
+# guardado na sessão e num cookie assinado (HMAC) que só o servidor sabe gerar. O 'state'
+# de cada login é um nonce aleatório de uso único, registrado aqui para aquele usuário e
+# provedor; o retorno só é aceito se trouxer um nonce pendente do mesmo usuário.
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import uuid
+
+from utils import banco_dados
+
+NOME_COOKIE = "painel_usuario"
+VALIDADE_COOKIE_S = 365 * 86400
+# Tempo para o usuário concluir o login no provedor
+VALIDADE_ESTADO_OAUTH_S = 900
+
+_FORMATO_USUARIO = re.compile(r"[0-9a-f]{32}")
+# nonce -> (usuario, provedor, expira_em, code_verifier)
+_ESTADOS_OAUTH = {}
+_LOCK = threading.Lock()
+_SEGREDO = None
+
+def _segredo():
+    """Chave do HMAC: COOKIE_SECRET do ambiente ou uma chave aleatória guardada no banco."""
+    global _SEGREDO
+    if _SEGREDO is None:
+        segredo = os.getenv("COOKIE_SECRET")
+        if not segredo:
+            with banco_dados.conexao() as conn:
+                segredo = banco_dados.obter_segredo(conn, "cookie_usuario")
+        _SEGREDO = segredo.encode()
+    return _SEGREDO
+
+def _assinatura(usuario):
+    return hmac.new(_segredo(), usuario.encode(), hashlib.sha256).hexdigest()
+
+def novo_usuario():
+    return uuid.uuid4().hex
+
+def valor_cookie(usuario):
+    return f"{usuario}.{_assinatura(usuario)}"
+
+def usuario_do_cookie(valor):
+    """Id do usuário se o cookie tiver uma assinatura válida; senão None."""
+    if not isinstance(valor, str):
+        return None
+    usuario, _, assinatura = valor.partition(".")
+    if _FORMATO_USUARIO.fullmatch(usuario) and hmac.compare_digest(assinatura, _assinatura(usuario)):
+        return usuario
+    return None
+
+def script_cookie(usuario):
+    """<script> que grava o cookie assinado no navegador (o Streamlit não define cookies pelo servidor)."""
+    cookie = f"{NOME_COOKIE}={valor_cookie(usuario)}; Path=/; Max-Age={VALIDADE_COOKIE_S}; SameSite=Lax"
+    return (f"<script>document.cookie = {json.dumps(cookie)}"
+            " + (location.protocol === 'https:' ? '; Secure' : '');</script>")
+
+# --- 'state' do OAuth ---
+
+def novo_estado_oauth(usuario, provedor):
+    """Registra um login pendente; devolve (nonce para o 'state', code_verifier do PKCE)."""
+    nonce, verificador = secrets.token_urlsafe(32), secrets.token_urlsafe(64)
+    agora = time.time()
+    with _LOCK:
+        for antigo in [n for n, estado in _ESTADOS_OAUTH.items() if estado[2] < agora]:
+            del _ESTADOS_OAUTH[antigo]
+        _ESTADOS_OAUTH[nonce] = (usuario, provedor, agora + VALIDADE_ESTADO_OAUTH_S, verificador)
+    return nonce, verificador
+
+def estado_pendente(nonce):
+    with _LOCK:
+        estado = _ESTADOS_OAUTH.get(nonce)
+    return estado is not None and estado[2] >= time.time()
+
+def consumir_estado_oauth(nonce, usuario, provedor):
+    """Valida e invalida o nonce do retorno; devolve o code_verifier, ou None se o retorno não for deste usuário."""
+    with _LOCK:
+        estado = _ESTADOS_OAUTH.get(nonce or "")
+        if estado is None or estado[0] != usuario or estado[1] != provedor:
+            return None
+        del _ESTADOS_OAUTH[nonce]
+    return estado[3] if estado[2] >= time.time() else None
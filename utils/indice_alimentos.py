@@ -0,0 +1,163 @@
+# Índice local (SQLite FTS5) do Open Food Facts para consultas sem rede.
+#
+# Importação a partir do dump oficial (JSONL ou CSV, opcionalmente .gz):
+#     python -m utils.indice_alimentos openfoodfacts-products.jsonl.gz
+
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import sys
+
+from utils.produtos_off import extrair_dados_produto
+
+CAMINHO_INDICE = os.getenv("OFF_INDEX_PATH", "off_index.db")
+TAMANHO_LOTE = 5000
+
+# Colunas guardadas: exatamente os campos devolvidos por buscar_info_alimento
+COLUNAS = ("codigo", "nome", "imagem", "nutriscore", "nova_group", "ingredientes", "calorias", "gordura",
+           "gordura_saturada", "carboidratos", "açucar", "fibras", "proteinas", "sal")
+COLUNAS_NUMERICAS = ("calorias", "gordura", "gordura_saturada", "carboidratos", "açucar", "fibras", "proteinas", "sal")
+_COLUNAS_SQL = ", ".join(f'"{c}"' for c in COLUNAS)
+
+ESQUEMA = f"""
+DROP TABLE IF EXISTS produtos_fts;
+DROP TABLE IF EXISTS produtos;
+CREATE TABLE produtos (
+    codigo TEXT UNIQUE,
+    nome TEXT NOT NULL,
+    imagem TEXT,
+    nutriscore TEXT,
+    nova_group INTEGER,
+    ingredientes TEXT,
+    {", ".join(f'"{c}" REAL' for c in COLUNAS_NUMERICAS)}
+);
+CREATE VIRTUAL TABLE produtos_fts USING fts5(
+    nome, ingredientes, content='produtos', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+def _abrir_texto(caminho):
+    if str(caminho).endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(caminho, "rb"), encoding="utf-8", errors="replace")
+    return open(caminho, encoding="utf-8", errors="replace", newline="")
+
+def _numero(valor):
+    if valor in (None, ""):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+def _produtos_jsonl(arquivo):
+    for linha in arquivo:
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield json.loads(linha)
+        except json.JSONDecodeError:
+            continue
+
+def _produtos_csv(arquivo):
+    """O CSV do Open Food Facts é separado por tabulação e traz os nutrientes achatados ('fat_100g')."""
+    csv.field_size_limit(sys.maxsize)
+    for linha in csv.DictReader(arquivo, delimiter="\t", quoting=csv.QUOTE_NONE):
+        produto = {chave: valor for chave, valor in linha.items() if valor not in (None, "")}
+        produto["nutriments"] = {chave: valor for chave, valor in produto.items() if chave.endswith("_100g")}
+        produto.setdefault("image_front_url", produto.get("image_url"))
+        yield produto
+
+def ler_produtos(arquivo, formato):
+    """Gera os produtos do dump um a um, sem carregar o arquivo na memória."""
+    return _produtos_csv(arquivo) if formato == "csv" else _produtos_jsonl(arquivo)
+
+def _linha(produto):
+    dados = extrair_dados_produto(produto)
+    if not produto.get("product_name_pt") and not produto.get("product_name"):
+        return None
+    for coluna in COLUNAS_NUMERICAS:
+        dados[coluna] = _numero(dados[coluna])
+    nova = _numero(dados["nova_group"])
+    dados["nova_group"] = int(nova) if nova is not None else None
+    return tuple(dados[c] for c in COLUNAS)
+
+def importar(origem, caminho_indice=None, formato=None):
+    """Importa um dump do Open Food Facts para o índice FTS5, recriando-o do zero.
+
+    `origem` pode ser um caminho (.jsonl, .csv, com ou sem .gz) ou um arquivo
+    de texto já aberto (nesse caso informe `formato`). Retorna quantos produtos
+    foram indexados.
+    """
+    if formato is None:
+        formato = "csv" if ".csv" in str(origem) else "jsonl"
+    arquivo = _abrir_texto(origem) if isinstance(origem, (str, os.PathLike)) else origem
+    conn = sqlite3.connect(caminho_indice or CAMINHO_INDICE)
+    try:
+        conn.executescript(ESQUEMA)
+        marcadores = ", ".join("?" * len(COLUNAS))
+        sql = f"INSERT OR REPLACE INTO produtos ({_COLUNAS_SQL}) VALUES ({marcadores})"
+        lote = []
+        with conn:
+            for produto in ler_produtos(arquivo, formato):
+                linha = _linha(produto)
+                if linha is None:
+                    continue
+                lote.append(linha)
+                if len(lote) >= TAMANHO_LOTE:
+                    conn.executemany(sql, lote)
+                    lote = []
+            conn.executemany(sql, lote)
+            # Monta o índice de texto de uma vez só, depois da carga
+            conn.execute("INSERT INTO produtos_fts (produtos_fts) VALUES ('rebuild')")
+        conn.execute("VACUUM")
+        return conn.execute("SELECT COUNT(*) FROM produtos").fetchone()[0]
+    finally:
+        conn.close()
+        if arquivo is not origem:
+            arquivo.close()
+
+def _consulta_fts(texto):
+    """Transforma o texto digitado numa consulta FTS5 segura (todas as palavras, como prefixo)."""
+    palavras = [p.replace('"', "") for p in texto.split()]
+    return " ".join(f'"{p}"*' for p in palavras if p)
+
+def _conectar_indice(caminho_indice):
+    caminho = caminho_indice or CAMINHO_INDICE
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(f"Índice offline '{caminho}' não encontrado. Importe o dump com 'python -m utils.indice_alimentos'.")
+    return sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+
+def buscar(texto, limite=10, caminho_indice=None):
+    """Busca ranqueada (bm25, com o nome pesando mais que os ingredientes) no índice local."""
+    consulta = _consulta_fts(texto)
+    if not consulta:
+        return []
+    conn = _conectar_indice(caminho_indice)
+    try:
+        colunas = ", ".join(f'p."{c}"' for c in COLUNAS)
+        linhas = conn.execute(
+            f"SELECT {colunas} FROM produtos_fts JOIN produtos p ON p.rowid = produtos_fts.rowid "
+            "WHERE produtos_fts MATCH ? ORDER BY bm25(produtos_fts, 10.0, 1.0) LIMIT ?",
+            (consulta, limite)).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(COLUNAS, linha)) for linha in linhas]
+
+def buscar_por_codigo(codigo, caminho_indice=None):
+    conn = _conectar_indice(caminho_indice)
+    try:
+        linha = conn.execute(f"SELECT {_COLUNAS_SQL} FROM produtos WHERE codigo = ?", (codigo,)).fetchone()
+    finally:
+        conn.close()
+    return dict(zip(COLUNAS, linha)) if linha else None
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python -m utils.indice_alimentos <dump.jsonl[.gz]|dump.csv[.gz]> [indice.db]")
+        sys.exit(1)
+    total = importar(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"{total} produtos indexados.")
@@ -0,0 +1,244 @@
+# Instrumentação leve do caminho quente: tempo de cada função de busca, chamadas e
+# bytes por host das APIs, taxa de acerto dos caches e contagem de erros.
+#
+# As métricas são do processo inteiro (todas as sessões) e podem ser exportadas em
+# texto do Prometheus ou JSON. Além delas, cada rerun do app pode ter um Rastro:
+# a lista de trechos medidos (com início, duração e thread), usada no painel de
+# diagnóstico para desenhar a cascata do rerun.
+
+import bisect
+import contextvars
+import functools
+import itertools
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+LIMITES_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIXO = "painel_saude"
+
+_LOCK = threading.Lock()
+_LATENCIAS = {}
+_ERROS = Counter()
+_UPSTREAM = defaultdict(lambda: {"chamadas": 0, "bytes": 0, "erros": 0})
+_CACHES = {}
+_CACHES_ST = defaultdict(lambda: [0, 0])
+# (rastro do rerun, id do trecho pai) da execução atual
+_ATUAL = contextvars.ContextVar("instrumentacao_atual", default=(None, None))
+
+class Histograma:
+    """Histograma cumulativo de latências, no formato do Prometheus."""
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_S) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, segundos):
+        self.contagens[bisect.bisect_left(LIMITES_S, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+
+    def quantil(self, q):
+        """Estimativa do quantil pelo limite superior do bucket (None se vazio)."""
+        if not self.total:
+            return None
+        alvo = q * self.total
+        for limite, acumulado in zip(LIMITES_S + (float("inf"),), itertools.accumulate(self.contagens)):
+            if acumulado >= alvo:
+                return limite
+        return None
+
+class Rastro:
+    """Trechos medidos durante um rerun do app, com tempos relativos ao início do rerun."""
+
+    def __init__(self, rotulo=None):
+        self.rotulo = rotulo
+        self.criado_em = time.time()
+        self.inicio = time.perf_counter()
+        self.duracao_ms = None
+        self.trechos = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _adicionar(self, trecho):
+        with self._lock:
+            self.trechos.append(trecho)
+
+    def cascata(self):
+        """Trechos ordenados pelo início, com o nível de aninhamento de cada um."""
+        niveis = {}
+        linhas = []
+        for t in sorted(self.trechos, key=lambda t: t["inicio_ms"]):
+            niveis[t["id"]] = niveis.get(t["pai"], -1) + 1
+            linhas.append({**t, "nivel": niveis[t["id"]]})
+        return linhas
+
+class _Medicao:
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self._rastro, self._pai = _ATUAL.get()
+        self._token = None
+        if self._rastro is not None:
+            self._id = next(self._rastro._ids)
+            self._token = _ATUAL.set((self._rastro, self._id))
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        fim = time.perf_counter()
+        observar(self.nome, fim - self._inicio)
+        if erro is not None:
+            registrar_erro(self.nome, erro)
+        if self._token is not None:
+            _ATUAL.reset(self._token)
+            self._rastro._adicionar({
+                "id": self._id, "pai": self._pai, "nome": self.nome,
+                "inicio_ms": (self._inicio - self._rastro.inicio) * 1000, "fim_ms": (fim - self._rastro.inicio) * 1000,
+                "thread": threading.current_thread().name, "erro": type(erro).__name__ if erro else None,
+            })
+        return False
+
+    def __call__(self, funcao):
+        nome = self.nome or f"{funcao.__module__.rpartition('.')[2]}.{funcao.__name__}"
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with _Medicao(nome):
+                return funcao(*args, **kwargs)
+        return medida
+
+def medir(nome=None):
+    """Mede um trecho (`with medir("nome"):`) ou uma função (`@medir()`, nome = módulo.função)."""
+    return _Medicao(nome)
+
+def propagar(funcao):
+    """Leva o rastro atual para `funcao` quando ela rodar em outra thread (ex.: pool.submit(propagar(f), ...))."""
+    atual = _ATUAL.get()
+    if atual[0] is None:
+        return funcao
+
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        token = _ATUAL.set(atual)
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _ATUAL.reset(token)
+    return executar
+
+# --- Registro ---
+
+def observar(nome, segundos):
+    with _LOCK:
+        histograma = _LATENCIAS.get(nome)
+        if histograma is None:
+            histograma = _LATENCIAS[nome] = Histograma()
+        histograma.observar(segundos)
+
+def registrar_erro(origem, erro):
+    with _LOCK:
+        _ERROS[(origem, type(erro).__name__)] += 1
+
+def registrar_upstream(url, bytes_recebidos=0, status=None):
+    """Conta uma chamada a uma API externa; status None (falha de conexão) ou >= 400 conta como erro."""
+    host = urlsplit(url).netloc
+    with _LOCK:
+        uso = _UPSTREAM[host]
+        uso["chamadas"] += 1
+        uso["bytes"] += bytes_recebidos
+        if status is None or status >= 400:
+            uso["erros"] += 1
+
+def registrar_cache(nome, cache):
+    """Inclui um CacheLRU nas métricas (lidas dos contadores acertos/falhas do próprio cache)."""
+    with _LOCK:
+        _CACHES[nome] = cache
+    return cache
+
+def registrar_consulta_cache(nome):
+    with _LOCK:
+        _CACHES_ST[nome][0] += 1
+
+def registrar_falha_cache(nome):
+    with _LOCK:
+        _CACHES_ST[nome][1] += 1
+
+def iniciar_rastro(rotulo=None):
+    """Começa o rastro de um rerun; os trechos medidos nesta thread (e nas propagadas) entram nele."""
+    rastro = Rastro(rotulo)
+    _ATUAL.set((rastro, None))
+    return rastro
+
+def finalizar_rastro(rastro):
+    rastro.duracao_ms = (time.perf_counter() - rastro.inicio) * 1000
+    if _ATUAL.get()[0] is rastro:
+        _ATUAL.set((None, None))
+    return rastro
+
+def zerar():
+    with _LOCK:
+        _LATENCIAS.clear()
+        _ERROS.clear()
+        _UPSTREAM.clear()
+        _CACHES_ST.clear()
+        for cache in _CACHES.values():
+            cache.acertos = cache.falhas = 0
+
+# --- Exportação ---
+
+def _estado_caches():
+    estado = {nome: (c.acertos + c.falhas, c.acertos) for nome, c in _CACHES.items()}
+    estado.update({nome: (consultas, consultas - falhas) for nome, (consultas, falhas) in _CACHES_ST.items()})
+    return estado
+
+def _quantil_ms(histograma, q):
+    valor = histograma.quantil(q)
+    return None if valor in (None, float("inf")) else valor * 1000
+
+def exportar_json():
+    """Snapshot das métricas como dicionário (serializável em JSON); tempos em ms."""
+    with _LOCK:
+        latencias = {nome: {
+            "chamadas": h.total,
+            "media_ms": round(h.soma / h.total * 1000, 2) if h.total else None,
+            "p50_ms": _quantil_ms(h, 0.5),
+            "p95_ms": _quantil_ms(h, 0.95),
+            "buckets": dict(zip([str(l) for l in LIMITES_S] + ["+Inf"], itertools.accumulate(h.contagens))),
+        } for nome, h in sorted(_LATENCIAS.items())}
+        erros = [{"origem": origem, "tipo": tipo, "total": n} for (origem, tipo), n in sorted(_ERROS.items())]
+        upstream = {host: dict(uso) for host, uso in sorted(_UPSTREAM.items())}
+        caches = {nome: {"consultas": consultas, "acertos": acertos,
+                         "taxa_acerto": round(acertos / consultas, 3) if consultas else None}
+                  for nome, (consultas, acertos) in sorted(_estado_caches().items())}
+    return {"latencias": latencias, "erros": erros, "upstream": upstream, "caches": caches}
+
+def _rotulos(**rotulos):
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in rotulos.items()) + "}"
+
+def exportar_prometheus():
+    """Métricas no formato de exposição de texto do Prometheus."""
+    linhas = [f"# TYPE {PREFIXO}_latencia_segundos histogram"]
+    with _LOCK:
+        for nome, h in sorted(_LATENCIAS.items()):
+            for limite, acumulado in zip([str(l) for l in LIMITES_S] + ["+Inf"], itertools.accumulate(h.contagens)):
+                linhas.append(f"{PREFIXO}_latencia_segundos_bucket{_rotulos(funcao=nome, le=limite)} {acumulado}")
+            linhas.append(f"{PREFIXO}_latencia_segundos_sum{_rotulos(funcao=nome)} {h.soma:.6f}")
+            linhas.append(f"{PREFIXO}_latencia_segundos_count{_rotulos(funcao=nome)} {h.total}")
+        linhas.append(f"# TYPE {PREFIXO}_erros_total counter")
+        for (origem, tipo), n in sorted(_ERROS.items()):
+            linhas.append(f"{PREFIXO}_erros_total{_rotulos(origem=origem, tipo=tipo)} {n}")
+        for campo in ("chamadas", "bytes", "erros"):
+            linhas.append(f"# TYPE {PREFIXO}_upstream_{campo}_total counter")
+            for host, uso in sorted(_UPSTREAM.items()):
+                linhas.append(f"{PREFIXO}_upstream_{campo}_total{_rotulos(host=host)} {uso[campo]}")
+        caches = sorted(_estado_caches().items())
+    linhas.append(f"# TYPE {PREFIXO}_cache_consultas_total counter")
+    linhas += [f"{PREFIXO}_cache_consultas_total{_rotulos(cache=nome)} {consultas}" for nome, (consultas, _) in caches]
+    linhas.append(f"# TYPE {PREFIXO}_cache_acertos_total counter")
+    linhas += [f"{PREFIXO}_cache_acertos_total{_rotulos(cache=nome)} {acertos}" for nome, (_, acertos) in caches]
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,112 @@
+# Renderização dos mapas das atividades: HTML do folium em cache LRU e miniaturas SVG leves.
+
+import hashlib
+import heapq
+import math
+
+from utils import instrumentacao
+from utils.cache import CacheLRU
+
+# O folium e o polyline são importados só no primeiro uso: só o folium leva quase um
+# segundo para carregar, e quem não abre a aba do Strava não precisa dele.
+
+# Cada mapa do folium gera algumas centenas de KB de HTML; o cache guarda poucos
+_CACHE_MAPAS = instrumentacao.registrar_cache("mapas", CacheLRU(max_itens=32))
+_CACHE_MINIATURAS = instrumentacao.registrar_cache("miniaturas", CacheLRU(max_itens=512))
+
+def chave_polyline(polyline_str):
+    return hashlib.sha1(polyline_str.encode()).hexdigest()
+
+def _distancia_segmento(p, a, b, escala_lon):
+    """Distância (em graus, com longitude corrigida pela latitude) do ponto p ao segmento a-b."""
+    px, py = p[1] * escala_lon, p[0]
+    ax, ay = a[1] * escala_lon, a[0]
+    bx, by = b[1] * escala_lon, b[0]
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+def simplificar_rota(coordenadas, max_pontos=60):
+    """Simplifica a rota com Douglas-Peucker até no máximo `max_pontos` pontos.
+
+    Em vez de um epsilon fixo, refina sempre o trecho com o ponto mais distante,
+    o que garante o número de pontos pedido mantendo a forma da rota.
+    """
+    n = len(coordenadas)
+    if n <= max_pontos or n < 3:
+        return list(coordenadas)
+    escala_lon = math.cos(math.radians(coordenadas[0][0]))
+
+    def maior_desvio(i, j):
+        melhor, indice = -1.0, None
+        for k in range(i + 1, j):
+            d = _distancia_segmento(coordenadas[k], coordenadas[i], coordenadas[j], escala_lon)
+            if d > melhor:
+                melhor, indice = d, k
+        return melhor, indice
+
+    mantidos = {0, n - 1}
+    fila = []
+    d, k = maior_desvio(0, n - 1)
+    if k is not None:
+        heapq.heappush(fila, (-d, 0, n - 1, k))
+    while fila and len(mantidos) < max_pontos:
+        _, i, j, k = heapq.heappop(fila)
+        mantidos.add(k)
+        for a, b in ((i, k), (k, j)):
+            if b - a > 1:
+                d, m = maior_desvio(a, b)
+                heapq.heappush(fila, (-d, a, b, m))
+    return [coordenadas[i] for i in sorted(mantidos)]
+
+def _renderizar_mapa(coordenadas):
+    import folium
+
+    mapa = folium.Map(location=coordenadas[0], zoom_start=13, tiles="CartoDB positron")
+    folium.PolyLine(locations=coordenadas, color="#FC4C02", weight=3).add_to(mapa)
+    return mapa._repr_html_()
+
+def gerar_mapa_html(polyline_str):
+    """HTML do mapa interativo (folium) da rota, reaproveitado entre reruns pelo hash da polyline."""
+    chave = chave_polyline(polyline_str)
+    html = _CACHE_MAPAS.obter(chave)
+    if html is None:
+        from polyline import decode
+        coordenadas = decode(polyline_str)
+        if not coordenadas:
+            return "<p style='text-align: center; margin-top: 50px;'>Mapa sem coordenadas.</p>"
+        html = _renderizar_mapa(coordenadas)
+        _CACHE_MAPAS.guardar(chave, html)
+    return html
+
+def _desenhar_svg(coordenadas, largura, altura, margem=8):
+    escala_lon = math.cos(math.radians(coordenadas[0][0]))
+    xs = [lon * escala_lon for _, lon in coordenadas]
+    ys = [lat for lat, _ in coordenadas]
+    min_x, min_y = min(xs), min(ys)
+    extensao = max(max(xs) - min_x, max(ys) - min_y) or 1e-9
+    escala = min(largura, altura) - 2 * margem
+    # Centraliza a rota mantendo a proporção; o eixo y do SVG cresce para baixo
+    off_x = (largura - (max(xs) - min_x) / extensao * escala) / 2
+    off_y = (altura - (max(ys) - min_y) / extensao * escala) / 2
+    pontos = " ".join(
+        f"{off_x + (x - min_x) / extensao * escala:.1f},{altura - off_y - (y - min_y) / extensao * escala:.1f}"
+        for x, y in zip(xs, ys))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{largura}" height="{altura}" viewBox="0 0 {largura} {altura}">'
+            f'<rect width="100%" height="100%" fill="#f5f5f5"/>'
+            f'<polyline points="{pontos}" fill="none" stroke="#FC4C02" stroke-width="2" stroke-linejoin="round"/></svg>')
+
+def gerar_miniatura_svg(polyline_str, max_pontos=60, largura=300, altura=200):
+    """Miniatura estática da rota em SVG, com a polyline simplificada para `max_pontos` pontos."""
+    chave = (chave_polyline(polyline_str), max_pontos, largura, altura)
+    svg = _CACHE_MINIATURAS.obter(chave)
+    if svg is None:
+        from polyline import decode
+        coordenadas = decode(polyline_str)
+        if not coordenadas:
+            return "<p>Mapa sem coordenadas.</p>"
+        svg = _desenhar_svg(simplificar_rota(coordenadas, max_pontos), largura, altura)
+        _CACHE_MINIATURAS.guardar(chave, svg)
+    return svg
@@ -0,0 +1,27 @@
+# Conversão de um produto do Open Food Facts (API ou dump) para o formato usado no painel.
+#
+# Compartilhado pela busca online (dados_alimentos) e pelo índice offline (indice_alimentos),
+# sem que um dos módulos precise importar o outro.
+
+# Campos do produto lidos em extrair_dados_produto; o resto não é baixado
+CAMPOS = "code,product_name,product_name_pt,image_front_url,nutriscore_grade,nova_group,ingredients_text,ingredients_text_pt,nutriments"
+
+def extrair_dados_produto(p):
+    nutriments = p.get("nutriments", {})
+    return {
+        "codigo": p.get("code"),
+        # O Open Food Facts manda campos vazios ou null; `or` cai no próximo valor
+        "nome": p.get("product_name_pt") or p.get("product_name") or "Nome não encontrado",
+        "imagem": p.get("image_front_url"),
+        "nutriscore": p.get("nutriscore_grade") or "?",
+        "nova_group": p.get("nova_group"),
+        "ingredientes": p.get("ingredients_text_pt") or p.get("ingredients_text") or "Não listados",
+        "calorias": nutriments.get("energy-kcal_100g"),
+        "gordura": nutriments.get("fat_100g"),
+        "gordura_saturada": nutriments.get("saturated-fat_100g"),
+        "carboidratos": nutriments.get("carbohydrates_100g"),
+        "açucar": nutriments.get("sugars_100g"),
+        "fibras": nutriments.get("fiber_100g"),
+        "proteinas": nutriments.get("proteins_100g"),
+        "sal": nutriments.get("salt_100g")
+    }
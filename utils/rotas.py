@@ -0,0 +1,146 @@
+# Análise vetorizada de rotas (NumPy): decodificação em lote das polylines do Strava
+# e métricas por atividade sem laços em Python sobre as coordenadas.
+
+from dataclasses import dataclass
+
+import numpy as np
+
+RAIO_TERRA_KM = 6371.0088
+
+@dataclass
+class Rotas:
+    """Coordenadas de várias rotas num único array contíguo.
+
+    `coordenadas` tem forma (N, 2) com (lat, lon) em graus; os pontos da rota i
+    estão em coordenadas[offsets[i]:offsets[i + 1]].
+    """
+    coordenadas: np.ndarray
+    offsets: np.ndarray
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def contagens(self):
+        return np.diff(self.offsets)
+
+    def rota(self, i):
+        return self.coordenadas[self.offsets[i]:self.offsets[i + 1]]
+
+def decodificar_polylines(polylines, precisao=5):
+    """Decodifica várias polylines (formato do Google/Strava) de uma só vez.
+
+    Polylines vazias ou None viram rotas sem pontos, preservando o índice.
+    """
+    textos = [(p or "").encode("ascii") for p in polylines]
+    tamanhos = np.fromiter((len(t) for t in textos), dtype=np.int64, count=len(textos))
+    if tamanhos.sum() == 0:
+        return Rotas(np.empty((0, 2)), np.zeros(len(textos) + 1, dtype=np.int64))
+
+    valores = np.frombuffer(b"".join(textos), dtype=np.uint8).astype(np.int64) - 63
+    # Cada número é uma sequência de blocos de 5 bits; o bloco final tem o bit 0x20 desligado
+    terminal = valores < 0x20
+    id_numero = np.cumsum(terminal) - terminal
+    inicios = np.concatenate(([0], np.flatnonzero(terminal)[:-1] + 1))
+    deslocamento = 5 * (np.arange(len(valores)) - inicios[id_numero])
+    brutos = np.bincount(id_numero, weights=(valores & 0x1F) << deslocamento).astype(np.int64)
+    deltas = np.where(brutos & 1, ~(brutos >> 1), brutos >> 1) / 10.0 ** precisao
+
+    # Quantos números (lat e lon alternados) cada polyline contém
+    fins_texto = np.cumsum(tamanhos)
+    numeros_ate = np.concatenate(([0], np.cumsum(terminal)[fins_texto - 1]))
+    numeros_ate[1:][tamanhos == 0] = 0
+    numeros_ate = np.maximum.accumulate(numeros_ate)
+    offsets = numeros_ate // 2
+
+    # Soma acumulada dos deltas, reiniciada no começo de cada rota
+    acumulado = np.cumsum(deltas.reshape(-1, 2), axis=0)
+    base = np.vstack(([0.0, 0.0], acumulado))[offsets[:-1]]
+    coordenadas = acumulado - np.repeat(base, np.diff(offsets), axis=0)
+    return Rotas(coordenadas, offsets)
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a))
+
+def _reduzir(funcao, valores, rotas, vazio):
+    """Aplica um ufunc.reduceat por rota, devolvendo `vazio` para rotas sem pontos."""
+    contagens = rotas.contagens
+    resultado = np.full((len(rotas),) + valores.shape[1:], vazio, dtype=float)
+    cheias = contagens > 0
+    if cheias.any():
+        resultado[cheias] = funcao.reduceat(valores, rotas.offsets[:-1][cheias], axis=0)
+    return resultado
+
+def distancias_km(rotas):
+    """Distância total (haversine) de cada rota, em km."""
+    c = rotas.coordenadas
+    if len(c) < 2:
+        return np.zeros(len(rotas))
+    trechos = np.append(_haversine_km(c[:-1, 0], c[:-1, 1], c[1:, 0], c[1:, 1]), 0.0)
+    # Zera os trechos que ligam o último ponto de uma rota ao primeiro da seguinte
+    fronteiras = rotas.offsets[1:-1]
+    trechos[fronteiras[fronteiras > 0] - 1] = 0.0
+    return _reduzir(np.add, trechos, rotas, 0.0)
+
+def caixas_delimitadoras(rotas):
+    """(min_lat, min_lon, max_lat, max_lon) de cada rota; NaN para rotas sem pontos."""
+    minimos = _reduzir(np.minimum, rotas.coordenadas, rotas, np.nan)
+    maximos = _reduzir(np.maximum, rotas.coordenadas, rotas, np.nan)
+    return np.hstack((minimos, maximos))
+
+def centroides(rotas):
+    """Média (lat, lon) dos pontos de cada rota; NaN para rotas sem pontos."""
+    somas = _reduzir(np.add, rotas.coordenadas, rotas, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return somas / rotas.contagens[:, None]
+
+def pontos_inicio_fim(rotas):
+    """Arrays (K, 2) com o primeiro e o último ponto de cada rota; NaN para rotas sem pontos."""
+    inicio = np.full((len(rotas), 2), np.nan)
+    fim = np.full((len(rotas), 2), np.nan)
+    cheias = rotas.contagens > 0
+    inicio[cheias] = rotas.coordenadas[rotas.offsets[:-1][cheias]]
+    fim[cheias] = rotas.coordenadas[rotas.offsets[1:][cheias] - 1]
+    return inicio, fim
+
+def distancia_ate_ponto_km(rotas, lat, lon):
+    """Menor distância de cada rota até o ponto (lat, lon), em km."""
+    c = rotas.coordenadas
+    return _reduzir(np.minimum, _haversine_km(c[:, 0], c[:, 1], lat, lon), rotas, np.inf)
+
+def rotas_proximas(rotas, lat, lon, raio_km=1.0):
+    """Índices das rotas que passam a até `raio_km` do ponto, da mais próxima para a mais distante."""
+    distancias = distancia_ate_ponto_km(rotas, lat, lon)
+    indices = np.flatnonzero(distancias <= raio_km)
+    return indices[np.argsort(distancias[indices])]
+
+def agrupar_inicio_fim(rotas, precisao_km=0.2, faixa_distancia_km=0.5):
+    """Rótulo de grupo por rota: mesma célula de início, de fim e faixa de distância.
+
+    Rotas sem pontos recebem o rótulo -1.
+    """
+    inicio, fim = pontos_inicio_fim(rotas)
+    passo = precisao_km / 111.0  # ~111 km por grau de latitude
+    celulas = np.column_stack((
+        np.floor(inicio / passo),
+        np.floor(fim / passo),
+        np.floor(distancias_km(rotas) / faixa_distancia_km),
+    ))
+    rotulos = np.full(len(rotas), -1, dtype=np.int64)
+    validas = ~np.isnan(celulas).any(axis=1)
+    if validas.any():
+        _, inversos = np.unique(celulas[validas], axis=0, return_inverse=True)
+        rotulos[validas] = inversos.reshape(-1)
+    return rotulos
+
+def rotas_mais_frequentes(rotas, top=5, precisao_km=0.2):
+    """Os `top` grupos de rotas repetidas, como lista de arrays de índices (maior grupo primeiro)."""
+    rotulos = agrupar_inicio_fim(rotas, precisao_km)
+    validos = rotulos >= 0
+    if not validos.any():
+        return []
+    contagens = np.bincount(rotulos[validos])
+    grupos = np.argsort(-contagens, kind="stable")[:top]
+    return [np.flatnonzero(rotulos == g) for g in grupos if contagens[g] > 1]
@@ -0,0 +1,155 @@
+# Sincronização incremental: busca nas APIs só o que é mais novo que a última sincronização
+# e grava no banco local, de onde os painéis leem.
+
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from utils import banco_dados, instrumentacao
+from utils.banco_dados import USUARIO_PADRAO
+from utils.dados_google_fit import (
+    DadosGoogleFit, FONTE_ALTURA, FONTE_PESO,
+    obter_pontos_diarios, obter_pontos_fonte, obter_sessoes_sono,
+)
+from utils.dados_strava import POR_PAGINA_MAX, iterar_atividades
+from utils.tendencias_fit import analisar_tendencias
+
+# Na primeira sincronização, quanto do histórico buscar
+DIAS_HISTORICO_INICIAL = 3 * 365
+# Intervalo mínimo entre duas sincronizações da mesma fonte (em segundos)
+INTERVALO_MINIMO_SINC = 300
+# Sem dados novos, a marca avança até esta quantidade de dias antes de hoje (o resto já foi consultado)
+DIAS_REABERTOS_SEM_DADOS = 2
+# Métricas gravadas por dia (timestamp = meia-noite local do dia)
+METRICAS_DIARIAS = ('passos', 'bpm', 'bpm_min')
+
+def _meia_noite(data):
+    return int(data.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def _inicio_sincronizacao(marca):
+    """Ponto de partida da busca: a última marca (inclusiva) ou o histórico inicial, a partir da meia-noite local."""
+    if marca is None:
+        return _meia_noite(datetime.now() - timedelta(days=DIAS_HISTORICO_INICIAL))
+    return marca
+
+def _nova_marca(timestamps, marca, piso):
+    """O dado mais novo visto; sem dados novos, avança até `piso`, pois o intervalo já foi consultado."""
+    return max([*timestamps, piso] + ([marca] if marca is not None else []))
+
+def _recente(atualizado_em, intervalo_minimo):
+    return atualizado_em is not None and time.time() - atualizado_em < intervalo_minimo
+
+@contextmanager
+def _conexao(conn):
+    """Usa a conexão recebida ou empresta uma do pool só pelo trecho (nunca durante as chamadas de rede)."""
+    if conn is not None:
+        yield conn
+    else:
+        with banco_dados.conexao() as conn:
+            yield conn
+
+def sincronizar_google_fit(credentials, conn=None, usuario=USUARIO_PADRAO, intervalo_minimo=INTERVALO_MINIMO_SINC):
+    """Traz para o banco local os dados do Google Fit posteriores à última sincronização."""
+    with _conexao(conn) as c:
+        marca_diarios, atualizado_em = banco_dados.obter_marca(c, 'google_fit:diario', usuario)
+        if _recente(atualizado_em, intervalo_minimo):
+            return
+        marca_sono, _ = banco_dados.obter_marca(c, 'google_fit:sono', usuario)
+        marca_peso, _ = banco_dados.obter_marca(c, 'google_fit:peso', usuario)
+        marca_altura, _ = banco_dados.obter_marca(c, 'google_fit:altura', usuario)
+    # Versões antigas alinhavam os "dias" à hora da primeira sincronização: refaz a série diária do zero
+    realinhar = marca_diarios is not None and marca_diarios != _meia_noite(datetime.fromtimestamp(marca_diarios))
+    if realinhar:
+        marca_diarios = None
+    agora_ms = int(time.time() * 1000)
+    piso = _meia_noite(datetime.now() - timedelta(days=DIAS_REABERTOS_SEM_DADOS))
+    try:
+        # A marca diária reabre o último dia salvo: o bucket de hoje ainda está crescendo
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            f_diarios = pool.submit(instrumentacao.propagar(obter_pontos_diarios), credentials, _inicio_sincronizacao(marca_diarios) * 1000, agora_ms)
+            f_sono = pool.submit(instrumentacao.propagar(obter_sessoes_sono), credentials, _inicio_sincronizacao(marca_sono) * 1000, agora_ms)
+            f_peso = pool.submit(instrumentacao.propagar(obter_pontos_fonte), credentials, FONTE_PESO, _inicio_sincronizacao(marca_peso) * 1000, agora_ms)
+            f_altura = pool.submit(instrumentacao.propagar(obter_pontos_fonte), credentials, FONTE_ALTURA, _inicio_sincronizacao(marca_altura) * 1000, agora_ms)
+            diarios, sessoes = f_diarios.result(), f_sono.result()
+            pesos, alturas = f_peso.result(), f_altura.result()
+    except Exception as e:
+        print(f"Erro ao sincronizar dados do Google Fit: {e}")
+        instrumentacao.registrar_erro("sincronizacao.sincronizar_google_fit", e)
+        return
+
+    with instrumentacao.medir("sincronizacao.gravar_google_fit"), _conexao(conn) as c, c:
+        if realinhar:
+            banco_dados.remover_medicoes(c, METRICAS_DIARIAS, usuario)
+        for metrica in METRICAS_DIARIAS:
+            banco_dados.gravar_medicoes(c, metrica, diarios[metrica], usuario)
+        banco_dados.gravar_medicoes(c, 'peso', pesos, usuario)
+        banco_dados.gravar_medicoes(c, 'altura', alturas, usuario)
+        banco_dados.gravar_sessoes_sono(c, sessoes, usuario)
+        ultimos_dias = [ts for ts, _ in diarios['passos'] + diarios['bpm']]
+        banco_dados.gravar_marca(c, 'google_fit:diario', _nova_marca(ultimos_dias, marca_diarios, piso), usuario)
+        banco_dados.gravar_marca(c, 'google_fit:sono', _nova_marca([inicio for inicio, _ in sessoes], marca_sono, piso), usuario)
+        banco_dados.gravar_marca(c, 'google_fit:peso', _nova_marca([ts for ts, _ in pesos], marca_peso, piso), usuario)
+        banco_dados.gravar_marca(c, 'google_fit:altura', _nova_marca([ts for ts, _ in alturas], marca_altura, piso), usuario)
+
+@instrumentacao.medir("sincronizacao.gravar_lote_strava")
+def _gravar_lote_strava(conn, lote, marca, usuario, concluida):
+    with _conexao(conn) as c, c:
+        banco_dados.gravar_atividades(c, lote, usuario=usuario)
+        nova_marca = max((at['inicio'] for at in lote if at.get('inicio')), default=marca)
+        banco_dados.gravar_marca(c, 'strava:atividades', nova_marca, usuario, concluida=concluida)
+    return nova_marca
+
+def sincronizar_strava(token, conn=None, usuario=USUARIO_PADRAO, intervalo_minimo=INTERVALO_MINIMO_SINC):
+    """Traz para o banco local as atividades do Strava iniciadas após a última sincronização.
+
+    Na primeira vez importa o histórico completo do atleta. As atividades chegam
+    em ordem crescente e são gravadas página a página, então uma falha no meio
+    do caminho não perde o que já foi importado e a próxima sincronização
+    continua de onde parou. Só uma sincronização completa conta para o
+    intervalo mínimo: depois de uma falha, a próxima tentativa não espera.
+    """
+    with _conexao(conn) as c:
+        marca, atualizado_em = banco_dados.obter_marca(c, 'strava:atividades', usuario)
+    if _recente(atualizado_em, intervalo_minimo):
+        return
+    lote = []
+    try:
+        for atividade in iterar_atividades(token, after=marca or 0):
+            lote.append(atividade)
+            if len(lote) >= POR_PAGINA_MAX:
+                marca = _gravar_lote_strava(conn, lote, marca, usuario, concluida=False)
+                lote = []
+    except requests.RequestException as e:
+        print(f"ERRO: Falha ao sincronizar atividades do Strava: {e}")
+        instrumentacao.registrar_erro("sincronizacao.sincronizar_strava", e)
+        if lote:
+            _gravar_lote_strava(conn, lote, marca, usuario, concluida=False)
+        return
+    _gravar_lote_strava(conn, lote, marca, usuario, concluida=True)
+
+def carregar_dados_google_fit(credentials, dias=7, conn=None, usuario=USUARIO_PADRAO):
+    """Sincroniza (se necessário) e lê do banco local as métricas do painel para os últimos `dias`."""
+    sincronizar_google_fit(credentials, conn, usuario)
+    with _conexao(conn) as c:
+        return DadosGoogleFit(
+            peso=banco_dados.ler_ultimo_valor(c, 'peso', usuario),
+            altura=banco_dados.ler_ultimo_valor(c, 'altura', usuario),
+            passos={dia: int(v) for dia, v in banco_dados.ler_serie_diaria(c, 'passos', dias, usuario).items()},
+            bpm={dia: round(v) for dia, v in banco_dados.ler_serie_diaria(c, 'bpm', dias, usuario).items()},
+            sono=banco_dados.ler_sono(c, dias, usuario),
+        )
+
+def carregar_tendencias(credentials, dias=365, conn=None, usuario=USUARIO_PADRAO):
+    """Sincroniza (se necessário) e analisa as séries diárias dos últimos `dias` (ver tendencias_fit)."""
+    sincronizar_google_fit(credentials, conn, usuario)
+    with _conexao(conn) as c:
+        diario = banco_dados.ler_series_diarias(c, METRICAS_DIARIAS, dias, usuario)
+    return analisar_tendencias(diario)
+
+def carregar_atividades_strava(token, limite=30, conn=None, usuario=USUARIO_PADRAO):
+    """Sincroniza (se necessário) e lê do banco local as atividades mais recentes."""
+    sincronizar_strava(token, conn, usuario)
+    with _conexao(conn) as c:
+        return banco_dados.ler_atividades(c, limite, usuario)
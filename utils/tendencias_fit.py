@@ -0,0 +1,52 @@
+# Análises de longo prazo sobre as séries diárias do Google Fit (meses ou anos de dados).
+#
+# Tudo é vetorizado em pandas/NumPy: médias móveis, totais semanais e a tendência
+# da frequência cardíaca de repouso, sem laços em Python sobre os dias.
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Dias mínimos com dado na janela para a média móvel valer
+MIN_DIAS_JANELA = 4
+
+@dataclass
+class TendenciasFit:
+    """Séries derivadas para os gráficos de tendência."""
+    diario: pd.DataFrame
+    semanal: pd.DataFrame
+    # Variação da FC de repouso em bpm por semana (negativo = melhorando), ou None sem dados suficientes
+    inclinacao_repouso: float | None = None
+
+def _inclinacao_por_semana(serie):
+    serie = serie.dropna()
+    if len(serie) < 14:
+        return None
+    dias = (serie.index - serie.index[0]).days.to_numpy(dtype=float)
+    return round(float(np.polyfit(dias, serie.to_numpy(dtype=float), 1)[0]) * 7, 2)
+
+def analisar_tendencias(diario):
+    """Calcula médias móveis, totais semanais e a tendência da FC de repouso.
+
+    `diario` tem índice de dias e as colunas 'passos', 'bpm' e 'bpm_min'
+    (como em banco_dados.ler_series_diarias). A FC de repouso é estimada pela
+    mediana móvel de 7 dias do batimento mínimo diário.
+    """
+    diario = diario.asfreq('D') if len(diario) else diario
+    resultado = pd.DataFrame(index=diario.index)
+    resultado['passos'] = diario['passos']
+    resultado['passos_media_7d'] = diario['passos'].rolling(7, min_periods=MIN_DIAS_JANELA).mean()
+    resultado['bpm_media_7d'] = diario['bpm'].rolling(7, min_periods=MIN_DIAS_JANELA).mean()
+    resultado['fc_repouso'] = diario['bpm_min'].rolling(7, min_periods=MIN_DIAS_JANELA).median()
+
+    semanal = pd.DataFrame({
+        'passos': diario['passos'].resample('W-MON', label='left', closed='left').sum(min_count=1),
+        'bpm': diario['bpm'].resample('W-MON', label='left', closed='left').mean(),
+        'fc_repouso': diario['bpm_min'].resample('W-MON', label='left', closed='left').median(),
+    })
+    return TendenciasFit(
+        diario=resultado,
+        semanal=semanal,
+        inclinacao_repouso=_inclinacao_por_semana(resultado['fc_repouso']),
+    )